@@ -0,0 +1,128 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+compact_dtypes.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+# import modules
+from __future__ import print_function, division
+import warnings
+import numpy as np
+import pandas as pd
+
+warnings.filterwarnings("ignore")
+
+# low cardinality text features held as pandas categoricals through steps 3 - 5.
+CATEGORY_COLUMN_LIST = ['PROPERTY', 'DISTRICT', 'PROP_TAG', 'FEATGROUP', 'FEATURE', 'SOURCE', 'STATUS']
+
+# STATUS variables produced by the pipeline.
+STATUS_VOCABULARY = {'VERIFIED', 'AUTO_CORRECT', 'AUTO-CORRECTED', 'ERROR', 'Transition_attempt', 'Geom Repaired',
+                     'Outside Property', 'Failed Geom Valid', 'Failed Length'}
+
+
+def vocabulary_fn(feature_type, pastoral_estate_index):
+    """ Create the category vocabulary of each categorical feature from the feature type specific feature group and
+    feature sets (step1_3.identify_set_fn) and the Pastoral Estate index.
+
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :param pastoral_estate_index: dictionary object containing the Pastoral Estate index
+    (pastoral_estate_index.load_pastoral_estate_index_fn).
+    :return vocab_dict: dictionary object containing the feature name (key) and set of known values (value).
+    """
+    import step1_3_concatenate_clean
+    feature_group_set, feature_set = step1_3_concatenate_clean.identify_set_fn(feature_type)
+
+    vocab_dict = {'PROPERTY': set(pastoral_estate_index['property_name_set']) | {'FAULTY'},
+                  'DISTRICT': set(pastoral_estate_index['prop_dist_dict'].values()),
+                  'PROP_TAG': set(pastoral_estate_index['prop_tag_dict'].values()),
+                  'FEATGROUP': set(feature_group_set) | {'FAULTY'},
+                  'FEATURE': set(feature_set) | {'FAULTY'},
+                  'SOURCE': set(),
+                  'STATUS': set(STATUS_VOCABULARY)}
+
+    return vocab_dict
+
+
+def is_categorical_fn(series):
+    """ Return True if the series is a pandas categorical. """
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def categorise_fn(gdf, vocab_dict):
+    """ Convert the CATEGORY_COLUMN_LIST features to pandas categoricals - the categories are the vocabulary plus any
+    other observed value, sorted. Features that are already categorical (feature_accumulator) are recoded without
+    converting them back to text.
+
+    :param gdf: geo-dataframe object containing the feature type specific data.
+    :param vocab_dict: dictionary object returned by vocabulary_fn.
+    :return gdf: geo-dataframe object with categorical features.
+    """
+    for column in CATEGORY_COLUMN_LIST:
+        if column not in gdf.columns:
+            continue
+
+        if is_categorical_fn(gdf[column]):
+            category_set = set(vocab_dict.get(column, set())) | set(gdf[column].cat.categories)
+            categories = sorted((i for i in category_set if pd.notnull(i)), key=str)
+            gdf[column] = gdf[column].cat.set_categories(categories)
+            continue
+
+        values = np.asarray(gdf[column].values, dtype=object)
+        category_set = set(vocab_dict.get(column, set())) | set(pd.unique(values[pd.notnull(values)]))
+        categories = sorted((i for i in category_set if pd.notnull(i)), key=str)
+        gdf[column] = pd.Categorical(values, categories=categories)
+
+    return gdf
+
+
+def set_column_fn(gdf, column, values):
+    """ Assign values to a feature, keeping it categorical (new values are added to the categories) if it already is.
+
+    :param gdf: geo-dataframe object.
+    :param column: string object containing the feature name.
+    :param values: list, numpy array or series object containing the new values.
+    """
+    if column in gdf.columns and is_categorical_fn(gdf[column]):
+        values = np.asarray(values, dtype=object)
+        categories = gdf[column].cat.categories
+        category_set = set(categories)
+        new_values = [i for i in pd.unique(values[pd.notnull(values)]) if i not in category_set]
+        if new_values:
+            categories = categories.append(pd.Index(new_values, dtype=object))
+        gdf[column] = pd.Categorical(values, categories=categories)
+    else:
+        gdf[column] = values
+
+
+def decategorise_fn(gdf):
+    """ Convert categorical features back to text before the geo-dataframe is written to file (shapefile drivers do
+    not support categoricals).
+
+    :param gdf: geo-dataframe object.
+    :return gdf: geo-dataframe object without categorical features.
+    """
+    column_list = [column for column in gdf.columns if column != 'geometry' and is_categorical_fn(gdf[column])]
+    if not column_list:
+        return gdf
+
+    return gdf.astype({column: object for column in column_list})
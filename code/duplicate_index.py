@@ -0,0 +1,221 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+duplicate_index.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+# import modules
+from __future__ import print_function, division
+import os
+import pickle
+import warnings
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+try:
+    # shapely >= 2.0 - vectorized WKB export.
+    from shapely import to_wkb
+except ImportError:
+    to_wkb = None
+
+warnings.filterwarnings("ignore")
+
+# increment when the row hash changes so that old hash indexes are rebuilt.
+HASH_VERSION = 1
+
+# attributes that identify an observation - derived (AREA_KM2, LENGTH_M) and run specific (DATE_CURR, STATUS, UPLOAD)
+# features are excluded so that a re-submitted observation hashes to the same value.
+HASH_COLUMN_LIST = ['PROPERTY', 'PROP_TAG', 'DISTRICT', 'FEATGROUP', 'FEATURE', 'LABEL', 'DATE_INSP', 'SOURCE',
+                    'CONFIDENCE', 'MAPDISPLAY', 'DELETE']
+
+# appended to the previous transfer dataset name - each dataset has its own hash index.
+HASH_INDEX_SUFFIX = '_hash_index.pickle'
+
+
+def normalise_hash_column_fn(gdf, column):
+    """ Convert a column to the string form used in the row hash (nulls and missing columns become '').
+
+    :param gdf: geo-dataframe object.
+    :param column: string object containing the column name.
+    :return values: pandas series object containing the normalised strings.
+    """
+    if column not in gdf.columns:
+        return pd.Series([''] * len(gdf.index), dtype=object)
+
+    series = pd.Series(np.asarray(gdf[column].values, dtype=object))
+    if column == 'DELETE':
+        # 0, 0.0 and '0' are the same value.
+        return pd.to_numeric(series, errors='coerce').fillna(0).astype(np.int64).astype(str)
+
+    return series.where(series.notna(), '').astype(str).str.strip()
+
+
+def wkb_hex_fn(geometry):
+    """ Convert every geometry of a geo-series to hex encoded WKB (null geometries become '').
+
+    :param geometry: geo-series object.
+    :return values: pandas series object containing the WKB hex strings.
+    """
+    geom_array = np.asarray(geometry.values, dtype=object)
+    if to_wkb is not None:
+        wkb_array = to_wkb(geom_array, hex=True)
+    else:
+        wkb_array = [geom.wkb_hex if geom is not None else None for geom in geom_array]
+
+    return pd.Series(wkb_array, dtype=object).fillna('')
+
+
+def row_hash_fn(gdf):
+    """ Hash the normalised identifying attributes (HASH_COLUMN_LIST) and the WKB geometry of every observation.
+
+    :param gdf: geo-dataframe object.
+    :return hash_array: numpy array object containing one uint64 hash per observation.
+    """
+    hash_df = pd.DataFrame({column: normalise_hash_column_fn(gdf, column) for column in HASH_COLUMN_LIST})
+    hash_df['geometry'] = wkb_hex_fn(gdf.geometry)
+
+    return pd.util.hash_pandas_object(hash_df, index=False).values
+
+
+def drop_duplicate_rows_fn(gdf):
+    """ Drop repeated observations (identical row hash) keeping the first occurrence.
+
+    :param gdf: geo-dataframe object.
+    :return gdf: geo-dataframe object without repeated observations.
+    """
+    duplicate = pd.Series(row_hash_fn(gdf)).duplicated().values
+    if duplicate.any():
+        print(' - ', int(duplicate.sum()), ' duplicate observations removed.')
+        gdf = gdf[~duplicate]
+
+    return gdf
+
+
+def hash_index_path_fn(previous_transfer_path):
+    """ Return the path to the hash index of a previous transfer dataset (i.e. previous_transfer_points_gda94.gpkg ->
+    previous_transfer_points_gda94_hash_index.pickle).
+
+    :param previous_transfer_path: string object containing the path to the previous transfer dataset.
+    :return index_path: string object containing the path to the hash index.
+    """
+    return os.path.splitext(previous_transfer_path)[0] + HASH_INDEX_SUFFIX
+
+
+def source_stat_fn(previous_transfer_path):
+    """ Return the (modification time, size) of a shapefile (.shp and .dbf) or GeoPackage used to detect outside
+    edits.
+
+    :param previous_transfer_path: string object containing the path to the shapefile or GeoPackage.
+    :return stat: tuple object containing the modification time and size.
+    """
+    base_path, ext = os.path.splitext(previous_transfer_path)
+    ext_list = ['.shp', '.dbf'] if ext.lower() == '.shp' else [ext]
+
+    mtime = 0.
+    size = 0
+    for ext in ext_list:
+        path = base_path + ext
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            mtime = max(mtime, stat.st_mtime)
+            size += stat.st_size
+
+    return mtime, size
+
+
+def load_hash_index_fn(previous_transfer_path):
+    """ Load the hash index of everything already transferred. The index is rebuilt from the previous transfer
+    dataset when it is missing or the dataset has been edited outside the pipeline.
+
+    :param previous_transfer_path: string object containing the path to the previous transfer dataset.
+    :return hash_index: dictionary object containing the 'version', 'source_stat' and 'hash_array'.
+    """
+    index_path = hash_index_path_fn(previous_transfer_path)
+    source_stat = source_stat_fn(previous_transfer_path)
+
+    hash_index = None
+    if os.path.isfile(index_path):
+        try:
+            with open(index_path, 'rb') as f:
+                hash_index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            hash_index = None
+
+        if hash_index is not None and (hash_index.get('version') != HASH_VERSION
+                                       or tuple(hash_index.get('source_stat', ())) != source_stat):
+            hash_index = None
+
+    if hash_index is None:
+        print('Building the transferred hash index: ', previous_transfer_path)
+        hash_array = np.unique(row_hash_fn(gpd.read_file(previous_transfer_path)))
+        hash_index = {'version': HASH_VERSION, 'source_stat': source_stat, 'hash_array': hash_array}
+        write_hash_index_fn(previous_transfer_path, hash_index)
+
+    return hash_index
+
+
+def write_hash_index_fn(previous_transfer_path, hash_index):
+    """ Write the hash index beside the previous transfer dataset.
+
+    :param previous_transfer_path: string object containing the path to the previous transfer dataset.
+    :param hash_index: dictionary object returned by load_hash_index_fn.
+    """
+    index_path = hash_index_path_fn(previous_transfer_path)
+    try:
+        with open(index_path, 'wb') as f:
+            pickle.dump(hash_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        print('Unable to write the transferred hash index: ', index_path)
+
+
+def drop_transferred_fn(gdf, hash_index):
+    """ Drop the observations that have already been transferred (row hash in the hash index).
+
+    :param gdf: geo-dataframe object containing the new feature type specific data.
+    :param hash_index: dictionary object returned by load_hash_index_fn.
+    :return gdf: geo-dataframe object containing the observations that have not been transferred.
+    :return hash_array: numpy array object containing the row hashes of the returned observations.
+    """
+    hash_array = row_hash_fn(gdf)
+    repeat = np.asarray(pd.Index(hash_array).isin(hash_index['hash_array']), dtype=bool)
+
+    if repeat.any():
+        print(' - ', int(repeat.sum()), ' observations have already been transferred and were removed: ')
+        print(gdf[repeat].groupby('PROPERTY', observed=True).size().to_string())
+        gdf = gdf[~repeat]
+        hash_array = hash_array[~repeat]
+
+    return gdf, hash_array
+
+
+def update_hash_index_fn(previous_transfer_path, hash_index, hash_array):
+    """ Add the hashes of newly transferred observations to the hash index and record the shapefile state.
+
+    :param previous_transfer_path: string object containing the path to the previous transfer dataset.
+    :param hash_index: dictionary object returned by load_hash_index_fn.
+    :param hash_array: numpy array object containing the hashes of the transferred observations.
+    """
+    hash_index['hash_array'] = np.union1d(hash_index['hash_array'], hash_array)
+    hash_index['source_stat'] = source_stat_fn(previous_transfer_path)
+    write_hash_index_fn(previous_transfer_path, hash_index)
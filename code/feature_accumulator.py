@@ -0,0 +1,135 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+feature_accumulator.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+# import modules
+from __future__ import print_function, division
+import warnings
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import compact_dtypes
+
+warnings.filterwarnings("ignore")
+
+
+def new_accumulator_fn(feature_type):
+    """ Create an empty feature type specific accumulator. Validated geo-dataframes are appended one file at a time as
+    column chunks (numpy arrays) so that the per-file geo-dataframes can be released as soon as they have been read.
+    The low cardinality text features (compact_dtypes.CATEGORY_COLUMN_LIST) are held as integer category codes.
+
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :return accumulator: dictionary object containing the feature type, column order, crs, column chunks, the category
+    (value: code) dictionary of each categorical feature and the number of files and rows appended.
+    """
+    return {'feature_type': feature_type,
+            'columns': None,
+            'crs': None,
+            'chunk_dict': {},
+            'category_dict': {},
+            'n_files': 0,
+            'n_rows': 0}
+
+
+def category_codes_fn(category_dict, values):
+    """ Encode the values of a single file as category codes, adding values not seen in an earlier file to the
+    category dictionary. Each distinct value is looked up once.
+
+    :param category_dict: dictionary object containing the category value (key) and code (value) of the feature.
+    :param values: numpy array object containing the values of the feature.
+    :return codes: numpy array object containing the category code of each value (-1 for nulls).
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    lookup = np.empty(len(uniques) + 1, dtype=np.int32)
+    lookup[:-1] = [category_dict.setdefault(value, len(category_dict)) for value in uniques]
+    # code -1 (null) selects the final element.
+    lookup[-1] = -1
+
+    return lookup[codes]
+
+
+def append_gdf_fn(accumulator, gdf):
+    """ Append the columns of a validated geo-dataframe to the accumulator. The first geo-dataframe fixes the column
+    order and crs - later geo-dataframes must have the same columns and are reprojected if their crs differs.
+
+    :param accumulator: dictionary object returned by new_accumulator_fn.
+    :param gdf: geo-dataframe object that has passed the column check (check_column_names_fn).
+    :return appended: boolean object, False if the columns do not match the accumulator.
+    """
+    columns = tuple(gdf.columns)
+    if accumulator['columns'] is None:
+        accumulator['columns'] = columns
+        accumulator['crs'] = gdf.crs
+        accumulator['chunk_dict'] = {column: [] for column in columns}
+        accumulator['category_dict'] = {column: {} for column in columns
+                                        if column in compact_dtypes.CATEGORY_COLUMN_LIST}
+
+    elif columns != accumulator['columns']:
+        return False
+
+    elif gdf.crs is not None and accumulator['crs'] is not None and gdf.crs != accumulator['crs']:
+        gdf = gdf.to_crs(accumulator['crs'])
+
+    for column in columns:
+        if column == gdf.geometry.name:
+            accumulator['chunk_dict'][column].append(np.asarray(gdf.geometry.values, dtype=object))
+        elif column in accumulator['category_dict']:
+            accumulator['chunk_dict'][column].append(
+                category_codes_fn(accumulator['category_dict'][column], gdf[column].values))
+        else:
+            accumulator['chunk_dict'][column].append(np.asarray(gdf[column].values))
+
+    accumulator['n_files'] += 1
+    accumulator['n_rows'] += len(gdf.index)
+
+    return True
+
+
+def build_gdf_fn(accumulator):
+    """ Build the merged geo-dataframe from the accumulated column chunks. Each column is concatenated once and its
+    chunks are released straight away, so the data is never held twice in full. The category code columns are built
+    as pandas categoricals.
+
+    :param accumulator: dictionary object returned by new_accumulator_fn.
+    :return gdf: geo-dataframe object containing every appended observation (RangeIndex) or None if nothing has been
+    appended.
+    """
+    if accumulator['columns'] is None:
+        return None
+
+    chunk_dict = accumulator['chunk_dict']
+    data = {}
+    for column in accumulator['columns']:
+        data[column] = np.concatenate(chunk_dict.pop(column))
+        if column in accumulator['category_dict']:
+            data[column] = pd.Categorical.from_codes(data[column],
+                                                     categories=list(accumulator['category_dict'][column]))
+
+    geometry = 'geometry' if 'geometry' in data else accumulator['columns'][-1]
+    gdf = gpd.GeoDataFrame(data, columns=list(accumulator['columns']), geometry=geometry, crs=accumulator['crs'])
+
+    accumulator['chunk_dict'] = {}
+
+    return gdf
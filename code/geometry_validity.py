@@ -0,0 +1,182 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+geometry_validity.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+# import modules
+from __future__ import print_function, division
+import warnings
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import compact_dtypes
+
+try:
+    # shapely >= 2.0 - vectorized coordinate counts and repair.
+    from shapely import get_num_coordinates, make_valid as make_valid_array
+except ImportError:
+    get_num_coordinates = None
+    make_valid_array = None
+
+try:
+    # shapely >= 1.8
+    from shapely.validation import make_valid
+except ImportError:
+    make_valid = None
+
+warnings.filterwarnings("ignore")
+
+# geometry types accepted for each feature type after repair.
+GEOM_FAMILY_DICT = {'points': ['Point', 'MultiPoint'],
+                    'lines': ['LineString', 'MultiLineString'],
+                    'polygons': ['Polygon', 'MultiPolygon'],
+                    'paddocks': ['Polygon', 'MultiPolygon']}
+
+# minimum and maximum number of vertices per observation for each feature type.
+MIN_VERTEX_DICT = {'points': 1, 'lines': 2, 'polygons': 4, 'paddocks': 4}
+MAX_VERTICES = 250000
+
+
+def count_vertices_fn(geom):
+    """ Count the vertices of a single geometry (used when shapely < 2.0).
+
+    :param geom: shapely geometry object or None.
+    :return count: integer object containing the number of vertices.
+    """
+    if geom is None or geom.is_empty:
+        return 0
+    if hasattr(geom, 'geoms'):
+        return sum(count_vertices_fn(part) for part in geom.geoms)
+    if geom.geom_type == 'Polygon':
+        return len(geom.exterior.coords) + sum(len(ring.coords) for ring in geom.interiors)
+
+    return len(geom.coords)
+
+
+def vertex_count_fn(geometry):
+    """ Count the vertices of every geometry in a geo-series.
+
+    :param geometry: geo-series object.
+    :return count_array: numpy array object containing the number of vertices per observation.
+    """
+    geom_array = np.asarray(geometry.values, dtype=object)
+    if get_num_coordinates is not None:
+        return np.asarray(get_num_coordinates(geom_array), dtype=np.int64)
+
+    return np.fromiter((count_vertices_fn(geom) for geom in geom_array), dtype=np.int64, count=len(geom_array))
+
+
+def repair_geometry_fn(geometry, feature_type):
+    """ Repair invalid geometries in bulk with make_valid (buffer(0) for polygons when make_valid is not available or
+    returns a geometry of the wrong type).
+
+    :param geometry: geo-series object containing invalid geometries.
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :return repaired: geo-series object containing the repaired geometries.
+    """
+    if make_valid_array is not None:
+        repaired = gpd.GeoSeries(make_valid_array(np.asarray(geometry.values, dtype=object)),
+                                 index=geometry.index, crs=geometry.crs)
+    elif make_valid is not None:
+        repaired = geometry.apply(lambda geom: make_valid(geom) if geom is not None else None)
+        repaired = gpd.GeoSeries(repaired, index=geometry.index, crs=geometry.crs)
+    else:
+        repaired = geometry.copy()
+
+    if feature_type in ['polygons', 'paddocks']:
+        wrong_type = ~np.array(repaired.geom_type.isin(GEOM_FAMILY_DICT[feature_type]), dtype=bool)
+        if make_valid_array is None and make_valid is None:
+            wrong_type[:] = True
+        if wrong_type.any():
+            buffered = geometry[wrong_type].buffer(0)
+            repaired = repaired.copy()
+            repaired[wrong_type] = buffered.values
+
+    return repaired
+
+
+def validity_check_fn(geometry, feature_type):
+    """ Run the vectorized validity checks over a geo-series.
+
+    :param geometry: geo-series object.
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :return check_df: dataframe object containing the null, empty, invalid, vertex and wrong_type check per row.
+    """
+    null = np.array(geometry.isna(), dtype=bool)
+    empty = null | np.array(geometry.is_empty, dtype=bool)
+    invalid = ~empty & ~np.array(geometry.is_valid, dtype=bool)
+    vertex_count = vertex_count_fn(geometry)
+    vertex = ~empty & ((vertex_count < MIN_VERTEX_DICT[feature_type]) | (vertex_count > MAX_VERTICES))
+    wrong_type = ~empty & ~np.array(geometry.geom_type.isin(GEOM_FAMILY_DICT[feature_type]), dtype=bool)
+
+    return pd.DataFrame({'empty': empty, 'invalid': invalid, 'vertex': vertex, 'wrong_type': wrong_type},
+                        index=geometry.index)
+
+
+def main_routine(gdf, feature_type):
+    """ Check the validity of every geometry of the feature type specific geo-dataframe, repair invalid geometries in
+    bulk and tag the STATUS feature ('Geom Repaired'). Observations with empty, irreparable or vertex limit geometries
+    are removed and returned in fault_gdf (STATUS 'Failed Geom Valid').
+
+    :param gdf: geo-dataframe object containing the concatenated feature type specific data.
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :return gdf: geo-dataframe object containing the valid (and repaired) observations.
+    :return fault_gdf: geo-dataframe object containing the observations that failed the checks or None.
+    """
+    print('-' * 50)
+    print('Checking geometry validity.........')
+    check_df = validity_check_fn(gdf.geometry, feature_type)
+
+    invalid = check_df['invalid'].values
+    repaired_mask = np.zeros(len(gdf.index), dtype=bool)
+    if invalid.any():
+        geometry = gdf.geometry.copy()
+        repaired = repair_geometry_fn(geometry[invalid], feature_type)
+        geometry[invalid] = repaired.values
+        repair_check_df = validity_check_fn(geometry[invalid], feature_type)
+        repaired_mask[invalid] = ~repair_check_df.any(axis=1).values
+        check_df.loc[repaired_mask, 'invalid'] = False
+        # replace only the geometries that are now valid.
+        geometry[~repaired_mask] = gdf.geometry[~repaired_mask].values
+        gdf = gdf.set_geometry(geometry.values, crs=gdf.crs)
+
+    fault = check_df.any(axis=1).values
+
+    if 'STATUS' in gdf.columns:
+        status = np.asarray(gdf['STATUS'].values, dtype=object)
+        compact_dtypes.set_column_fn(gdf, 'STATUS', np.where(repaired_mask & (status != 'ERROR'), 'Geom Repaired',
+                                                             status))
+
+    print(' - ', int(repaired_mask.sum()), ' geometries repaired, ', int(fault.sum()), ' geometries failed.')
+
+    if fault.any():
+        fault_gdf = gdf[fault].copy()
+        compact_dtypes.set_column_fn(fault_gdf, 'STATUS', np.full(len(fault_gdf.index), 'Failed Geom Valid',
+                                                                  dtype=object))
+        print(fault_gdf.groupby('PROPERTY', observed=True).size().to_string())
+        gdf = gdf[~fault]
+    else:
+        fault_gdf = None
+
+    return gdf, fault_gdf
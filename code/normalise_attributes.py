@@ -0,0 +1,165 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+normalise_attributes.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import warnings
+import numpy as np
+import pandas as pd
+import compact_dtypes
+
+warnings.filterwarnings("ignore")
+
+# attribute normalisation rules applied to the concatenated geo-dataframe, keyed by column name. '*' applies to every
+# text column. Each rule may contain:
+#  - 'strip': bool, remove leading and trailing white space.
+#  - 'case': string ('upper', 'lower' or 'title').
+#  - 'map': dictionary of exact value replacements (applied after strip and case).
+#  - 'fill': value used to replace nulls.
+#  - 'export': bool, only apply the rule to the per-property Server_Upload returns (property_export) - export rules are
+#    not applied to the concatenated geo-dataframe, so the transferred data is unchanged.
+# A column specific 'map' is merged with the '*' map of the same stage; everything else comes from the column specific
+# rule.
+NORMALISE_RULE_DICT = {
+    'PROPERTY': {'strip': True, 'case': 'upper', 'fill': ''},
+    'SOURCE': {'map': {'NTG Rangelands Monitoring Branch': 'NTG Rangeland Monitoring Branch'}},
+    'LABEL': {'map': {'Not recorded': '', 'Not Recorded': ''}},
+    '*': {'map': {'Not Recorded': ''}, 'export': True},
+}
+
+
+def stage_rule_dict_fn(rule_dict, export=False):
+    """ Select the rules applied at a single stage (concatenation or export).
+
+    :param rule_dict: dictionary object containing the normalisation rules.
+    :param export: boolean object, True to select the export rules.
+    :return rule_dict: dictionary object containing the rules of the stage.
+    """
+    return {column: rule for column, rule in rule_dict.items() if bool(rule.get('export')) == export}
+
+
+def column_rule_fn(column, rule_dict):
+    """ Merge the column specific rule with the rule applied to every text column ('*').
+
+    :param column: string object containing the column name.
+    :param rule_dict: dictionary object containing the normalisation rules.
+    :return rule: dictionary object containing the rule to apply to the column.
+    """
+    rule = {key: value for key, value in rule_dict.get(column, {}).items() if key != 'export'}
+    value_map = dict(rule_dict.get('*', {}).get('map', {}))
+    value_map.update(rule.get('map', {}))
+    rule['map'] = value_map
+
+    return rule
+
+
+def normalise_value_fn(value, rule):
+    """ Apply a single rule to a single (distinct) value.
+
+    :param value: value to be normalised.
+    :param rule: dictionary object containing the rule (column_rule_fn).
+    :return value: normalised value.
+    """
+    if isinstance(value, str):
+        if rule.get('strip'):
+            value = value.strip()
+
+        case = rule.get('case')
+        if case == 'upper':
+            value = value.upper()
+        elif case == 'lower':
+            value = value.lower()
+        elif case == 'title':
+            value = value.title()
+
+    return rule['map'].get(value, value)
+
+
+def normalise_column_fn(series, rule):
+    """ Normalise a column in one vectorized pass - the rule is evaluated once per distinct value and the results are
+    broadcast back over the rows through the factorized codes.
+
+    :param series: pandas series object containing the column.
+    :param rule: dictionary object containing the rule (column_rule_fn).
+    :return values: numpy array object containing the normalised column (categorical if the column is categorical).
+    """
+    if compact_dtypes.is_categorical_fn(series):
+        return normalise_categorical_fn(series, rule)
+
+    codes, uniques = pd.factorize(series)
+    normalised = np.empty(len(uniques) + 1, dtype=object)
+    normalised[:-1] = [normalise_value_fn(value, rule) for value in uniques]
+    # code -1 (null) selects the final element.
+    normalised[-1] = rule.get('fill', np.nan)
+
+    return normalised[codes]
+
+
+def normalise_categorical_fn(series, rule):
+    """ Normalise a categorical column by applying the rule to its categories only - categories that normalise to the
+    same value are merged and the column stays categorical.
+
+    :param series: pandas series object containing the categorical column.
+    :param rule: dictionary object containing the rule (column_rule_fn).
+    :return values: pandas categorical object containing the normalised column.
+    """
+    normalised = [normalise_value_fn(value, rule) for value in series.cat.categories]
+    if 'fill' in rule:
+        normalised.append(rule['fill'])
+    codes, categories = pd.factorize(np.asarray(normalised, dtype=object))
+    # code -1 (null) selects the final element - the fill value or null.
+    lookup = codes if 'fill' in rule else np.append(codes, -1)
+
+    return pd.Categorical.from_codes(lookup[series.cat.codes.values], categories=categories)
+
+
+def normalise_attributes_fn(gdf, rule_dict=None, export=False):
+    """ Apply every normalisation rule (trim, case, value maps and null handling) of a stage to the geo-dataframe. Each
+    text column is scanned once regardless of the number of rules that apply to it.
+
+    :param gdf: geo-dataframe object containing the concatenated feature data (or an export copy).
+    :param rule_dict: dictionary object containing the normalisation rules (default NORMALISE_RULE_DICT).
+    :param export: boolean object, True to apply the export rules (property_export) instead of the concatenation rules.
+    :return gdf: geo-dataframe object with normalised attributes.
+    """
+    if rule_dict is None:
+        rule_dict = NORMALISE_RULE_DICT
+    rule_dict = stage_rule_dict_fn(rule_dict, export)
+
+    for column in gdf.columns:
+        if column == 'geometry':
+            continue
+        # numeric and date columns are only normalised when they have their own rule.
+        if column not in rule_dict and not (pd.api.types.is_string_dtype(gdf[column])
+                                            or compact_dtypes.is_categorical_fn(gdf[column])):
+            continue
+
+        rule = column_rule_fn(column, rule_dict)
+        if not rule['map'] and len(rule) == 1:
+            continue
+
+        gdf[column] = normalise_column_fn(gdf[column], rule)
+
+    return gdf
@@ -0,0 +1,147 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+output_writer.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import threading
+import traceback
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+warnings.filterwarnings("ignore")
+
+# number of background threads writing to the network share.
+DEFAULT_OUTPUT_WORKERS = 4
+# maximum number of queued (not yet completed) write jobs before submit_fn blocks the pipeline.
+DEFAULT_MAX_PENDING = 32
+
+
+def start_writer_fn(workers=DEFAULT_OUTPUT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+    """ Start a background output writer. Write jobs (shapefile, csv, copy, delete) are queued with submit_fn and run
+    on a bounded thread pool while the pipeline continues - the pipeline only waits in flush_fn.
+
+    :param workers: integer object containing the number of background write threads (0 = no writer).
+    :param max_pending: integer object containing the maximum number of queued write jobs.
+    :return writer: dictionary object containing the writer state or None if workers is 0 (synchronous writes).
+    """
+    if workers is None or int(workers) < 1:
+        return None
+
+    return {'executor': ThreadPoolExecutor(max_workers=int(workers)),
+            'semaphore': threading.BoundedSemaphore(max(1, int(max_pending))),
+            'job_list': [],
+            'tail_dict': {}}
+
+
+def run_job_fn(previous, fn, args):
+    """ Run a single write job once the previous job with the same key has finished. A job is skipped (raises) if the
+    previous job with the same key failed, so that i.e. a hash index is not updated after a failed append.
+
+    :param previous: future object of the previous job with the same key or None.
+    :param fn: function object performing the write.
+    :param args: tuple object containing the fn arguments.
+    :return: the fn return value.
+    """
+    if previous is not None and previous.exception() is not None:
+        raise RuntimeError("skipped - a previous write to the same output failed.")
+
+    return fn(*args)
+
+
+def submit_fn(writer, description, fn, *args, key=None):
+    """ Queue a write job on the background writer. Jobs sharing a key (i.e. the output file path) run in submission
+    order; unrelated jobs run concurrently. The call blocks (backpressure) while the queue is full. The objects passed
+    in args must not be modified by the pipeline once queued. When writer is None the job is run immediately.
+
+    :param writer: dictionary object returned by start_writer_fn or None.
+    :param description: string object describing the job (reported by flush_fn).
+    :param fn: function object performing the write.
+    :param args: fn arguments.
+    :param key: hashable object identifying the output written by the job (None = no ordering constraint).
+    :return result: the fn return value if writer is None, otherwise the job future.
+    """
+    if writer is None:
+        return fn(*args)
+
+    writer['semaphore'].acquire()
+    previous = writer['tail_dict'].get(key) if key is not None else None
+    try:
+        future = writer['executor'].submit(run_job_fn, previous, fn, args)
+    except Exception:
+        writer['semaphore'].release()
+        raise
+
+    future.add_done_callback(lambda f: writer['semaphore'].release())
+    if key is not None:
+        writer['tail_dict'][key] = future
+    writer['job_list'].append((description, future))
+
+    return future
+
+
+def flush_fn(writer):
+    """ Flush barrier - wait for every queued write job and report them in submission order. Job errors are printed
+    with their traceback and returned rather than raised.
+
+    :param writer: dictionary object returned by start_writer_fn or None.
+    :return error_list: list object containing a (description, traceback string) tuple per failed job.
+    """
+    error_list = []
+    if writer is None:
+        return error_list
+
+    job_list = writer['job_list']
+    writer['job_list'] = []
+    writer['tail_dict'] = {}
+
+    print('=' * 50)
+    print('Waiting for ', len(job_list), ' queued output jobs....')
+
+    for description, future in job_list:
+        error = future.exception()
+        if error is None:
+            print(' - complete: ', description)
+        else:
+            tb = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+            print('ERROR - output job failed: ', description)
+            print(tb)
+            error_list.append((description, tb))
+
+    print(' - ', len(job_list) - len(error_list), ' of ', len(job_list), ' output jobs completed.')
+
+    return error_list
+
+
+def close_writer_fn(writer):
+    """ Flush and shut down the background writer.
+
+    :param writer: dictionary object returned by start_writer_fn or None.
+    :return error_list: list object returned by flush_fn.
+    """
+    error_list = flush_fn(writer)
+    if writer is not None:
+        writer['executor'].shutdown(wait=True)
+
+    return error_list
@@ -0,0 +1,122 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+pastoral_estate_index.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import os
+import pickle
+import warnings
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+warnings.filterwarnings("ignore")
+
+# increment when the structure of the index changes so that old binary caches are rebuilt.
+INDEX_VERSION = 2
+
+# library versions the cached geo-dataframe was pickled with - a geopandas, shapely or pandas upgrade rebuilds the
+# index rather than unpickling objects from an older version.
+LIBRARY_VERSION = (gpd.__version__, shapely.__version__, pd.__version__)
+
+# index loaded once per run, keyed by Pastoral Estate shapefile path.
+_INDEX_CACHE = {}
+
+
+def index_cache_path_fn(pastoral_estate):
+    """ Return the path to the on-disk binary cache of the Pastoral Estate index.
+
+    :param pastoral_estate: string object containing the path to the Pastoral Estate shapefile.
+    :return cache_path: string object containing the path to the pickle cache.
+    """
+    return os.path.splitext(pastoral_estate)[0] + '_index.pickle'
+
+
+def build_pastoral_estate_index_fn(pastoral_estate, source_mtime):
+    """ Read the Pastoral Estate shapefile and build the property name set, the PROPERTY -> DISTRICT and
+    PROPERTY -> PROP_TAG dictionaries and the property boundary geo-dataframe (PROPERTY and geometry only).
+
+    :param pastoral_estate: string object containing the path to the Pastoral Estate shapefile.
+    :param source_mtime: float object containing the modification time of the Pastoral Estate shapefile.
+    :return estate_index: dictionary object containing the Pastoral Estate index.
+    """
+    pastoral_estate_gdf = gpd.read_file(pastoral_estate)
+    property_list = pastoral_estate_gdf.PROPERTY.tolist()
+
+    estate_index = {'version': INDEX_VERSION,
+                    'library_version': LIBRARY_VERSION,
+                    'source': pastoral_estate,
+                    'source_mtime': source_mtime,
+                    'property_name_set': set(property_list),
+                    'prop_dist_dict': dict(zip(property_list, pastoral_estate_gdf.DISTRICT.tolist())),
+                    'prop_tag_dict': dict(zip(property_list, pastoral_estate_gdf.PROP_TAG.tolist())),
+                    'estate_gdf': pastoral_estate_gdf[['PROPERTY', 'geometry']].reset_index(drop=True)}
+
+    return estate_index
+
+
+def load_pastoral_estate_index_fn(pastoral_estate):
+    """ Load the Pastoral Estate index once per run. The index is read from the on-disk binary cache when the cache was
+    built from the current version of the shapefile (modification time), otherwise it is rebuilt and the cache
+    rewritten.
+
+    :param pastoral_estate: string object containing the path to the Pastoral Estate shapefile.
+    :return estate_index: dictionary object containing the property name set ('property_name_set') and the
+    PROPERTY -> DISTRICT ('prop_dist_dict') and PROPERTY -> PROP_TAG ('prop_tag_dict') dictionaries and the property
+    boundaries ('estate_gdf').
+    """
+    source_mtime = os.path.getmtime(pastoral_estate)
+
+    estate_index = _INDEX_CACHE.get(pastoral_estate)
+    if estate_index is not None and estate_index['source_mtime'] == source_mtime:
+        return estate_index
+
+    cache_path = index_cache_path_fn(pastoral_estate)
+    estate_index = None
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                estate_index = pickle.load(f)
+        except Exception:
+            # the cache is always safe to rebuild (i.e. unreadable, or pickled by an incompatible library version).
+            estate_index = None
+
+        if not isinstance(estate_index, dict) or (estate_index.get('version') != INDEX_VERSION
+                                                  or estate_index.get('library_version') != LIBRARY_VERSION
+                                                  or estate_index.get('source_mtime') != source_mtime):
+            estate_index = None
+
+    if estate_index is None:
+        print('Building the Pastoral Estate index: ', pastoral_estate)
+        estate_index = build_pastoral_estate_index_fn(pastoral_estate, source_mtime)
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump(estate_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            print('Unable to write the Pastoral Estate index cache: ', cache_path)
+
+    _INDEX_CACHE[pastoral_estate] = estate_index
+
+    return estate_index
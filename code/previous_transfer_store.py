@@ -0,0 +1,238 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+previous_transfer_store.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+# import modules
+from __future__ import print_function, division
+import os
+import sys
+import sqlite3
+import warnings
+import fiona
+import compact_dtypes
+import duplicate_index
+
+warnings.filterwarnings("ignore")
+
+# attributes indexed within the previous transfer GeoPackage.
+INDEX_COLUMN_LIST = ['PROPERTY', 'DATE_CURR']
+
+# table within the GeoPackage recording the state of the shapefile each layer was last synchronised with.
+SOURCE_TABLE = 'pipeline_source'
+
+
+def store_path_fn(file_path):
+    """ Return the path and layer name of the previous transfer GeoPackage that backs a previous transfer shapefile.
+
+    :param file_path: string object containing the path to the previous_transfer_*_gda94.shp shapefile.
+    :return store_path: string object containing the path to the GeoPackage.
+    :return layer: string object containing the GeoPackage layer name.
+    """
+    base_path = os.path.splitext(file_path)[0]
+
+    return base_path + '.gpkg', os.path.basename(base_path)
+
+
+def shapefile_schema_fn(file_path):
+    """ Read the schema of a shapefile without reading any records.
+
+    :param file_path: string object containing the path to the shapefile.
+    :return schema: dictionary object containing the fiona schema.
+    """
+    with fiona.open(file_path) as src:
+        return src.schema
+
+
+def create_index_fn(store_path, layer):
+    """ Create the PROPERTY/DATE_CURR index on the GeoPackage layer (GeoPackages are SQLite databases).
+
+    :param store_path: string object containing the path to the GeoPackage.
+    :param layer: string object containing the GeoPackage layer name.
+    """
+    conn = sqlite3.connect(store_path)
+    try:
+        column_set = set(row[1] for row in conn.execute('PRAGMA table_info("{0}")'.format(layer)))
+        column_list = [column for column in INDEX_COLUMN_LIST if column in column_set]
+        if column_list:
+            conn.execute('CREATE INDEX IF NOT EXISTS "idx_{0}_{1}" ON "{0}" ({2})'.format(
+                layer, '_'.join(column_list).lower(), ', '.join('"{0}"'.format(column) for column in column_list)))
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def store_schema_fn(schema):
+    """ Return the GeoPackage schema for a shapefile schema - shapefiles do not separate single and multi-part
+    geometries (other than points) so the GeoPackage layer accepts both.
+
+    :param schema: dictionary object containing the fiona schema of the shapefile.
+    :return store_schema: dictionary object containing the fiona schema of the GeoPackage layer.
+    """
+    geometry = schema['geometry'].replace('Multi', '')
+    store_schema = dict(schema)
+    store_schema['geometry'] = (geometry, 'Multi' + geometry)
+
+    return store_schema
+
+
+def feature_records_fn(gdf, field_list):
+    """ Convert a geo-dataframe to fiona records holding exactly the fields of an existing schema (features not in the
+    schema are dropped and missing features are written as null).
+
+    :param gdf: geo-dataframe object.
+    :param field_list: list object containing the schema field names.
+    :return record_list: list object containing one fiona record (dictionary) per observation.
+    """
+    record_list = []
+    for feature in compact_dtypes.decategorise_fn(gdf).iterfeatures(na='null'):
+        properties = feature['properties']
+        record_list.append({'geometry': feature['geometry'],
+                            'properties': {field: properties.get(field) for field in field_list}})
+
+    return record_list
+
+
+def read_source_fn(store_path, layer):
+    """ Read the state of the shapefile the GeoPackage layer was last synchronised with.
+
+    :param store_path: string object containing the path to the GeoPackage.
+    :param layer: string object containing the GeoPackage layer name.
+    :return source: tuple object containing the shapefile (modification time, size) and a boolean, True if the
+    shapefile holds every observation in the layer - or None if the state has not been recorded.
+    """
+    conn = sqlite3.connect(store_path)
+    try:
+        row = conn.execute('SELECT mtime, size, synced FROM "{0}" WHERE layer = ?'.format(SOURCE_TABLE),
+                           (layer,)).fetchone()
+    except sqlite3.Error:
+        row = None
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+
+    return (row[0], row[1]), bool(row[2])
+
+
+def record_source_fn(store_path, layer, file_path, synced):
+    """ Record the current state of the previous transfer shapefile within the GeoPackage.
+
+    :param store_path: string object containing the path to the GeoPackage.
+    :param layer: string object containing the GeoPackage layer name.
+    :param file_path: string object containing the path to the previous_transfer_*_gda94.shp shapefile.
+    :param synced: boolean object, True if the shapefile holds every observation in the layer.
+    """
+    mtime, size = duplicate_index.source_stat_fn(file_path)
+    conn = sqlite3.connect(store_path)
+    try:
+        conn.execute('CREATE TABLE IF NOT EXISTS "{0}" (layer TEXT PRIMARY KEY, mtime REAL, size INTEGER, '
+                     'synced INTEGER)'.format(SOURCE_TABLE))
+        conn.execute('INSERT OR REPLACE INTO "{0}" VALUES (?, ?, ?, ?)'.format(SOURCE_TABLE),
+                     (layer, mtime, size, int(synced)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def open_store_fn(file_path):
+    """ Return the previous transfer GeoPackage, seeding it from the previous transfer shapefile (read once) if it
+    does not exist yet. The GeoPackage is seeded again when the shapefile has been edited since it was last
+    synchronised, and the pipeline is shutdown if the shapefile was edited while it did not hold every observation in
+    the GeoPackage (the two can not be merged).
+
+    :param file_path: string object containing the path to the previous_transfer_*_gda94.shp shapefile.
+    :return store_path: string object containing the path to the GeoPackage.
+    :return layer: string object containing the GeoPackage layer name.
+    """
+    store_path, layer = store_path_fn(file_path)
+
+    if os.path.isfile(store_path):
+        source = read_source_fn(store_path, layer)
+        if source is None or source[0] != duplicate_index.source_stat_fn(file_path):
+            if source is not None and not source[1]:
+                print("ERROR - ", file_path, " has been edited but does not hold the observations appended to ",
+                      store_path)
+                print("Solution:")
+                print("1. Merge the edits into the GeoPackage or the missing observations into the shapefile.")
+                print("2. Delete the GeoPackage so that it is seeded from the shapefile.")
+                print("3. Re run pipeline")
+                sys.exit()
+
+            print(' - The previous transfer shapefile has changed since it was loaded: ', file_path)
+            os.remove(store_path)
+
+        elif not source[1]:
+            print("WARNING - ", file_path, " does not hold the observations appended to ", store_path,
+                  " - run without --no_previous_transfer_snapshot to update it.")
+
+    if not os.path.isfile(store_path):
+        print(' - Seeding the previous transfer GeoPackage from: ', file_path)
+        with fiona.open(file_path) as src:
+            with fiona.open(store_path, 'w', driver="GPKG", layer=layer, schema=store_schema_fn(src.schema),
+                            crs_wkt=src.crs_wkt) as dst:
+                dst.writerecords(src)
+        create_index_fn(store_path, layer)
+        record_source_fn(store_path, layer, file_path, True)
+
+    return store_path, layer
+
+
+def append_fn(store_path, layer, gdf):
+    """ Append new observations to the previous transfer GeoPackage - only the new rows are written. Features not in
+    the layer schema are dropped and missing features are written as null.
+
+    :param store_path: string object containing the path to the GeoPackage.
+    :param layer: string object containing the GeoPackage layer name.
+    :param gdf: geo-dataframe object containing the new observations.
+    """
+    with fiona.open(store_path, 'a', layer=layer) as dst:
+        record_list = feature_records_fn(gdf, list(dst.schema['properties']))
+        dst.writerecords(record_list)
+
+    print(' - ', len(record_list), ' observations appended to: ', store_path)
+
+
+def export_snapshot_fn(store_path, layer, file_path, schema):
+    """ Export the previous transfer GeoPackage to a shapefile sorted by PROPERTY and DATE_CURR.
+
+    :param store_path: string object containing the path to the GeoPackage.
+    :param layer: string object containing the GeoPackage layer name.
+    :param file_path: string object containing the path to the output shapefile.
+    :param schema: dictionary object containing the fiona schema of the shapefile.
+    """
+    with fiona.open(store_path, layer=layer) as src:
+        crs_wkt = src.crs_wkt
+        record_list = list(src)
+
+    # nulls are sorted first.
+    record_list.sort(key=lambda record: tuple((record['properties'].get(column) is not None,
+                                               str(record['properties'].get(column) or ''))
+                                              for column in INDEX_COLUMN_LIST))
+
+    with fiona.open(file_path, 'w', driver="ESRI Shapefile", schema=schema, crs_wkt=crs_wkt) as dst:
+        dst.writerecords(record_list)
+
+    print(' - Previous transfer snapshot exported: ', file_path)
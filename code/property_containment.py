@@ -0,0 +1,138 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+property_containment.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+# import modules
+from __future__ import print_function, division
+import warnings
+import numpy as np
+import pandas as pd
+import compact_dtypes
+
+warnings.filterwarnings("ignore")
+
+# Pastoral Estate spatial index built once per process, keyed by (shapefile path, modification time).
+_SINDEX_CACHE = {}
+
+
+def estate_sindex_fn(pastoral_estate_index):
+    """ Return the spatial index of the Pastoral Estate property boundaries, building it on first use.
+
+    :param pastoral_estate_index: dictionary object containing the Pastoral Estate index
+    (pastoral_estate_index.load_pastoral_estate_index_fn).
+    :return sindex: spatial index object of the estate_gdf geometries.
+    """
+    key = (pastoral_estate_index['source'], pastoral_estate_index['source_mtime'])
+    sindex = _SINDEX_CACHE.get(key)
+    if sindex is None:
+        sindex = pastoral_estate_index['estate_gdf'].sindex
+        _SINDEX_CACHE[key] = sindex
+
+    return sindex
+
+
+def bulk_query_fn(sindex, geom_array, estate_geom_array):
+    """ Bulk query the spatial index with every feature geometry and return the intersecting (feature, property)
+    pairs. Uses the bulk query of the spatial index when the installed geopandas provides one, otherwise the index
+    bounding box search followed by the exact test against the candidate properties only.
+
+    :param sindex: spatial index object of the Pastoral Estate property boundaries.
+    :param geom_array: numpy array object containing the feature geometries.
+    :param estate_geom_array: numpy array object containing the Pastoral Estate property boundaries.
+    :return input_array: numpy array object containing the feature positions of each intersecting pair.
+    :return tree_array: numpy array object containing the property positions of each intersecting pair.
+    """
+    for method in ['query_bulk', 'query']:
+        query = getattr(sindex, method, None)
+        if query is None:
+            continue
+        try:
+            result = np.asarray(query(geom_array, predicate='intersects'))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if result.ndim == 2:
+            return result[0], result[1]
+
+    input_list = []
+    tree_list = []
+    for i, geom in enumerate(geom_array):
+        if geom is None or geom.is_empty:
+            continue
+        for j in sindex.intersection(geom.bounds):
+            if estate_geom_array[j].intersects(geom):
+                input_list.append(i)
+                tree_list.append(j)
+
+    return np.asarray(input_list, dtype=np.int64), np.asarray(tree_list, dtype=np.int64)
+
+
+def main_routine(gdf, pastoral_estate_index):
+    """ Confirm that every observation intersects the Pastoral Estate boundary of the property it names (PROPERTY).
+    Observations outside their property are flagged (STATUS 'Outside Property', ERROR is never overwritten) and the
+    property they fall within is suggested.
+
+    :param gdf: geo-dataframe object containing the feature type specific data.
+    :param pastoral_estate_index: dictionary object containing the Pastoral Estate index
+    (pastoral_estate_index.load_pastoral_estate_index_fn).
+    :return gdf: geo-dataframe object with the STATUS feature updated.
+    """
+    print('-' * 50)
+    print('Checking features fall within their property.........')
+    estate_gdf = pastoral_estate_index['estate_gdf']
+    sindex = estate_sindex_fn(pastoral_estate_index)
+
+    geometry = gdf.geometry
+    if gdf.crs is not None and estate_gdf.crs is not None and gdf.crs != estate_gdf.crs:
+        geometry = geometry.to_crs(estate_gdf.crs)
+
+    geom_array = np.asarray(geometry.values, dtype=object)
+    input_array, tree_array = bulk_query_fn(sindex, geom_array, np.asarray(estate_gdf.geometry.values, dtype=object))
+
+    pair_df = pd.DataFrame({'feature': input_array,
+                            'property': np.asarray(gdf['PROPERTY'].values, dtype=object)[input_array],
+                            'estate_property': np.asarray(estate_gdf['PROPERTY'].values, dtype=object)[tree_array]})
+
+    inside = np.zeros(len(gdf.index), dtype=bool)
+    inside[pair_df.loc[pair_df['property'] == pair_df['estate_property'], 'feature'].values] = True
+
+    # features of properties that are not in the Pastoral Estate have already been flagged by step1_3.
+    known = np.array(gdf['PROPERTY'].isin(pastoral_estate_index['property_name_set']), dtype=bool)
+    outside = known & ~inside
+
+    if outside.any():
+        status = np.asarray(gdf['STATUS'].values, dtype=object)
+        compact_dtypes.set_column_fn(gdf, 'STATUS', np.where(outside & (status != 'ERROR'), 'Outside Property', status))
+
+        suggest_df = pair_df[outside[pair_df['feature'].values]].drop_duplicates('feature')
+        suggest_dict = dict(zip(suggest_df['feature'], suggest_df['estate_property']))
+        report_df = pd.DataFrame({'PROPERTY': np.asarray(gdf['PROPERTY'].values, dtype=object)[outside],
+                                  'SUGGESTED': [suggest_dict.get(i, 'NOT IN PASTORAL ESTATE')
+                                                for i in np.flatnonzero(outside)]})
+        print(' - ', int(outside.sum()), ' observations are outside the property they name: ')
+        print(report_df.groupby(['PROPERTY', 'SUGGESTED']).size().to_string())
+    else:
+        print(' - all observations fall within their property.')
+
+    return gdf
@@ -0,0 +1,179 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+property_export.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import compact_dtypes
+import normalise_attributes
+import stage_checkpoint
+
+warnings.filterwarnings("ignore")
+
+# pastoral district names (lower case, underscored) that do not match their Pastoral_Districts sub-directory.
+DISTRICT_DIR_DICT = {'northern_alice_springs': 'northern_alice',
+                     'southern_alice_springs': 'southern_alice',
+                     'victoria_river': 'vrd'}
+
+# maximum number of property partitions written to the network share concurrently.
+DEFAULT_EXPORT_WORKERS = 4
+
+
+def district_dir_fn(district):
+    """ Convert a DISTRICT value to its Pastoral_Districts sub-directory name (i.e. Victoria River -> vrd).
+
+    :param district: string object containing the pastoral district name.
+    :return district_dir: string object containing the pastoral district sub-directory name.
+    """
+    dist = str(district).replace(' ', '_').lower()
+
+    return DISTRICT_DIR_DICT.get(dist, dist)
+
+
+def property_dir_table_fn(gdf, pastoral_districts_path, year, feature_type):
+    """ Resolve the Server_Upload output directory of every property in the geo-dataframe once - the DISTRICT and
+    PROP_TAG of the first observation of each property are used.
+
+    :param gdf: geo-dataframe object containing property specific data.
+    :param pastoral_districts_path: string object containing the path to the pastoral districts directory.
+    :param year: integer object containing the year YYYY.
+    :param feature_type: string object containing the Shapely feature type (i.e. points, lines)
+    :return dir_df: dataframe object containing the DISTRICT, PROP_TAG and output_path of each property (index).
+    """
+    dir_df = pd.DataFrame(gdf[['PROPERTY', 'DISTRICT', 'PROP_TAG']]).groupby('PROPERTY', sort=False).first()
+
+    output_path_list = []
+    for prop_, dist_, prop_code in zip(dir_df.index, dir_df['DISTRICT'], dir_df['PROP_TAG']):
+        property_name = "{0}_{1}".format(str(prop_code).lower(), str(prop_).replace(' ', '_').lower())
+        output_path_list.append(os.path.join(pastoral_districts_path, district_dir_fn(dist_), property_name,
+                                             'infrastructure', 'server_upload', str(year), feature_type))
+
+    dir_df['output_path'] = output_path_list
+
+    return dir_df
+
+
+def write_partition_fn(prop_filter, output_path, shp_name, csv_name):
+    """ Write a single property partition to its Server_Upload directory as a shapefile and csv.
+
+    :param prop_filter: geo-dataframe object containing the property specific data (no categorical features).
+    :param output_path: string object containing the path to the property Server_Upload feature type directory.
+    :param shp_name: string object containing the shapefile name.
+    :param csv_name: string object containing the csv name.
+    :return output: string object containing the path to the shapefile written.
+    """
+    if not os.path.exists(output_path):
+        os.mkdir(output_path)
+
+    output = "{0}\\{1}".format(output_path, shp_name)
+    prop_filter.to_file(output, driver="ESRI Shapefile")
+    prop_filter.to_csv("{0}\\{1}".format(output_path, csv_name))
+
+    return output
+
+
+def export_partitions_fn(gdf, pastoral_districts_path, feature_type, year, shp_name, csv_name, upload=None,
+                         workers=DEFAULT_EXPORT_WORKERS, writer=None, checkpoint_dir=None, output_part=None):
+    """ Split the geo-dataframe by PROPERTY once (groupby) and write each property partition to its Server_Upload
+    directory concurrently through a bounded thread pool. Partitions are reported in property order and any write
+    error is raised once every submitted write has finished. When a background writer is supplied the partitions are
+    queued on it instead (keyed by shapefile path) and this function returns without waiting. Partitions completed by
+    a resumed run (stage_checkpoint) are not written again.
+
+    :param gdf: geo-dataframe object containing property specific data.
+    :param pastoral_districts_path: string object containing the path to the pastoral districts directory.
+    :param feature_type: string object containing the Shapely feature type (i.e. points, lines)
+    :param year: integer object containing the year YYYY.
+    :param shp_name: string object containing the shapefile name written to each property.
+    :param csv_name: string object containing the csv name written to each property.
+    :param upload: string object written to the UPLOAD feature (i.e. Transition) or None to write the partitions
+    without an UPLOAD feature (the Server_Upload pre-screen treats any file with UPLOAD as already transitioned).
+    :param workers: integer object containing the maximum number of concurrent partition writes.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None.
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
+    :param output_part: string object passed to stage_checkpoint.output_id_fn (part) or None.
+    :return output_list: list object containing the path to each shapefile written (or queued).
+    """
+    if len(gdf.index) == 0:
+        return []
+
+    # decategorise, apply the export normalisation rules (i.e. blank 'Not Recorded') and flag the frame once - the
+    # caller's geo-dataframe is not modified.
+    export_gdf = normalise_attributes.normalise_attributes_fn(compact_dtypes.decategorise_fn(gdf).copy(), export=True)
+    if upload is None:
+        export_gdf = export_gdf.drop(columns=['UPLOAD'], errors='ignore')
+    else:
+        export_gdf = export_gdf.assign(UPLOAD=upload)
+    dir_df = property_dir_table_fn(export_gdf, pastoral_districts_path, year, feature_type)
+
+    partition_list = []
+    for prop_, prop_filter in export_gdf.groupby('PROPERTY', sort=False):
+        output_path = dir_df.at[prop_, 'output_path']
+        output = "{0}\\{1}".format(output_path, shp_name)
+        output_id = stage_checkpoint.output_id_fn('server_upload', output, output_part)
+        if stage_checkpoint.output_state_fn(checkpoint_dir, output_id, 'complete'):
+            print(' - Already written by the resumed run: ', output)
+            continue
+
+        partition_list.append((prop_, prop_filter, output_path, output, output_id))
+
+    if writer is not None:
+        for prop_, prop_filter, output_path, output, output_id in partition_list:
+            stage_checkpoint.submit_output_fn(
+                writer, checkpoint_dir, output_id, "{0} Server Upload: {1}".format(prop_, output), write_partition_fn,
+                prop_filter, output_path, shp_name, csv_name, key=output)
+            print(" -- Cleaned data queued for ", prop_, " Server Upload directory.")
+
+        return [output for _, _, _, output, _ in partition_list]
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        future_list = []
+        for prop_, prop_filter, output_path, output, output_id in partition_list:
+            stage_checkpoint.mark_output_fn(checkpoint_dir, output_id, 'issued')
+            future_list.append((prop_, executor.submit(stage_checkpoint.checkpoint_job_fn, checkpoint_dir, output_id,
+                                                       write_partition_fn, prop_filter, output_path, shp_name,
+                                                       csv_name)))
+
+    output_list = []
+    error_list = []
+    for prop_, future in future_list:
+        try:
+            output = future.result()
+        except Exception as error:
+            print("ERROR - ", prop_, " data could not be returned to the Server Upload directory: ", error)
+            error_list.append(error)
+            continue
+
+        print(" -- Cleaned data has been returned to ", prop_, " Server Upload directory.")
+        print(' -- ', output)
+        output_list.append(output)
+
+    if error_list:
+        raise error_list[0]
+
+    return output_list
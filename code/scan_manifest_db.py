@@ -0,0 +1,186 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+scan_manifest_db.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import os
+import hashlib
+import sqlite3
+import warnings
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+warnings.filterwarnings("ignore")
+
+# outcomes that do not need to be re-read while the file is unchanged.
+SKIP_OUTCOMES = ('transitioned', 'faulty')
+
+
+def open_scan_manifest_fn(transition_dir):
+    """ Open (or create) the persistent scan manifest (SQLite) within the transition directory.
+
+    :param transition_dir: string object containing the path to the transition directory.
+    :return conn: sqlite3 connection object to the scan manifest.
+    """
+    db_path = os.path.join(transition_dir, "scan_manifest.sqlite")
+    print("Scan manifest: ", db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS scan_manifest ("
+                 "path TEXT PRIMARY KEY, year TEXT, mtime REAL, size INTEGER, hash TEXT, outcome TEXT, "
+                 "last_seen TEXT)")
+    conn.commit()
+
+    return conn
+
+
+def load_scan_manifest_fn(conn):
+    """ Read the persistent scan manifest into a dictionary.
+
+    :param conn: sqlite3 connection object to the scan manifest.
+    :return history_dict: dictionary object containing the path (key) and a (mtime, size, hash, outcome) tuple (value).
+    """
+    history_dict = {}
+    for path, mtime, size, hash_, outcome in conn.execute(
+            "SELECT path, mtime, size, hash, outcome FROM scan_manifest"):
+        history_dict[path] = (mtime, size, hash_, outcome)
+
+    return history_dict
+
+
+def content_hash_fn(file_path):
+    """ Calculate a sha1 content hash over the .shp and .dbf of a shapefile (or the file itself for other types).
+
+    :param file_path: string object containing the path to the file.
+    :return hash_: string object containing the hex digest or None if the file could not be read.
+    """
+    sha = hashlib.sha1()
+    path_list = [file_path]
+    if file_path.lower().endswith('.shp'):
+        path_list.append(file_path[:-4] + '.dbf')
+
+    try:
+        for path in path_list:
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+    except OSError:
+        return None
+
+    return sha.hexdigest()
+
+
+def filter_unchanged_fn(history_dict, record_list, workers=1):
+    """ Remove files that were seen by a previous run, have an outcome in SKIP_OUTCOMES and are unchanged. A file is
+    unchanged when its mtime and size match the manifest, or when they differ but the content hash does not.
+
+    :param history_dict: dictionary object returned by load_scan_manifest_fn.
+    :param record_list: list object containing the discovery manifest file records (shapefiles).
+    :param workers: integer object containing the number of threads used to hash files.
+    :return remaining_list: list object containing the records that must be read.
+    :return skipped_dict: dictionary object containing the skipped paths (key) and their previous outcome (value).
+    :return hash_dict: dictionary object containing any content hashes calculated (path: hash).
+    """
+    remaining_list = []
+    skipped_dict = {}
+    hash_check_list = []
+
+    for record in record_list:
+        previous = history_dict.get(record['path'])
+        if previous is None or previous[3] not in SKIP_OUTCOMES:
+            remaining_list.append(record)
+
+        elif (previous[0], previous[1]) == (record['mtime'], record['size']):
+            skipped_dict[record['path']] = previous[3]
+
+        else:
+            hash_check_list.append(record)
+
+    hash_dict = {}
+    if hash_check_list:
+        path_list = [record['path'] for record in hash_check_list]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            hash_dict = dict(zip(path_list, executor.map(content_hash_fn, path_list)))
+
+        for record in hash_check_list:
+            previous = history_dict[record['path']]
+            if hash_dict[record['path']] is not None and hash_dict[record['path']] == previous[2]:
+                skipped_dict[record['path']] = previous[3]
+            else:
+                remaining_list.append(record)
+
+    print(' - ', len(skipped_dict), ' unchanged files skipped (scan manifest), ', len(remaining_list),
+          ' new or changed files to check.')
+
+    return remaining_list, skipped_dict, hash_dict
+
+
+def record_outcomes_fn(conn, history_dict, record_list, outcome_dict, hash_dict, year, workers=1):
+    """ Write the outcome of every file seen by this run to the persistent scan manifest and remove the year's rows
+    for files that no longer exist. Content hashes are only recorded for files with an outcome in SKIP_OUTCOMES.
+
+    :param conn: sqlite3 connection object to the scan manifest.
+    :param history_dict: dictionary object returned by load_scan_manifest_fn.
+    :param record_list: list object containing all discovery manifest file records (shapefiles) for the year.
+    :param outcome_dict: dictionary object containing the path (key) and outcome (value) of each file seen.
+    :param hash_dict: dictionary object containing any content hashes already calculated (path: hash).
+    :param year: string object containing the year.
+    :param workers: integer object containing the number of threads used to hash files.
+    """
+    record_dict = {record['path']: record for record in record_list}
+
+    # only hash files that can be skipped by a later run (SKIP_OUTCOMES) and whose content is not already known - new
+    # files are never skipped, so their hash is not needed and is stored as NULL.
+    hash_list = []
+    for path, outcome in outcome_dict.items():
+        previous = history_dict.get(path)
+        record = record_dict[path]
+        if outcome not in SKIP_OUTCOMES:
+            hash_dict[path] = None
+            continue
+        if path in hash_dict:
+            continue
+        if previous is not None and (previous[0], previous[1]) == (record['mtime'], record['size']):
+            hash_dict[path] = previous[2]
+        else:
+            hash_list.append(path)
+
+    if hash_list:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            hash_dict.update(zip(hash_list, executor.map(content_hash_fn, hash_list)))
+
+    last_seen = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany("INSERT OR REPLACE INTO scan_manifest (path, year, mtime, size, hash, outcome, last_seen) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [(path, str(year), record_dict[path]['mtime'], record_dict[path]['size'], hash_dict[path],
+                       outcome, last_seen) for path, outcome in outcome_dict.items()])
+
+    # remove files that have been deleted or moved since the previous run.
+    stale_list = [(path,) for path, in conn.execute("SELECT path FROM scan_manifest WHERE year = ?", (str(year),))
+                  if path not in record_dict]
+    conn.executemany("DELETE FROM scan_manifest WHERE path = ?", stale_list)
+    conn.commit()
@@ -0,0 +1,202 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+server_upload_discovery.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import shapefile_ingest
+
+warnings.filterwarnings("ignore")
+
+# maximum number of concurrent directory listings sent to the network share.
+DEFAULT_DISCOVERY_WORKERS = 8
+
+
+def scandir_fn(path):
+    """ List a directory once with os.scandir, returning an empty list if the directory is missing or unreadable.
+
+    :param path: string object containing the path to a directory.
+    :return entries: list object containing os.DirEntry objects sorted by name.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        entries = []
+
+    entries.sort(key=lambda e: e.name.lower())
+
+    return entries
+
+
+def find_sub_dir_fn(entries, dir_name):
+    """ Return the path of a sub-directory matching dir_name (case insensitive) from a scandir listing.
+
+    :param entries: list object containing os.DirEntry objects.
+    :param dir_name: string object containing the sub-directory name (i.e. server_upload).
+    :return path: string object containing the sub-directory path or None if it does not exist.
+    """
+    for entry in entries:
+        if entry.name.lower() == dir_name.lower() and entry.is_dir():
+            return entry.path
+
+    return None
+
+
+def district_properties_fn(district_path):
+    """ Create a path to all property sub-directories within a single pastoral district.
+
+    :param district_path: string object containing the path to a pastoral district directory.
+    :return prop_list: list object containing the path to each property sub-directory.
+    """
+    return [entry.path for entry in scandir_fn(district_path) if entry.is_dir()]
+
+
+def scan_property_fn(prop_path, year, directory_list):
+    """ Walk a single property's infrastructure/server_upload/<year> sub-directory and record every candidate
+    shapefile (feature type sub-directories) and pdf map (pdf_maps sub-directory). The mtime and size recorded for a
+    shapefile combine the .shp and .dbf so that attribute only edits are detected. Faulty returns written by the
+    pipeline (shapefile_ingest.faulty_return_fn) are not candidates.
+
+    :param prop_path: string object containing the path to a property directory.
+    :param year: string object containing the year.
+    :param directory_list: list object containing the feature types/subdirectory names (i.e. points, lines etc.)
+    :return record_list: list object containing one dictionary per located file.
+    """
+    record_list = []
+
+    infra_path = find_sub_dir_fn(scandir_fn(prop_path), 'infrastructure')
+    if infra_path is None:
+        return record_list
+
+    upload_path = find_sub_dir_fn(scandir_fn(infra_path), 'server_upload')
+    if upload_path is None:
+        return record_list
+
+    year_path = find_sub_dir_fn(scandir_fn(upload_path), str(year))
+    if year_path is None:
+        return record_list
+
+    district_path, prop_name = os.path.split(prop_path)
+    district = os.path.basename(district_path)
+
+    sub_dir_dict = {feature_type.lower(): '.shp' for feature_type in directory_list}
+    sub_dir_dict['pdf_maps'] = '.pdf'
+
+    for sub_dir in scandir_fn(year_path):
+        feature_type = sub_dir.name.lower()
+        if feature_type not in sub_dir_dict or not sub_dir.is_dir():
+            continue
+
+        ext = sub_dir_dict[feature_type]
+        entries = scandir_fn(sub_dir.path)
+        # the .dbf stat comes from the same listing - attribute only edits do not change the .shp.
+        dbf_stat_dict = {entry.name.lower()[:-4]: entry.stat() for entry in entries
+                         if entry.name.lower().endswith('.dbf') and entry.is_file()}
+
+        for entry in entries:
+            if ext == '.shp' and shapefile_ingest.faulty_return_fn(entry.name):
+                continue
+
+            if entry.name.lower().endswith(ext) and entry.is_file():
+                stat = entry.stat()
+                mtime = stat.st_mtime
+                size = stat.st_size
+                dbf_stat = dbf_stat_dict.get(entry.name.lower()[:-4])
+                if ext == '.shp' and dbf_stat is not None:
+                    mtime = max(mtime, dbf_stat.st_mtime)
+                    size = size + dbf_stat.st_size
+
+                record_list.append({'district': district,
+                                    'property': prop_name,
+                                    'prop_path': prop_path,
+                                    'year': str(year),
+                                    'feature_type': feature_type,
+                                    'ext': ext,
+                                    'path': entry.path,
+                                    'mtime': mtime,
+                                    'size': size})
+
+    return record_list
+
+
+def build_manifest_fn(pastoral_districts_path, year, directory_list, workers=DEFAULT_DISCOVERY_WORKERS):
+    """ Walk the Pastoral Districts directory once, listing every district and property concurrently through a bounded
+    thread pool, and return an in-memory manifest of every candidate shapefile and pdf map for the year.
+
+    :param pastoral_districts_path: string object containing the path to the Pastoral Districts directory.
+    :param year: string object containing the year.
+    :param directory_list: list object containing the feature types/subdirectory names (i.e. points, lines etc.)
+    :param workers: integer object containing the maximum number of concurrent directory listings.
+    :return manifest: dictionary object containing the property paths ('properties') and file records ('files').
+    """
+    district_list = [entry.path for entry in scandir_fn(pastoral_districts_path) if entry.is_dir()]
+    print("dir_list: ", [os.path.basename(i) for i in district_list])
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+        prop_list = []
+        for district_prop_list in executor.map(district_properties_fn, district_list):
+            prop_list.extend(district_prop_list)
+
+        file_list = []
+        for record_list in executor.map(lambda p: scan_property_fn(p, year, directory_list), prop_list):
+            file_list.extend(record_list)
+
+    print(' - ', len(prop_list), ' property directories scanned, ', len(file_list), ' candidate files located.')
+
+    return {'year': str(year), 'properties': prop_list, 'files': file_list}
+
+
+def manifest_shapefiles_fn(manifest, directory_list):
+    """ Return the manifest shapefiles ordered by property and then by feature type (directory_list order).
+
+    :param manifest: dictionary object returned by build_manifest_fn.
+    :param directory_list: list object containing the feature types/subdirectory names (i.e. points, lines etc.)
+    :return shp_list: list object containing (feature_type, path) tuples.
+    """
+    feature_order = [feature_type.lower() for feature_type in directory_list]
+    shp_list = [record for record in manifest['files'] if record['ext'] == '.shp']
+    shp_list.sort(key=lambda r: (r['prop_path'].lower(), feature_order.index(r['feature_type']), r['path'].lower()))
+
+    return [(record['feature_type'], record['path']) for record in shp_list]
+
+
+def manifest_pdf_maps_fn(manifest):
+    """ Return the manifest pdf maps grouped by pdf_maps sub-directory.
+
+    :param manifest: dictionary object returned by build_manifest_fn.
+    :return pdf_dict: dictionary object containing pdf_maps directory paths (key) and sorted pdf paths (value).
+    """
+    pdf_dict = {}
+    for record in manifest['files']:
+        if record['ext'] == '.pdf':
+            pdf_dict.setdefault(os.path.dirname(record['path']), []).append(record['path'])
+
+    for pdf_list in pdf_dict.values():
+        pdf_list.sort(key=str.lower)
+
+    return pdf_dict
@@ -0,0 +1,201 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+shapefile_ingest.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import os
+import re
+import struct
+import warnings
+import fiona
+import geopandas as gpd
+from geopandas.io.file import infer_schema
+
+warnings.filterwarnings("ignore")
+
+# shapefile records keyed by file path - each shapefile is read from the network share once per run.
+_RECORD_CACHE = {}
+
+# faulty returns written to the property Server_Upload directories by step1_6 (i.e. lines_faulty_20210701_093000.shp).
+FAULTY_RETURN_REGEX = re.compile(r'_faulty_\d{8}_\d{6}\.shp$', re.IGNORECASE)
+
+
+def crs_from_collection_fn(src):
+    """ Extract the coordinate reference system from an open fiona collection (mirrors geopandas.read_file).
+
+    :param src: open fiona collection object.
+    :return crs: coordinate reference system (epsg init string, wkt string) or None if the shapefile has no crs.
+    """
+    if src.crs and len(src.crs) == 1 and "init" in src.crs:
+        crs = src.crs["init"]
+    else:
+        crs = src.crs_wkt
+
+    if not crs:
+        crs = None
+
+    return crs
+
+
+def read_dbf_fields_fn(file_path):
+    """ Read the field descriptors of a shapefile directly from the .dbf header, without opening the shapefile or
+    reading any records or geometry.
+
+    :param file_path: string object containing the path to the shapefile.
+    :return field_list: list object containing a (name, type, width, decimals) tuple per field or None if the .dbf is
+    missing or unreadable.
+    """
+    base_path = os.path.splitext(file_path)[0]
+    dbf_path = None
+    for ext in ['.dbf', '.DBF']:
+        if os.path.isfile(base_path + ext):
+            dbf_path = base_path + ext
+            break
+
+    if dbf_path is None:
+        return None
+
+    try:
+        with open(dbf_path, 'rb') as f:
+            header = f.read(32)
+            header_length = struct.unpack('<H', header[8:10])[0]
+            descriptors = f.read(header_length - 32)
+    except (OSError, struct.error):
+        return None
+
+    field_list = []
+    for i in range(0, len(descriptors), 32):
+        descriptor = descriptors[i:i + 32]
+        # the field descriptor array is terminated by a carriage return (0x0D).
+        if len(descriptor) < 32 or descriptor[:1] == b'\r':
+            break
+        field_list.append((descriptor[:11].split(b'\x00')[0].decode('latin-1'), descriptor[11:12].decode('latin-1'),
+                           descriptor[16], descriptor[17]))
+
+    return field_list
+
+
+def read_dbf_field_names_fn(file_path):
+    """ Read the field names of a shapefile directly from the .dbf header.
+
+    :param file_path: string object containing the path to the shapefile.
+    :return field_list: list object containing the field names or None if the .dbf is missing or unreadable.
+    """
+    field_list = read_dbf_fields_fn(file_path)
+    if field_list is None:
+        return None
+
+    return [name for name, _, _, _ in field_list]
+
+
+def faulty_return_fn(file_path):
+    """ Return True if the shapefile is a faulty return written by the pipeline (step1_6) - faulty returns are a copy
+    of data that has already been processed and are only processed again once they have been corrected and renamed.
+
+    :param file_path: string object containing the path to the shapefile.
+    :return faulty_return: boolean object.
+    """
+    return FAULTY_RETURN_REGEX.search(os.path.basename(file_path)) is not None
+
+
+def prescreen_shapefile_fn(file_path):
+    """ Decide from the .dbf header alone whether a shapefile is new, has already been transitioned (UPLOAD column or
+    a faulty return) or has a faulty schema (unreadable header or no DELETE column).
+
+    :param file_path: string object containing the path to the shapefile.
+    :return screen: string object containing 'new', 'transitioned' or 'faulty'.
+    :return field_list: list object containing the field names or None if the header could not be read.
+    """
+    field_list = read_dbf_field_names_fn(file_path)
+
+    if faulty_return_fn(file_path):
+        screen = 'transitioned'
+    elif field_list is None:
+        screen = 'faulty'
+    elif 'UPLOAD' in field_list:
+        screen = 'transitioned'
+    elif 'DELETE' not in field_list and 'DELETE_' not in field_list:
+        screen = 'faulty'
+    else:
+        screen = 'new'
+
+    return screen, field_list
+
+
+def read_shapefile_record_fn(file_path):
+    """ Read a shapefile once and store the geo-dataframe, schema, crs and geometry types in a cached record. Every
+    later stage of the pipeline reuses the cached record rather than re-opening the file.
+
+    :param file_path: string object containing the path to the shapefile.
+    :return record: dictionary object containing the path, gdf, schema, crs and geom_types of the shapefile (gdf is None
+    once the record has been released by release_record_gdf_fn).
+    """
+    record = _RECORD_CACHE.get(file_path)
+    if record is not None:
+        return record
+
+    with fiona.open(file_path) as src:
+        schema = src.schema
+        crs = crs_from_collection_fn(src)
+        columns = list(schema["properties"]) + ["geometry"]
+        gdf = gpd.GeoDataFrame.from_features(src, crs=crs, columns=columns)
+
+    record = {'path': file_path,
+              'gdf': gdf,
+              'schema': schema,
+              'crs': crs,
+              'geom_types': sorted(gdf.geom_type.dropna().unique().tolist())}
+
+    _RECORD_CACHE[file_path] = record
+
+    return record
+
+
+def update_record_gdf_fn(file_path, gdf):
+    """ Replace the geo-dataframe held in a cached record after the pipeline has written the file back to disk.
+
+    :param file_path: string object containing the path to the shapefile.
+    :param gdf: geo-dataframe object that has been written to file_path (stored, not copied).
+    """
+    record = read_shapefile_record_fn(file_path)
+    record['gdf'] = gdf
+    record['schema'] = infer_schema(gdf)
+    record['geom_types'] = sorted(gdf.geom_type.dropna().unique().tolist())
+
+
+def release_record_gdf_fn(file_path):
+    """ Release the geo-dataframe held in a cached record once its data has been accumulated - the schema, crs and
+    geometry types are kept.
+
+    :param file_path: string object containing the path to the shapefile.
+    """
+    record = _RECORD_CACHE.get(file_path)
+    if record is not None:
+        record['gdf'] = None
+
+
+def clear_record_cache_fn():
+    """ Release all cached shapefile records. """
+    _RECORD_CACHE.clear()
@@ -0,0 +1,276 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+stage_checkpoint.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import os
+import hashlib
+import pickle
+import shutil
+import warnings
+from glob import glob
+import output_writer
+
+warnings.filterwarnings("ignore")
+
+# bump when the contents of a checkpoint change so that older checkpoints are ignored.
+CHECKPOINT_VERSION = 1
+# sub-directory of the run export directory (primary_output_dir) holding the stage checkpoints.
+CHECKPOINT_DIR = 'checkpoints'
+# sub-directory of the checkpoint directory holding a marker file per issued and per completed output.
+OUTPUT_DIR = 'outputs'
+
+
+def checkpoint_dir_fn(primary_output_dir):
+    """ Create (if required) and return the checkpoint directory of a pipeline run.
+
+    :param primary_output_dir: string object containing the path to the run export directory.
+    :return checkpoint_dir: string object containing the path to the checkpoint directory.
+    """
+    checkpoint_dir = os.path.join(primary_output_dir, CHECKPOINT_DIR)
+    if not os.path.isdir(checkpoint_dir):
+        os.makedirs(checkpoint_dir)
+
+    return checkpoint_dir
+
+
+def checkpoint_path_fn(checkpoint_dir, stage, feature_type=None):
+    """ Create the path to a stage checkpoint (i.e. step1_4_points.pickle).
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory.
+    :param stage: string object containing the stage name (i.e. step1_2).
+    :param feature_type: string object containing the feature type or None for a whole pipeline stage.
+    :return checkpoint_path: string object containing the path to the checkpoint.
+    """
+    name = stage if feature_type is None else "{0}_{1}".format(stage, feature_type.lower())
+
+    return os.path.join(checkpoint_dir, name + '.pickle')
+
+
+def write_checkpoint_fn(checkpoint_dir, stage, data, feature_type=None):
+    """ Write a stage checkpoint - the pickle is written to a temporary file and renamed so that a failed write never
+    leaves a partial checkpoint.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    :param stage: string object containing the stage name (i.e. step1_2).
+    :param data: dictionary object containing the stage outputs.
+    :param feature_type: string object containing the feature type or None for a whole pipeline stage.
+    """
+    if checkpoint_dir is None:
+        return
+
+    checkpoint_path = checkpoint_path_fn(checkpoint_dir, stage, feature_type)
+    temp_path = checkpoint_path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'version': CHECKPOINT_VERSION, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, checkpoint_path)
+    except OSError:
+        print('Unable to write the stage checkpoint: ', checkpoint_path)
+        return
+
+    print(' - Checkpoint written: ', checkpoint_path)
+
+
+def load_checkpoint_fn(checkpoint_dir, stage, feature_type=None):
+    """ Load a stage checkpoint.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    :param stage: string object containing the stage name (i.e. step1_2).
+    :param feature_type: string object containing the feature type or None for a whole pipeline stage.
+    :return data: dictionary object containing the stage outputs or None if the stage has not been completed.
+    """
+    if checkpoint_dir is None:
+        return None
+
+    checkpoint_path = checkpoint_path_fn(checkpoint_dir, stage, feature_type)
+    if not os.path.isfile(checkpoint_path):
+        return None
+
+    try:
+        with open(checkpoint_path, 'rb') as f:
+            checkpoint = pickle.load(f)
+    except Exception:
+        # the stage is always safe to re-run (i.e. unreadable, or pickled by an incompatible library version).
+        print('Unable to read the stage checkpoint: ', checkpoint_path)
+        return None
+
+    if not isinstance(checkpoint, dict) or checkpoint.get('version') != CHECKPOINT_VERSION:
+        print('Stage checkpoint is out of date and will be ignored: ', checkpoint_path)
+        return None
+
+    print(' - Resuming from checkpoint: ', checkpoint_path)
+
+    return checkpoint['data']
+
+
+def output_id_fn(output_type, path, part=None):
+    """ Create the identifier of a single output (i.e. a property Server_Upload partition) - the path is normalised so
+    that the identifier does not depend on how the path was built. The parts are separated by '|' (not valid in a path).
+
+    :param output_type: string object containing the output type (i.e. for_migration, server_upload).
+    :param path: string object containing the path to the output.
+    :param part: string object distinguishing repeated writes to the same output within a run (i.e. the previous
+    transfer layer the data was filtered against) or None.
+    :return output_id: string object containing the output identifier.
+    """
+    output_id = "{0}|{1}".format(output_type, os.path.normcase(os.path.normpath(path)))
+    if part is not None:
+        output_id = "{0}|{1}".format(output_id, part)
+
+    return output_id
+
+
+def output_marker_path_fn(checkpoint_dir, output_id, state):
+    """ Create the path to the marker file recording the state of an output.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory.
+    :param output_id: string object returned by output_id_fn.
+    :param state: string object containing 'issued' or 'complete'.
+    :return marker_path: string object containing the path to the marker file.
+    """
+    name = hashlib.sha1(output_id.encode('utf-8')).hexdigest()
+
+    return os.path.join(checkpoint_dir, OUTPUT_DIR, "{0}.{1}".format(name, state))
+
+
+def mark_output_fn(checkpoint_dir, output_id, state):
+    """ Record the state of an output - one marker file per output and state, so that background write threads and
+    feature type worker processes never share a file.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    :param output_id: string object returned by output_id_fn.
+    :param state: string object containing 'issued' or 'complete'.
+    """
+    if checkpoint_dir is None:
+        return
+
+    marker_path = output_marker_path_fn(checkpoint_dir, output_id, state)
+    if not os.path.isdir(os.path.dirname(marker_path)):
+        os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+
+    with open(marker_path, 'w') as f:
+        f.write(output_id)
+
+
+def output_state_fn(checkpoint_dir, output_id, state):
+    """ Check whether an output has reached a state in this run.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    :param output_id: string object returned by output_id_fn.
+    :param state: string object containing 'issued' or 'complete'.
+    :return: boolean object, True if the output has reached the state.
+    """
+    if checkpoint_dir is None:
+        return False
+
+    return os.path.isfile(output_marker_path_fn(checkpoint_dir, output_id, state))
+
+
+def issued_output_path_set_fn(checkpoint_dir, output_type):
+    """ Return the (normalised) path of every output of a type issued by a run.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    :param output_type: string object containing the output type (i.e. for_migration).
+    :return path_set: set object containing the normalised output paths.
+    """
+    path_set = set()
+    if checkpoint_dir is None:
+        return path_set
+
+    for marker_path in glob(os.path.join(checkpoint_dir, OUTPUT_DIR, '*.issued')):
+        with open(marker_path) as f:
+            id_list = f.read().split('|')
+        if len(id_list) > 1 and id_list[0] == output_type:
+            path_set.add(id_list[1])
+
+    return path_set
+
+
+def checkpoint_job_fn(checkpoint_dir, output_id, fn, *args):
+    """ Run a write job and record the output as complete once it has succeeded.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    :param output_id: string object returned by output_id_fn.
+    :param fn: function object performing the write.
+    :param args: fn arguments.
+    :return result: the fn return value.
+    """
+    result = fn(*args)
+    mark_output_fn(checkpoint_dir, output_id, 'complete')
+
+    return result
+
+
+def submit_output_fn(writer, checkpoint_dir, output_id, description, fn, *args, key=None):
+    """ Issue a write job through the output writer, unless the output was already completed by the run being
+    resumed. The output is recorded as issued before the job is queued and as complete once the job has succeeded, so
+    a resumed run re-issues only the outputs that did not complete.
+
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    :param output_id: string object returned by output_id_fn.
+    :param description: string object describing the job.
+    :param fn: function object performing the write.
+    :param args: fn arguments.
+    :param key: hashable object identifying the output written by the job (output_writer ordering).
+    :return: boolean object, True if the job was issued, False if the output had already been completed.
+    """
+    if output_state_fn(checkpoint_dir, output_id, 'complete'):
+        print(' - Already written by the resumed run: ', description)
+        return False
+
+    mark_output_fn(checkpoint_dir, output_id, 'issued')
+    output_writer.submit_fn(writer, description, checkpoint_job_fn, checkpoint_dir, output_id, fn, *args, key=key)
+
+    return True
+
+
+def latest_run_dir_fn(output_dir, final_user):
+    """ Locate the most recent run export directory (user_YYYYMMDD_HHMM) that holds a step1_2 checkpoint.
+
+    :param output_dir: string object containing the path to the export directory (command argument).
+    :param final_user: string object containing the NTG user id.
+    :return run_dir: string object containing the path to the run export directory or None.
+    """
+    run_list = [path for path in glob(os.path.join(output_dir, "{0}_*".format(final_user)))
+                if os.path.isfile(checkpoint_path_fn(os.path.join(path, CHECKPOINT_DIR), 'step1_2'))]
+
+    if not run_list:
+        return None
+
+    # the directory names end in YYYYMMDD_HHMM - the greatest name is the most recent run.
+    return max(run_list, key=lambda path: os.path.basename(path))
+
+
+def clear_checkpoints_fn(checkpoint_dir):
+    """ Delete the checkpoint directory once the pipeline has completed.
+
+    :param checkpoint_dir: string object containing the path to the checkpoint directory or None (no checkpoints).
+    """
+    if checkpoint_dir is None:
+        return
+
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
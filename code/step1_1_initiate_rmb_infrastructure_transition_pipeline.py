@@ -40,11 +40,33 @@ import argparse
 import shutil
 import warnings
 from glob import glob
-import geopandas as gpd
+import pandas as pd
 import sys
+import io
+import contextlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import server_upload_discovery
+import scan_manifest_db
+import shapefile_ingest
+import pastoral_estate_index
+import compact_dtypes
+import geometry_validity
+import property_containment
+import output_writer
+import stage_checkpoint
+import step1_2_search_folders
+import step1_3_concatenate_clean
+import step1_4_area_length_currency_date
+import step1_5_export_data
+import step1_6_export_faulty_data
+import step1_7_pdf_maps
 
 warnings.filterwarnings("ignore")
 
+# shapefile component files copied with each original shapefile.
+SHAPEFILE_EXT_LIST = ['.shp', '.shx', '.dbf', '.prj', '.cpg', '.sbn', '.sbx', '.shp.xml']
+
 
 def cmd_args_fn():
     p = argparse.ArgumentParser(
@@ -71,6 +93,27 @@ def cmd_args_fn():
 
     p.add_argument('-y', '--year', type=str, help='Enter the year (i.e. 2001).')
 
+    p.add_argument('-w', '--workers', type=int, default=1,
+                   help='Number of worker threads used to read the Server_Upload shapefiles (default 1 = serial).')
+
+    p.add_argument('-pf', '--parallel_features', action='store_true',
+                   help='Run the points, lines, polygons and paddocks workflows (step1_3 - step1_5) in a process pool.')
+
+    p.add_argument('-f', '--full_scan', action='store_true',
+                   help='Ignore the persistent scan manifest and re-read every Server_Upload shapefile.')
+
+    p.add_argument('-nps', '--no_previous_transfer_snapshot', action='store_true',
+                   help='Do not export the sorted previous_transfer shapefiles from the previous transfer GeoPackages '
+                        '(the shapefiles will not hold the new observations).')
+
+    p.add_argument('-ow', '--output_workers', type=int, default=output_writer.DEFAULT_OUTPUT_WORKERS,
+                   help='Number of background threads writing outputs to the network share (0 = write in the '
+                        'foreground).')
+
+    p.add_argument('-rs', '--resume', action='store_true',
+                   help='Resume the most recent run from its last completed stage (stage checkpoints in the run '
+                        'output directory). The For Migration shapefile check is skipped.')
+
     cmd_args = p.parse_args()
 
     if cmd_args.year is None:
@@ -253,38 +296,76 @@ def assets_search_fn(search_criteria, folder):
     return files
 
 
-def delete_original_files(delete_files_list):
+def delete_shapefile_fn(file_path):
+    """ Delete a single original shapefile and its extension files. Every file is attempted and an OSError listing
+    the files that could not be deleted is raised afterwards.
+
+    :param file_path: string object containing the shapefile path without its extension.
+    """
+    error_list = []
+    if glob("{0}*".format(file_path)):
+        print("Deleting...")
+        for file in glob("{0}*".format(file_path)):
+
+            # Handle errors while calling os.remove()
+            try:
+                os.remove(file)
+                print(" - ", file)
+
+            except OSError:
+                print("Error while deleting file ", file)
+                error_list.append(file)
+
+    else:
+        print("No files in the were located....")
+
+    if error_list:
+        raise OSError("files could not be deleted: {0}".format(error_list))
+
+
+def delete_original_files(delete_files_list, writer=None):
     """ Delete all original shapefiles and extension files for geo-dataframes with no UPLOAD column.
 
    :param delete_files_list: string object containing file paths to all files with no UPLOAD column.
+   :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous deletes).
+   :return error_list: list object containing a (description, error string) tuple per failed foreground delete - queued
+   deletes are reported by output_writer.close_writer_fn.
    """
 
+    error_list = []
     for file in delete_files_list:
 
         file_path = (file[:-4])
         print('file_path: ', file_path)
 
-        if glob("{0}*".format(file_path)):
-            print("Deleting...")
-            for file in glob("{0}*".format(file_path)):
+        try:
+            output_writer.submit_fn(writer, "delete: {0}".format(file_path), delete_shapefile_fn, file_path,
+                                    key=file_path)
+        except OSError as error:
+            # raised by a foreground (writer is None) delete - the remaining originals are still deleted.
+            print("ERROR - ", error)
+            error_list.append(("delete: {0}".format(file_path), str(error)))
 
-                # Handle errors while calling os.remove()
-                try:
-                    os.remove(file)
-                    print(" - ", file)
+    return error_list
 
-                except:
-                    print("Error while deleting file ", file)
 
-        else:
-            print("No files in the were located....")
+def copy_shapefile_fn(file_base, export_base):
+    """ Copy a shapefile and its sidecar files byte for byte - the data is not read again.
+
+    :param file_base: string object containing the original shapefile path without its extension.
+    :param export_base: string object containing the export shapefile path without its extension.
+    """
+    for ext in SHAPEFILE_EXT_LIST:
+        if os.path.isfile(file_base + ext):
+            shutil.copy2(file_base + ext, export_base + ext)
 
 
-def copy_original_files(delete_files_list, primary_output_dir):
+def copy_original_files(delete_files_list, primary_output_dir, writer=None):
     """ Delete all original shapefiles and extension files for geo-dataframes with no UPLOAD column.
 
     :param primary_output_dir:
     :param delete_files_list: string object containing file paths to all files with no UPLOAD column.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous copies).
     """
 
     print("Copy original files")
@@ -294,10 +375,12 @@ def copy_original_files(delete_files_list, primary_output_dir):
 
         if file.endswith(".shp"):
             _, path1, path2, path3 = file.rsplit('\\', 3)
-            gdf = gpd.read_file(file, driver="ESRI Shapefile")
             export_path = os.path.join(primary_output_dir, "originals", path3)
             print("export file: ", export_path)
-            gdf.to_file(export_path, driver="ESRI Shapefile")
+            file_base = os.path.splitext(file)[0]
+            # the copy is keyed by the original so that it always completes before the original is deleted.
+            output_writer.submit_fn(writer, "copy: {0}".format(export_path), copy_shapefile_fn,
+                                    file_base, os.path.splitext(export_path)[0], key=file[:-4])
 
 
 def next_subfolder_fn(path_to_parent):
@@ -307,6 +390,102 @@ def next_subfolder_fn(path_to_parent):
         return []
 
 
+def feature_workflow_fn(gdf, feature_type, estate_index, transition_dir, year, pastoral_districts_path, date_str,
+                        datetime_object, snapshot=False, writer=None, checkpoint_dir=None):
+    """ Run the feature type specific workflow: clean (step1_3), geometry validity (geometry_validity), property
+    containment (property_containment), area/length (step1_4) and export (step1_5). The step1_4 result is checkpointed
+    and a resumed run starts from the checkpoint at step1_5.
+
+    :param gdf: geo-dataframe object containing the concatenated feature type specific data.
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :param estate_index: dictionary object containing the Pastoral Estate index (loaded once per run).
+    :param transition_dir: string object containing the path to the transition directory.
+    :param year: string object containing the year.
+    :param pastoral_districts_path: string object containing the path to the Pastoral Districts directory.
+    :param date_str: string object containing the run date and time (YYYYMMDD_HHMMSS).
+    :param datetime_object: datetime object containing the run date and time.
+    :param snapshot: boolean object, True to export a sorted previous transfer shapefile snapshot.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
+    :return fault_gdf: geo-dataframe object containing observations that failed the geometry validity check or step1_4
+    (i.e. line length) or None.
+    """
+    checkpoint = stage_checkpoint.load_checkpoint_fn(checkpoint_dir, 'step1_4', feature_type)
+    if checkpoint is None:
+        gdf, fault_gdf = clean_feature_fn(gdf, feature_type, estate_index, transition_dir, year)
+        stage_checkpoint.write_checkpoint_fn(
+            checkpoint_dir, 'step1_4', {'gdf': gdf, 'fault_gdf': fault_gdf}, feature_type)
+    else:
+        gdf, fault_gdf = checkpoint['gdf'], checkpoint['fault_gdf']
+
+    step1_5_export_data.main_routine(
+        gdf, feature_type, transition_dir, year, pastoral_districts_path, date_str, datetime_object, snapshot, writer,
+        checkpoint_dir)
+
+    return fault_gdf
+
+
+def clean_feature_fn(gdf, feature_type, estate_index, transition_dir, year):
+    """ Run the feature type specific clean (step1_3), geometry validity, property containment and area/length
+    (step1_4) stages.
+
+    :param gdf: geo-dataframe object containing the concatenated feature type specific data.
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :param estate_index: dictionary object containing the Pastoral Estate index (loaded once per run).
+    :param transition_dir: string object containing the path to the transition directory.
+    :param year: string object containing the year.
+    :return gdf: geo-dataframe object ready for export (step1_5).
+    :return fault_gdf: geo-dataframe object containing observations that failed the geometry validity check or step1_4
+    (i.e. line length) or None.
+    """
+    # call the categorise_fn function to add the feature type vocabulary to the categorical features (categorised as
+    # each file was accumulated) so that the corrections made in steps 3 - 5 do not add categories.
+    gdf = compact_dtypes.categorise_fn(gdf, compact_dtypes.vocabulary_fn(feature_type, estate_index))
+
+    gdf = step1_3_concatenate_clean.main_routine(
+        gdf, feature_type, estate_index, os.path.join(transition_dir, 'correction_cache'))
+
+    # call the geometry_validity main_routine to check and repair geometries before area and length are calculated.
+    gdf, geom_fault_gdf = geometry_validity.main_routine(gdf, feature_type)
+
+    # call the property_containment main_routine to flag features that fall outside the property they name.
+    gdf = property_containment.main_routine(gdf, estate_index)
+
+    gdf, transition_dir, year, feature_type, fault_gdf = step1_4_area_length_currency_date.main_routine(
+        gdf, feature_type, transition_dir, year)
+
+    fault_list = [i for i in [geom_fault_gdf, fault_gdf] if i is not None]
+    fault_gdf = pd.concat(fault_list) if fault_list else None
+
+    return gdf, fault_gdf
+
+
+def parallel_feature_workflow_fn(*args):
+    """ Process pool wrapper for feature_workflow_fn - the workflow log is captured so that it can be printed in
+    feature type order, and a pipeline shutdown (sys.exit) or error is returned rather than killing the worker.
+
+    :param args: feature_workflow_fn arguments.
+    :return log: string object containing everything the workflow printed.
+    :return exited: boolean object, True if the workflow called sys.exit().
+    :return error: string object containing the traceback of any error raised by the workflow, otherwise None.
+    :return fault_gdf: geo-dataframe object returned by feature_workflow_fn or None.
+    """
+    log = io.StringIO()
+    exited = False
+    error = None
+    fault_gdf = None
+
+    with contextlib.redirect_stdout(log):
+        try:
+            fault_gdf = feature_workflow_fn(*args)
+        except SystemExit:
+            exited = True
+        except Exception:
+            error = traceback.format_exc()
+
+    return log.getvalue(), exited, error, fault_gdf
+
+
 def main_routine():
     """ This pipeline hunts through the Pastoral Districts directory for shapefiles located within a properties
     Server_Upload sub-directory. Data undergoes several attribute and spatial checks, if individual property
@@ -325,6 +504,12 @@ def main_routine():
     transition_dir = cmd_args.transition_dir
     assets_dir = cmd_args.assets_dir
     year = cmd_args.year
+    workers = max(1, cmd_args.workers)
+    full_scan = cmd_args.full_scan
+    parallel_features = cmd_args.parallel_features
+    snapshot = not cmd_args.no_previous_transfer_snapshot
+    output_workers = cmd_args.output_workers
+    resume = cmd_args.resume
     # migration = cmd_args.migration_directory
 
     if not year:
@@ -346,12 +531,27 @@ def main_routine():
     print(date_str)
     
 
+    # call the user_id_fn function to extract the user id
+    final_user = user_id_fn(remote_desktop)
+
+    if resume:
+        # call the latest_run_dir_fn function to locate the export directory of the run being resumed.
+        primary_output_dir = stage_checkpoint.latest_run_dir_fn(output_dir, final_user)
+        if primary_output_dir is None:
+            print("ERROR - no checkpointed run located in: ", output_dir, " - pipeline shutdown.")
+            sys.exit()
+        # shapefiles written to the For Migration Directory by the run being resumed are expected.
+        migration_path_set = stage_checkpoint.issued_output_path_set_fn(
+            os.path.join(primary_output_dir, stage_checkpoint.CHECKPOINT_DIR), 'for_migration')
+    else:
+        migration_path_set = set()
+
     migration_dirs = next_subfolder_fn(for_migration)
     for dirs in migration_dirs:
         dir_path = os.path.join(for_migration, dirs)
         for files in glob(dir_path + "//*.shp"):
             print(files)
-            if files:
+            if files and os.path.normcase(os.path.normpath(files)) not in migration_path_set:
                 print("ERROR - shapefiles located in the For Migration Directory.")
 
                 sys.exit()
@@ -362,63 +562,151 @@ def main_routine():
 
     pastoral_estate = assets_search_fn("NT_Pastoral_Estate.shp", "assets\\shapefile")
 
-    # call the user_id_fn function to extract the user id
-    final_user = user_id_fn(remote_desktop)
+    # call the load_pastoral_estate_index_fn function to load the Pastoral Estate index once for every feature type.
+    estate_index = pastoral_estate_index.load_pastoral_estate_index_fn(pastoral_estate)
 
-    # call the export_file_path_fn function to create an export directory.
-    primary_output_dir = export_file_path_fn(output_dir, final_user)
+    if not resume:
+        # call the export_file_path_fn function to create an export directory.
+        primary_output_dir = export_file_path_fn(output_dir, final_user)
     print("primary_output_dir: ", primary_output_dir)
+    checkpoint_dir = stage_checkpoint.checkpoint_dir_fn(primary_output_dir)
     # create subdirectories within directories (command arguments)
     dir_folders_3_fn(primary_output_dir, 'originals')
     dir_folders_3_fn(primary_output_dir, 'faulty')
     dir_folders_2_fn(transition_dir, directory_list, 'previous_transfer')
     dir_folders_2_fn(transition_dir, directory_list, 'for_migration')
+    dir_folders_3_fn(transition_dir, 'correction_cache')
 
     # for_migration_path = os.path.join(transition_dir, str(year), "for_migration")
 
 
-    import step1_2_search_folders
-    delete_files_list, concat_list, feature_type_list = step1_2_search_folders.main_routine(
-        pastoral_districts_path, assets_dir, year, primary_output_dir, directory_list, date_str, datetime_object)
+    checkpoint = stage_checkpoint.load_checkpoint_fn(checkpoint_dir, 'step1_2') if resume else None
+    if checkpoint is not None:
+        if checkpoint['year'] != year:
+            print("ERROR - the checkpointed run collected ", checkpoint['year'], " data - pipeline shutdown.")
+            sys.exit()
+
+        # the resumed run keeps the original run date so that every export shares the same date string.
+        manifest = checkpoint['manifest']
+        delete_files_list = checkpoint['delete_files_list']
+        concat_list = checkpoint['concat_list']
+        feature_type_list = checkpoint['feature_type_list']
+        date_str = checkpoint['date_str']
+        datetime_object = checkpoint['datetime_object']
+        print("Resuming run: ", date_str)
+
+    else:
+        # call the build_manifest_fn function to walk the Pastoral Districts directory once and list every candidate
+        # shapefile and pdf map for the year - consumed by step1_2 (shapefiles) and step1_7 (pdf maps).
+        manifest = server_upload_discovery.build_manifest_fn(pastoral_districts_path, year, directory_list)
+
+        # call the open_scan_manifest_fn function to open the persistent scan manifest so that unchanged files seen by
+        # a previous run are not read again.
+        if full_scan:
+            scan_db = None
+        else:
+            scan_db = scan_manifest_db.open_scan_manifest_fn(transition_dir)
+
+        delete_files_list, concat_list, feature_type_list = step1_2_search_folders.main_routine(
+            pastoral_districts_path, assets_dir, year, primary_output_dir, directory_list, date_str, datetime_object,
+            manifest, workers, scan_db)
+
+        if scan_db is not None:
+            scan_db.close()
+
+        stage_checkpoint.write_checkpoint_fn(
+            checkpoint_dir, 'step1_2', {'year': year, 'manifest': manifest, 'delete_files_list': delete_files_list,
+                                        'concat_list': concat_list, 'feature_type_list': feature_type_list,
+                                        'date_str': date_str, 'datetime_object': datetime_object})
     # for loop through feature types and feature type specific geo-dataframes
 
+    # call the start_writer_fn function to move network share writes onto background threads - the pipeline only
+    # waits at the flush barrier before the originals are deleted.
+    writer = output_writer.start_writer_fn(output_workers)
+
     faulty_gdf_list = []
+    # the exports (step1_5 and step1_6) of a resumed run have already been written - only the deletes remain.
+    exported = stage_checkpoint.load_checkpoint_fn(checkpoint_dir, 'step1_6') is not None
     #print("concat_list: ", concat_list)
-    for gdf, feature_type in zip(concat_list, feature_type_list):
-        print("WORKFLOW: ", feature_type)
-
-        # todo tab imports up to line 406
-        import step1_3_concatenate_clean
-        gdf = step1_3_concatenate_clean.main_routine(
-            gdf, feature_type, pastoral_estate)
-        
-        import step1_4_area_length_currency_date
-        gdf, transition_dir, year, feature_type = step1_4_area_length_currency_date.main_routine(gdf, feature_type, transition_dir, year)
-        # 
-        import step1_5_export_data
-        step1_5_export_data.main_routine(
-            gdf, feature_type, transition_dir, year, pastoral_districts_path, date_str, datetime_object)
-
-    print('=' * 50)
-    print('Original files - NOT PROCESSED have been copied to your TEMPORARY directory.')
-    print('They may help you if you need to return DIRTY data......')
-    print("Let me know if they are of NO USE to you... You are responsible to delete these if you don't want them.")
+    if exported:
+        print("Exports were completed by the resumed run - step1_3 to step1_6 skipped.")
+
+    elif parallel_features and len(concat_list) > 1:
+        # run the feature type workflows in a process pool (they write to separate sub-directories and share no
+        # state) and print each workflow log in feature type order once it has completed. The background writer can
+        # not be shared with the worker processes, so the workflows write in the foreground.
+        with ProcessPoolExecutor(max_workers=len(concat_list)) as executor:
+            future_list = [executor.submit(
+                parallel_feature_workflow_fn, gdf, feature_type, estate_index, transition_dir, year,
+                pastoral_districts_path, date_str, datetime_object, snapshot, None, checkpoint_dir)
+                for gdf, feature_type in zip(concat_list, feature_type_list)]
+
+            shutdown = False
+            for future, feature_type in zip(future_list, feature_type_list):
+                log, exited, error, fault_gdf = future.result()
+                print("WORKFLOW: ", feature_type)
+                print(log, end='')
+                if error is not None:
+                    print(error)
+                    shutdown = True
+                elif exited:
+                    shutdown = True
+                elif fault_gdf is not None:
+                    faulty_gdf_list.append((feature_type, fault_gdf))
+
+        if shutdown:
+            print("ERROR - a feature type workflow was terminated - pipeline shutdown.")
+            sys.exit()
 
-    copy_original_files(delete_files_list, primary_output_dir)
-
-    import step1_6_export_faulty_data
-    step1_6_export_faulty_data.main_routine(
-        year, pastoral_districts_path, primary_output_dir, directory_list, faulty_gdf_list, date_str, datetime_object)
+    else:
+        for gdf, feature_type in zip(concat_list, feature_type_list):
+            print("WORKFLOW: ", feature_type)
+
+            fault_gdf = feature_workflow_fn(gdf, feature_type, estate_index, transition_dir, year,
+                                            pastoral_districts_path, date_str, datetime_object, snapshot, writer,
+                                            checkpoint_dir)
+            if fault_gdf is not None:
+                faulty_gdf_list.append((feature_type, fault_gdf))
+
+    if not exported:
+        print('=' * 50)
+        print('Original files - NOT PROCESSED have been copied to your TEMPORARY directory.')
+        print('They may help you if you need to return DIRTY data......')
+        print("Let me know if they are of NO USE to you... You are responsible to delete these if you don't want "
+              "them.")
+
+        copy_original_files(delete_files_list, primary_output_dir, writer)
+        shapefile_ingest.clear_record_cache_fn()
+
+        step1_6_export_faulty_data.main_routine(
+            year, pastoral_districts_path, primary_output_dir, directory_list, faulty_gdf_list, date_str,
+            datetime_object, writer, checkpoint_dir)
+
+        # flush barrier - every export and copy must have completed before any original is deleted.
+        if output_writer.flush_fn(writer):
+            print("ERROR - one or more outputs failed to write - the originals have NOT been deleted - pipeline "
+                  "shutdown.")
+            output_writer.close_writer_fn(writer)
+            sys.exit()
+
+        stage_checkpoint.write_checkpoint_fn(checkpoint_dir, 'step1_6', {'date_str': date_str})
 
     print('the following files have been upload to the transfer dive and the originals will be deleted:')
 
-    delete_original_files(delete_files_list)
+    delete_error_list = delete_original_files(delete_files_list, writer)
+    delete_error_list.extend(output_writer.close_writer_fn(writer))
+    if delete_error_list:
+        print("ERROR - ", len(delete_error_list), " original(s) could not be deleted - the run checkpoints have been "
+              "kept, rerun with --resume once the files are accessible.")
 
     print('=' * 50)
     print(" - looking for pdf maps....")
-    import step1_7_pdf_maps
     step1_7_pdf_maps.main_routine(
-        year, pastoral_districts_path, transition_dir)
+        year, pastoral_districts_path, transition_dir, manifest)
+
+    # the run has completed - there is nothing left to resume.
+    if not delete_error_list:
+        stage_checkpoint.clear_checkpoints_fn(checkpoint_dir)
 
 
 if __name__ == '__main__':
@@ -27,61 +27,25 @@ SOFTWARE.
 from __future__ import print_function, division
 import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import shape
+import server_upload_discovery
+import shapefile_ingest
+import scan_manifest_db
+import template_schema_registry
+import normalise_attributes
+import duplicate_index
+import feature_accumulator
 
 warnings.filterwarnings("ignore")
 
-
-def property_path_fn(path):
-    """ Create a path to all property sub-directories and return them as a list.
-
-    :param path: string object containing the path to the Pastoral Districts directory.
-    :return prop_list: list object containing the path to all property sub-directories.
-    """
-
-    # create a list of pastoral districts.
-    dir_list = next(os.walk(path))[1]
-    print("dir_list: ", dir_list)
-
-    prop_list = []
-
-    # loop through districts to get property name
-    for district in dir_list:
-        dist_path = os.path.join(path, district)
-
-        property_dir = next(os.walk(dist_path))[1]
-
-        # loop through the property names list
-        for prop_name in property_dir:
-            # join the path, district and property name to create a path to each property directory.
-            prop_path = os.path.join(path, district, prop_name)
-            #print("prop_path: ", prop_path)
-            # append all property paths to a list
-            prop_list.append(prop_path)
-
-    return prop_list
-
-
-def upload_download_path_fn(prop_list):
-    """ Create a path to to the Server Upload and Download sub-directories for each property and return them as a list.
-
-    :param prop_list: list object containing the path to all property sub-directories.
-    :return upload_list: list object containing the path to each properties Server_Upload sub-directory.
-    :return download_list: list object containing the path to each properties Server_Upload sub-directory.
-    """
-    upload_list = []
-    download_list = []
-    for prop_path in prop_list:
-        upload_path = os.path.join(prop_path, 'infrastructure', 'server_upload')
-        #print("upload_path: ", upload_path)
-        upload_list.append(upload_path)
-        download_path = os.path.join(prop_path, 'infrastructure', 'server_download')
-        download_list.append(download_path)
-
-    return upload_list, download_list
+# template shapefile (template schema registry key) of each feature type.
+TEMPLATE_FILE_DICT = {'points': 'Pastoral_Infra_Points_Template.shp',
+                      'lines': 'Pastoral_Infra_Lines_Template.shp',
+                      'polygons': 'Pastoral_Infra_Polygons_Template.shp',
+                      'paddocks': 'Pastoral_Infra_Paddocks_Template.shp'}
 
 
 def assets_search_fn(search_criteria, folder):
@@ -103,45 +67,46 @@ def assets_search_fn(search_criteria, folder):
     return files
 
 
-def shapely_check_geom_type_fn(files, feature_type):
-    """ Check that the predicted shapefile (based on it location within the upload sub-directory) is the correct
-    Shapely shape (shapefile geometry).
+def geom_type_check_fn(gdf, feature_type, files):
+    """ Check the geometry type of every row of the geo-dataframe against the predicted shapefile type (based on it
+    location within the upload sub-directory). Multi-part geometries are accepted, and a mixed geo-dataframe is split
+    into geometry type specific geo-dataframes.
 
-    :param files: path object to the current shapefile within the server upload sub-directory within the Pastoral
-    District directory.
+    :param gdf: geo-dataframe object read from the server upload sub-directory.
     :param feature_type: string object containing the type of shapefile the geo-dataframe is expected to be, based on
     folder structure.
-    :return true_false: boolean object confirming that the shapefile has been assigned the correct Shapely shape.
-    :return shp_geom: Shapely shape relevant to the current shapefile.
+    :param files: string object containing the path to the shapefile (for reporting).
+    :return geom_dict: dictionary object containing the geometry type (points, lines or polygons, or the geometry type
+    name of an unsupported type i.e. GeometryCollection) and the matching rows as a geo-dataframe.
     """
-    import fiona
-    import shapely
-    from shapely.geometry import shape
-
-    feature_type_dict = {'points': shapely.geometry.point.Point,
-                         'lines': shapely.geometry.linestring.LineString,
-                         'paddocks': shapely.geometry.polygon.Polygon,
-                         'polygons': shapely.geometry.polygon.Polygon,
-                         'multi_part': shapely.geometry.multipolygon.MultiPolygon}
-    # extract shapely object from the feature_type_dict
-    shapely_geometry = feature_type_dict[feature_type]
-
-    shapefile = fiona.open(files)
-    # print(shapefile.schema)
-    first = next(iter(shapefile))
-    # print('first: ', first)
-
-    # extract dictionary value
-    shp_geom = shape(first['geometry'])
-
-    # compare expected geometry to actual geometry and return a boolean value
-    if type(shp_geom) == shapely_geometry:
-        true_false = True
+
+    geom_type_dict = {'Point': 'points', 'MultiPoint': 'points',
+                      'LineString': 'lines', 'MultiLineString': 'lines', 'LinearRing': 'lines',
+                      'Polygon': 'polygons', 'MultiPolygon': 'polygons'}
+    feature_type_dict = {'points': 'points', 'lines': 'lines', 'polygons': 'polygons', 'paddocks': 'polygons'}
+    expected = feature_type_dict[feature_type]
+
+    # null geometries are kept with the expected geometry type, unsupported geometry types are kept under their own
+    # name (wrong type).
+    geom_type = gdf.geom_type.map(geom_type_dict)
+    geom_type = geom_type.where(geom_type.notna(), gdf.geom_type)
+    geom_type[gdf.geometry.isna().values] = expected
+
+    mismatch = geom_type != expected
+    if not mismatch.any():
+        return {expected: gdf}
 
     else:
-        true_false = False
+        print('Was filed as a : ', feature_type)
+        print(' - ', files)
+        for geom, count in geom_type[mismatch].value_counts().sort_index().items():
+            print(' - ', count, ' row(s) are ', geom, ': ', gdf.index[mismatch & (geom_type == geom)].tolist())
+
+    geom_dict = {}
+    for geom in sorted(geom_type.unique()):
+        geom_dict[geom] = gdf[(geom_type == geom).values]
 
-    return true_false, shp_geom
+    return geom_dict
 
 
 def filter_transition_fn(gdf, files):
@@ -167,6 +132,8 @@ def filter_transition_fn(gdf, files):
 
     trans_gdf['STATUS'] = 'Transition_attempt'
     gdf.to_file(files)
+    # keep the cached record in line with the file that has just been written.
+    shapefile_ingest.update_record_gdf_fn(files, gdf)
     if 'NOTES' in trans_gdf.columns:
         trans_gdf = trans_gdf.drop(columns=['NOTES'])
     if 'OBJECTID' in trans_gdf.columns:
@@ -203,194 +170,189 @@ def double_check_polygon_fn(gdf, feature_type):
     return correct_feature
 
 
-def extract_paths_fn(upload_list, year, directory_list, date_str, datetime_object):
-    """ Search through each server upload subdirectory within the root pastoral directory directory for line, point and
-    polygon shapefiles, read them in as  geo-dataframe and append them to a list if UPLOAD column does not exists.
+def ingest_shapefile_fn(files):
+    """ Pre-screen a shapefile from its .dbf header and read it into the shapefile record cache if it is new. Run
+    concurrently by extract_paths_fn when more than one worker is requested.
+
+    :param files: string object containing the path to the shapefile.
+    :return screen: string object containing 'new', 'transitioned' or 'faulty'.
+    :return field_list: list object containing the field names or None if the header could not be read.
+    """
+    screen, field_list = shapefile_ingest.prescreen_shapefile_fn(files)
+    if screen == 'new':
+        shapefile_ingest.read_shapefile_record_fn(files)
 
-    :param upload_list: list object containing all server_uploads subdirectory paths (i.e. 1 per property).
+    return screen, field_list
+
+
+def ingest_iter_fn(file_path_list, workers=1):
+    """ Pre-screen and read the shapefiles in order, yielding one result at a time. When workers > 1 the reads run in a
+    thread pool with at most 2 x workers files read ahead, so the shapefiles are not all held in memory at once.
+
+    :param file_path_list: list object containing the path to every candidate shapefile.
+    :param workers: integer object containing the number of threads used to read the shapefiles (1 = serial).
+    :return: generator object yielding the ingest_shapefile_fn (screen, field_list) result of each shapefile.
+    """
+    if workers <= 1:
+        for files in file_path_list:
+            yield ingest_shapefile_fn(files)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        future_list = []
+        position = 0
+        for files in file_path_list[:2 * workers]:
+            future_list.append(executor.submit(ingest_shapefile_fn, files))
+        while position < len(file_path_list):
+            result = future_list[position].result()
+            future_list[position] = None
+            next_position = position + 2 * workers
+            if next_position < len(file_path_list):
+                future_list.append(executor.submit(ingest_shapefile_fn, file_path_list[next_position]))
+            position += 1
+            yield result
+
+
+def accumulate_fn(gdf, feature_type, accumulator_dict, faulty_dict, assets_dir):
+    """ Check the column names of a geo-dataframe against the feature type template and append it to the feature type
+    accumulator, or to the feature type faulty list if the columns are incorrect.
+
+    :param gdf: geo-dataframe object containing feature type specific observations from one shapefile.
+    :param feature_type: string object containing the feature type (i.e. points, lines, polygons, paddocks).
+    :param accumulator_dict: dictionary object containing the feature type accumulators (feature_accumulator).
+    :param faulty_dict: dictionary object containing the feature type lists of faulty geo-dataframes.
+    :param assets_dir: directory containing the template schema registry.
+    """
+    checked_list, faulty_list = check_column_names_fn([gdf], assets_dir, TEMPLATE_FILE_DICT[feature_type])
+
+    for checked_gdf in checked_list:
+        if not feature_accumulator.append_gdf_fn(accumulator_dict[feature_type], checked_gdf):
+            checked_gdf['STATUS'] = "Incorrect column header/order"
+            faulty_list.append(checked_gdf)
+
+    faulty_dict[feature_type].extend(faulty_list)
+
+
+def extract_paths_fn(shp_list, year, directory_list, date_str, datetime_object, workers=1, assets_dir=None):
+    """ Read in each candidate shapefile located within the server upload subdirectories (discovery manifest) as a
+    geo-dataframe and, if UPLOAD column does not exists, append it to a feature type accumulator as soon as it has been
+    read. The shapefile geo-dataframe is released once it has been accumulated.
+
+    :param shp_list: list object containing (feature_type, path) tuples for every candidate shapefile, ordered by
+    property and feature type (server_upload_discovery.manifest_shapefiles_fn).
     :param year: string object containing the year.
     :param directory_list: list object containing the feature types/subdirectory names (i.e. points, lines etc.)
-    :return points_list: list object containing open point geo-dataframes located within the server_upload
-    subdirectories.
-    :return lines_list: list object containing open line geo-dataframes located within the server_upload subdirectories.
-    :return poly_list: list object containing open polygons geo-dataframes located within the server_upload
-    subdirectories.
-    :return paddocks_list: list object containing open polygons geo-dataframes located within the server_upload
-    subdirectories.
+    :param workers: integer object containing the number of threads used to read the shapefiles (1 = serial).
+    :param assets_dir: directory containing the template schema registry.
+    :return accumulator_dict: dictionary object containing the feature type (key) and accumulator (value) holding the
+    observations that passed the column check.
+    :return faulty_dict: dictionary object containing the feature type (key) and list of geo-dataframes (value) that
+    failed the column check.
     :return files_list: list object containing file paths to all shapefiles within the upload subdirectory within the
     Pastoral Districts directory.
+    :return outcome_dict: dictionary object containing the path (key) and pre-screen outcome (value) of every shapefile
+    (i.e. new, transitioned or faulty).
+    :return geom_faulty_list: list object containing polygon geo-dataframes filed in a points or lines sub-directory.
     """
 
-    # create three empty list to append results
-    points_list = []
-    lines_list = []
-    poly_list = []
-    paddocks_list = []
+    # create a feature type specific accumulator and faulty list.
+    accumulator_dict = {feature_type: feature_accumulator.new_accumulator_fn(feature_type)
+                        for feature_type in TEMPLATE_FILE_DICT}
+    faulty_dict = {feature_type: [] for feature_type in TEMPLATE_FILE_DICT}
     files_list = []
-    # print('paddocks_list: ', len(paddocks_list))
-    # loop through each property server upload subdirectory.
-
-    for server_upload_path in upload_list:
-
-        # print("Upload_List: ", upload_list)
-        # print("Server Upload Path: ", server_upload_path)
-        # loop though each item in the directory list (i.e. points, polygons, lines etc.)
-        for feature_type in directory_list:
-
-            # create a path for to a properties feature type sub-directory within the server upload directory
-            direct = os.path.join(server_upload_path, str(year), feature_type)
-            #print("direct: ", direct)
-            check_folder = os.path.isdir(direct)
-            if check_folder:
-                #print("direct: ", direct)
-
-                for files in glob(direct + '\\*.shp'):
-                    #print("files: ", files)
-                    # print("shut pipeline")
-                    # import sys
-                    # sys.exit()
-
-                    gdf = gpd.read_file(files)
-
-                    # update currency date
-                    gdf.DATE_CURR = datetime_object
-
-                    # print(gdf.crs)
-                    # print(gdf.PROPERTY.unique())
-                    # print(gdf.shape)
-                    if not gdf.crs:
-                        print("The following data has no coordinate reference system, script can NOT continue until "
-                              "data repaired or removed:")
-                        print(" - ", files)
-                        import sys
-                        sys.exit()
-                    # # # check that a file is only for one property.
-                    # prop_list = gdf["PROPERTY"].unique().tolist()
-                    # print("looking at data from: ", prop_list)
-                    # print(gdf.columns)
-                    # if len(prop_list) > 0:
-                    #     print('single property')
-                    # else:
-                    #     print('more than one')
-                    #
-                    #
-                    # import sys
-                    # sys.exit()
-
-                    # check that the shapefile located has not previously been transitioned based on the UPLOAD column.
-                    if 'UPLOAD' not in gdf.columns:
-
-                        files_list.append(files)
-
-                        # Call the shapely_check_geom_type function to check that the predicted shapefile (based on it's
-                        # location within the upload sub-directory) is the correct Shapely shape (shapefile geometry).
-                        true_false, shp_geom = shapely_check_geom_type_fn(files, feature_type.lower())
-
-                        if true_false:
-                            # read file as geo-dataframe
-                            gdf = gpd.read_file(files)
-                            # Call the filter_transition function to filter out Transition or Migration forms the STATUS
-                            # feature and add 'Transition attempt'. Additionally, remove features NOTES and OBJECTID.
-                            trans_gdf, upload = filter_transition_fn(gdf, files)
-
-                            # print(trans_gdf)
-                            # 
-                            # # # check that a file is only for one property.
-                            # prop_list = trans_gdf["PROPERTY"].unique().tolist()
-                            # print("looking at data from: ", prop_list)
-                            # print(gdf.columns)
-                            # if len(prop_list) > 0:
-                            #     print('single property')
-                            # else:
-                            #     print('more than one property is listed in ')
-                            #     import sys
-                            #     sys.exit()
-                            # 
-                            # 
-                            # 
-                            # import sys
-                            # sys.exit()
-
-                            if upload:
-                                # shutil.copy(files, output_dir)
-                                # sort and store open geo-dataframe's to feature_type specific lists.
-                                if feature_type == 'points':
-                                    points_list.append(trans_gdf)
-
-                                elif feature_type == 'lines':
-                                    lines_list.append(trans_gdf)
-
-                                elif feature_type == 'polygons':
-                                    print('feature type is: ', feature_type)
-                                    correct_feature = double_check_polygon_fn(trans_gdf, feature_type)
-                                    print("Correct feature1: ",correct_feature)
-
-                                    # import sys
-                                    # sys.exit()
-                                    if feature_type == correct_feature.lower():
-                                        poly_list.append(trans_gdf)
-                                    else:
-                                        paddocks_list.append(trans_gdf)
-
-                                elif feature_type == 'paddocks':
-                                    print('feature type is: ', feature_type)
-                                    correct_feature = double_check_polygon_fn(trans_gdf, feature_type)
-                                    print("Correct feature2: ",correct_feature)
-
-                                    # import sys
-                                    # sys.exit()
-                                    if feature_type == correct_feature.lower():
-                                        paddocks_list.append(trans_gdf)
-
-                                    else:
-                                        poly_list.append(trans_gdf)
-
-                                else:
-                                    pass
+    outcome_dict = {}
+    geom_faulty_list = []
+    # call the ingest_iter_fn function to pre-screen and read every shapefile - the reads are spread over a thread pool
+    # when workers > 1, the results are processed below in manifest order so the accumulators are deterministic.
+    file_path_list = [files for _, files in shp_list]
+
+    # loop through each candidate shapefile located within the property server upload subdirectories.
+
+    for (feature_type, files), (screen, field_list) in zip(shp_list, ingest_iter_fn(file_path_list, workers)):
+        #print("files: ", files)
+        outcome_dict[files] = screen
+
+        # skip shapefiles that the .dbf header pre-screen identified as transitioned or faulty.
+        if screen == 'transitioned':
+            continue
+
+        elif screen == 'faulty':
+            print("ERROR - the following shapefile has an unreadable attribute table or no DELETE column and will NOT "
+                  "be processed:")
+            print(" - ", files)
+            print(" - Actual column names: ", field_list)
+            continue
+
+        # the shapefile has been read once - the cached record is reused by every later stage.
+        record = shapefile_ingest.read_shapefile_record_fn(files)
+        gdf = record['gdf']
+
+        if not record['crs']:
+            print("The following data has no coordinate reference system, script can NOT continue until "
+                  "data repaired or removed:")
+            print(" - ", files)
+            import sys
+            sys.exit()
+
+        # check that the shapefile located has not previously been transitioned based on the UPLOAD column.
+        if 'UPLOAD' not in gdf.columns:
+
+            files_list.append(files)
+
+            # copy the cached geo-dataframe
+            gdf = record['gdf'].copy()
+            # Call the filter_transition function to filter out Transition or Migration forms the STATUS
+            # feature and add 'Transition attempt'. Additionally, remove features NOTES and OBJECTID.
+            trans_gdf, upload = filter_transition_fn(gdf, files)
+
+            if upload:
+                # Call the geom_type_check_fn function to check the geometry type of every row against the
+                # predicted shapefile type (based on it's location within the upload sub-directory) and split the
+                # geo-dataframe into geometry type specific geo-dataframes.
+                geom_dict = geom_type_check_fn(trans_gdf, feature_type.lower(), files)
+
+                # check the column names and append the open geo-dataframe's to the feature_type accumulators.
+                if 'points' in geom_dict:
+                    accumulate_fn(geom_dict['points'], 'points', accumulator_dict, faulty_dict, assets_dir)
+
+                if 'lines' in geom_dict:
+                    accumulate_fn(geom_dict['lines'], 'lines', accumulator_dict, faulty_dict, assets_dir)
 
+                if 'polygons' in geom_dict:
+                    polygon_gdf = geom_dict['polygons']
+
+                    if feature_type in ['polygons', 'paddocks']:
+                        print('feature type is: ', feature_type)
+                        correct_feature = double_check_polygon_fn(polygon_gdf, feature_type)
+                        print("Correct feature: ", correct_feature)
+
+                        if correct_feature.lower() == 'polygons':
+                            accumulate_fn(polygon_gdf, 'polygons', accumulator_dict, faulty_dict, assets_dir)
                         else:
-                            import shapely
-                            print('Was filed as a : ', feature_type)
-
-                            # sort and store open geo-dataframe's to feature_type specific lists.
-                            if type(shp_geom) == shapely.geometry.point.Point:
-                                print(' - shapefile was a Point')
-                                gdf = gpd.read_file(files)
-                                # Call the filter_transition function to filter out Transition or Migration form the
-                                # STATUS feature and add 'Transition attempt'. Additionally, remove features NOTES and
-                                # OBJECTID.
-                                trans_gdf, upload = filter_transition_fn(gdf, files)
-                                if upload:
-                                    points_list.append(trans_gdf)
-
-                            elif type(shp_geom) == shapely.geometry.linestring.LineString:
-                                print(' - shapefile was a Line')
-                                gdf = gpd.read_file(files)
-                                # Call the filter_transition function to filter out Transition or Migration form the
-                                # STATUS feature and add 'Transition attempt'. Additionally, remove features NOTES and
-                                # OBJECTID.
-                                trans_gdf, upload = filter_transition_fn(gdf, files)
-                                if upload:
-                                    lines_list.append(trans_gdf)
-
-                            else:
-                                # paddocks and poly other can not be separated
-                                print('ERROR!!!!!!!!!!!!!!!!!!!!!!!!!!!!!')
-                                print("A polygon is loaded in the wrong sub-folder I can't differentiate with 100% "
-                                      "certainty")
-                                print(' - ', files)
-                                gdf = gpd.read_file(files)
-
-                                gdf['STATUS'] = 'Failed Geom'
-                                gdf.to_file(files)
-                                print('goodbye')
-                                import sys
-                                sys.exit()
+                            accumulate_fn(polygon_gdf, 'paddocks', accumulator_dict, faulty_dict, assets_dir)
 
                     else:
-                        pass
+                        # paddocks and poly other can not be separated when filed in the points or lines folder
+                        print('ERROR!!!!!!!!!!!!!!!!!!!!!!!!!!!!!')
+                        print("A polygon is loaded in the wrong sub-folder I can't differentiate with 100% "
+                              "certainty - the polygons will NOT be processed.")
+                        print(' - ', files)
+                        polygon_gdf['STATUS'] = 'Failed Geom'
+                        geom_faulty_list.append(polygon_gdf)
+
+                for geom in geom_dict:
+                    if geom not in ['points', 'lines', 'polygons']:
+                        print('ERROR - ', len(geom_dict[geom].index), ' ', geom, ' row(s) are not a supported geometry '
+                              'type and will NOT be processed (see the originals copy).')
+                        print(' - ', files)
+
+            # the data is held by the accumulators - release the cached geo-dataframe.
+            shapefile_ingest.release_record_gdf_fn(files)
 
-    return points_list, lines_list, poly_list, paddocks_list, files_list
+        else:
+            pass
+
+    return accumulator_dict, faulty_dict, files_list, outcome_dict, geom_faulty_list
 
 
 def check_column_names_fn(df_list, asset_dir, file_end):
@@ -398,35 +360,30 @@ def check_column_names_fn(df_list, asset_dir, file_end):
     headings.
 
     :param df_list: list object containing open dataframes extracted from the pastoral districts directory.
-    :param asset_dir: directory containing correct empty dataframe structures.
-    :param file_end: string object containing the file name.
+    :param asset_dir: directory containing correct empty dataframe structures and the template schema registry.
+    :param file_end: string object containing the template file name (template schema registry key).
     :return checked_list: list object containing dataframes that matched.
     :return faulty_list: list objet containing dataframes that did not match.
     """
 
-    print('{0}\\shapefile\\{1}'.format(asset_dir, file_end))
-    accurate_df = gpd.read_file('{0}\\shapefile\\{1}'.format(asset_dir, file_end), index_col=0)
-
-    print("accurate_df: ", accurate_df)
+    # extract the template column order (tuple) and column set from the template schema registry (loaded once).
+    template = template_schema_registry.load_template_registry_fn(asset_dir)[file_end]
+    accurate_cols = template['columns']
+    accurate_set = template['column_set']
 
     checked_list = []
     faulty_list = []
 
     for test_df in df_list:
-        # create two lists from the correctly formatted csv (accurate) and the data for upload (test)
-        accurate = accurate_df.columns.tolist()
-        test_cols = test_df.columns.tolist()
-
-        # print("accurate: ", accurate)
-        # print("test_cols: ", test_cols)
+        # create a tuple of column names from the data for upload (test)
+        test_cols = tuple(test_df.columns)
 
         if "DELETE" in test_cols:
-            accurate_cols = accurate.copy()
+            pass
         elif "DELETE_" in test_cols:
-            # replace column name and re-create the list of column names
+            # replace column name and re-create the tuple of column names
             test_df.rename(columns={'DELETE_': 'DELETE'}, inplace=True)
-            test_cols = test_df.columns.tolist()
-            accurate_cols = accurate.copy()
+            test_cols = tuple(test_df.columns)
 
         else:
             print("ERROR " * 20)
@@ -442,11 +399,11 @@ def check_column_names_fn(df_list, asset_dir, file_end):
                 checked_list.append(test_df)
 
             else:
-                if set(accurate_cols) == set(test_cols):
+                if accurate_set == frozenset(test_cols):
 
                     print('Error --- column names are correct; however, they are in the wrong order.')
                     print('Let me fix this for you..........')
-                    test_df = test_df[accurate_cols]
+                    test_df = test_df[list(accurate_cols)]
                     print('Completed... Your welcome..')
                     checked_list.append(test_df)
 
@@ -472,16 +429,15 @@ def check_column_names_fn(df_list, asset_dir, file_end):
     return checked_list, faulty_list
 
 
-def concat_and_clean_df_fn(list_a):
-    """ Concatenate open geo-dataframes, drop duplicates, and delete features NOTES and OBJECTID.
-      Additionally, if 'Not recorded'  is contained within the LABEL it is removed.
+def concat_and_clean_df_fn(accumulator):
+    """ Build the merged geo-dataframe from a feature type accumulator, drop duplicates, and delete features NOTES and
+      OBJECTID. Additionally, the attributes are normalised (normalise_attributes.NORMALISE_RULE_DICT - i.e.
+      'Not recorded' is removed from the LABEL feature).
 
-    :param list_a: list object containing open geo-dataframes.
+    :param accumulator: dictionary object containing the feature type accumulator (feature_accumulator).
     :return gdf: output geo-dataframe following function processing.
     """
-    gdf = pd.concat(list_a)
-    # remove duplicates
-    gdf.drop_duplicates()
+    gdf = feature_accumulator.build_gdf_fn(accumulator)
     # drop unwanted columns
     if 'NOTES' in gdf.columns:
         gdf.drop(columns=['NOTES'], inplace=True)
@@ -489,28 +445,27 @@ def concat_and_clean_df_fn(list_a):
     if 'OBJECTID' in gdf.columns:
         gdf.drop(columns=['OBJECTID'], inplace=True)
 
-    # remove 'Not recorded' from LABEL feature.
-    if 'LABEL' in gdf.columns:
-        gdf.LABEL.replace("Not recorded", "", inplace=True)
+    # trim, case, value map and null handling rules applied in a single pass.
+    gdf = normalise_attributes.normalise_attributes_fn(gdf)
 
-    if 'LABEL' in gdf.columns:
-        gdf.LABEL.replace("Not Recorded", "", inplace=True)
+    # remove duplicates - row hash of the normalised attributes and the WKB geometry.
+    gdf = duplicate_index.drop_duplicate_rows_fn(gdf)
 
     return gdf
 
 
-def concat_list_fn(list_a, feature_type):
+def concat_list_fn(accumulator, feature_type):
     """
 
-    :param list_a: list object containing open dataframes.
+    :param accumulator: dictionary object containing the feature type accumulator (feature_accumulator).
     :param feature_type: string object containing the feature name.
     :return removed_delete_gdf: geo-dataframe
     :return feature_type: string object containing the feature name.
     """
 
     # Call the concat_and_clean_df function to concatenate open geo-dataframes, drop duplicates, and delete features
-    # NOTES and OBJECTID. Additionally, if 'Not recorded'  is contained within the LABEL it is removed.
-    input_data_gdf = concat_and_clean_df_fn(list_a)
+    # NOTES and OBJECTID. Additionally, the attributes are normalised.
+    input_data_gdf = concat_and_clean_df_fn(accumulator)
 
     print(' - All ', feature_type, ' have been concatenated into one dataframe.')
 
@@ -549,13 +504,14 @@ def concat_list_fn(list_a, feature_type):
     return removed_delete_gdf, feature_type
 
 
-def concat_faulty_list_fn(list_a, feature_type, export_dir, year):
+def concat_faulty_list_fn(list_a, feature_type, export_dir, year, status="Column Error"):
     """ Transition faulty data to the export directory with the a STATUS feature added - variable 'Column Error'.
 
 
     :param export_dir: path object to the export directory (commend argument).
     :param list_a: list object containing feature specific faulty geo-dataframes.
     :param feature_type: string object containing the feature name (i.e. lines, paddocks).
+    :param status: string object containing the STATUS variable (default 'Column Error').
    """
 
     print('!' * 50)
@@ -568,7 +524,7 @@ def concat_faulty_list_fn(list_a, feature_type, export_dir, year):
 
     else:
         df_concat = pd.concat(list_a)
-        df_concat["STATUS"] = "Column Error"
+        df_concat["STATUS"] = status
 
         gdf = gpd.GeoDataFrame(
             df_concat, geometry='geometry')
@@ -647,31 +603,59 @@ def sort_file_paths_fn(files_list):
     delete_files_list = []
     for file in files_list:
 
-        gdf = gpd.read_file(file)
-        if 'UPLOAD' not in gdf.columns:
+        record = shapefile_ingest.read_shapefile_record_fn(file)
+        if 'UPLOAD' not in record['schema']['properties']:
             delete_files_list.append(file)
 
     return delete_files_list
 
 
-def main_routine(path, assets_dir, year, export_dir, directory_list, date_str, datetime_object):
+def main_routine(path, assets_dir, year, export_dir, directory_list, date_str, datetime_object, manifest=None,
+                 workers=1, scan_db=None):
     """This script
 
     """
     # print('step1_2_search_folders.py INITIATED.')
 
-    # call the directory_path_fn function to create a path to all property sub-directories and return them as a list.
-    prop_list = property_path_fn(path)
+    if manifest is None:
+        # call the build_manifest_fn function to walk the Pastoral Districts directory once and list every candidate
+        # shapefile and pdf map within the property Server_Upload sub-directories.
+        manifest = server_upload_discovery.build_manifest_fn(path, year, directory_list)
+
+    # call the manifest_shapefiles_fn function to order the located shapefiles by property and feature type.
+    shp_list = server_upload_discovery.manifest_shapefiles_fn(manifest, directory_list)
+
+    if scan_db is not None:
+        # call the filter_unchanged_fn function to skip transitioned or faulty files that are unchanged since they were
+        # recorded in the persistent scan manifest.
+        history_dict = scan_manifest_db.load_scan_manifest_fn(scan_db)
+        shp_record_list = [record for record in manifest['files'] if record['ext'] == '.shp']
+        remaining_list, skipped_dict, hash_dict = scan_manifest_db.filter_unchanged_fn(
+            history_dict, shp_record_list, workers)
+
+        remaining_set = set(record['path'] for record in remaining_list)
+        shp_list = [(feature_type, files) for feature_type, files in shp_list if files in remaining_set]
+
+        for files, outcome in sorted(skipped_dict.items()):
+            if outcome == 'faulty':
+                print("ERROR - the following unchanged shapefile was previously reported as faulty and will NOT be "
+                      "processed:")
+                print(" - ", files)
+
+    # call the extract_paths_fn function to read in each located shapefile as a geo-dataframe and append them to a
+    # feature type specific list.
+    print("Checking that the shapefile geometry is accurate.....")
+    accumulator_dict, faulty_dict, files_list, outcome_dict, geom_faulty_list = extract_paths_fn(
+        shp_list, year, directory_list, date_str, datetime_object, workers, assets_dir)
 
-    # call the upload_download_path_fn function to create a path to the Server Upload and Download sub-directories
-    # for each property and return them as a list.
-    upload_list, download_list = upload_download_path_fn(prop_list)
+    if scan_db is not None:
+        # call the record_outcomes_fn function to store the outcome of every file seen by this run.
+        outcome_dict.update(skipped_dict)
+        scan_manifest_db.record_outcomes_fn(
+            scan_db, history_dict, shp_record_list, outcome_dict, hash_dict, year, workers)
 
-    # call the extract_paths_fn function to search through each server upload subdirectory within the root pastoral
-    # directory for line, point and polygon shapefiles, read them in as geo-dataframe and append them to a list.
-    print("Checking that the shapefile geometry is accurate.....")
-    points_list, lines_list, poly_list, paddocks_list, files_list = extract_paths_fn(upload_list, year, directory_list,
-                                                                                     date_str, datetime_object)
+    if len(geom_faulty_list) > 0:
+        concat_faulty_list_fn(geom_faulty_list, 'polygons', export_dir, year, 'Failed Geom')
 
     delete_files_list = sort_file_paths_fn(files_list)
     print('Files located for processing:')
@@ -679,118 +663,33 @@ def main_routine(path, assets_dir, year, export_dir, directory_list, date_str, d
         print(' - ', i)
     print('=' * 80)
 
-    # ---------------------------------------------- POINTS ------------------------------------------------------------
-    print('=' * 50)
-    print('POINTS')
-
-    # call the check_column_names_fn function to sort the input dataframe into either the checked_list or faulty_list
-    # based on it having only the required column headings.
-    print('Checking column names and lengths....')
-    checked_points_list, faulty_points_list = check_column_names_fn(
-        points_list, assets_dir, 'Pastoral_Infra_Points_Template.shp')
-
-    print(' - Correct dataframes: ', len(checked_points_list))
-    print(' - Incorrect dataframes: ', len(faulty_points_list))
-
-    # --------------------------------------------------- LINES --------------------------------------------------------
-    print('-' * 50)
-    print('LINES')
-
-    # call the check_column_names_fn function to sort the input dataframe into either the checked_list or faulty_list
-    # based on it having only the required column headings.
-    checked_lines_list, faulty_lines_list = check_column_names_fn(
-        lines_list, assets_dir, 'Pastoral_Infra_Lines_Template.shp')
-
-    print(' - Correct dataframes: ', len(checked_lines_list))
-    print(' - Incorrect dataframes: ', len(faulty_lines_list))
-
-    # ---------------------------------------------------- POLYGONS ----------------------------------------------------
-
-    print('-' * 50)
-    print('POLYGONS')
-
-    # call the check_column_names_fn function to sort the input dataframe into either the checked_list or faulty_list
-    # based on it having only the required column headings.
-
-
-    checked_polygons_list, faulty_polygons_list = check_column_names_fn(
-        poly_list, assets_dir, 'Pastoral_Infra_Polygons_Template.shp')
-
-    print(' - Correct dataframes: ', len(checked_polygons_list))
-    print(' - Incorrect dataframes: ', len(faulty_polygons_list))
-
-    # ---------------------------------------------------- PADDOCKS ----------------------------------------------------
-
-    print('-' * 50)
-    print('PADDOCKS')
-
-
-
-
-    # print('!'*50)
-    # call the check_column_names_fn function to sort the input dataframe into either the checked_list or faulty_list
-    # based on it having only the required column headings.
-    checked_paddocks_list, faulty_paddocks_list = check_column_names_fn(
-        paddocks_list, assets_dir, 'Pastoral_Infra_Paddocks_Template.shp')
-
-    print(' - Correct dataframes: ', len(checked_paddocks_list))
-    print(' - Incorrect dataframes: ', len(faulty_paddocks_list))
-
     # ------------------------------------------------- WORKFLOW -------------------------------------------------------
 
-    # verify that the checked points file list contains a result
+    # the column names of every geo-dataframe were checked (check_column_names_fn) as it was accumulated.
     concat_list = []
     feature_type_list = []
 
-    if len(checked_points_list) > 0:
-        print('-' * 50)
-        print('Processing points.....')
-        print('There are ', len(checked_points_list), ' geo-dataframes')
-        points_removed_delete_gdf, feature_type = concat_list_fn(
-            checked_points_list, 'points')
-
-        concat_list.append(points_removed_delete_gdf)
-        feature_type_list.append(feature_type)
-
-    if len(faulty_points_list) > 0:
-        concat_faulty_list_fn(faulty_points_list, 'points', export_dir, year)
-
-    if len(checked_lines_list) > 0:
-        print('-' * 50)
-        print('Processing lines.....')
-        print('There are ', len(checked_lines_list), ' geo-dataframes')
-        lines_removed_delete_gdf, feature_type = concat_list_fn(
-            checked_lines_list, 'lines')
-
-        concat_list.append(lines_removed_delete_gdf)
-        feature_type_list.append(feature_type)
-
-    if len(faulty_lines_list) > 0:
-        concat_faulty_list_fn(faulty_lines_list, 'lines', export_dir, year)
-
-    if len(checked_polygons_list) > 0:
-        print('-' * 50)
-        print('Processing polygons.....')
-        print('There are ', len(checked_polygons_list), ' geo-dataframes')
-        polygons_removed_delete_gdf, feature_type = concat_list_fn(
-            checked_polygons_list, 'polygons')
-        concat_list.append(polygons_removed_delete_gdf)
-        feature_type_list.append(feature_type)
-
-    if len(faulty_polygons_list) > 0:
-        concat_faulty_list_fn(faulty_polygons_list, 'polygons', export_dir, year)
+    for feature_type in TEMPLATE_FILE_DICT:
+        accumulator = accumulator_dict[feature_type]
+        faulty_list = faulty_dict[feature_type]
 
-    if len(checked_paddocks_list) > 0:
         print('-' * 50)
-        print('Processing paddocks.....')
-        print('There are ', len(checked_paddocks_list), ' geo-dataframes')
-        paddocks_removed_delete_gdf, feature_type = concat_list_fn(
-            checked_paddocks_list, 'paddocks')
-        concat_list.append(paddocks_removed_delete_gdf)
-        feature_type_list.append(feature_type)
-
-    if len(faulty_paddocks_list) > 0:
-        concat_faulty_list_fn(faulty_paddocks_list, 'paddocks', export_dir, year)
+        print(feature_type.upper())
+        print(' - Correct dataframes: ', accumulator['n_files'])
+        print(' - Incorrect dataframes: ', len(faulty_list))
+
+        # verify that the feature type accumulator contains a result
+        if accumulator['n_files'] > 0:
+            print('-' * 50)
+            print('Processing ', feature_type, '.....')
+            print('There are ', accumulator['n_files'], ' geo-dataframes')
+            removed_delete_gdf, feature_type = concat_list_fn(accumulator, feature_type)
+
+            concat_list.append(removed_delete_gdf)
+            feature_type_list.append(feature_type)
+
+        if len(faulty_list) > 0:
+            concat_faulty_list_fn(faulty_list, feature_type, export_dir, year)
 
     return delete_files_list, concat_list, feature_type_list
 
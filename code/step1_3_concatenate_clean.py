@@ -25,80 +25,206 @@ SOFTWARE.
 
 # import modules
 from __future__ import print_function, division
+import os
+import sys
+import json
+import hashlib
 import warnings
 import pandas as pd
-import geopandas as gpd
 import numpy as np
+import compact_dtypes
 warnings.filterwarnings("ignore")
 
+# order in which the attribute checks take precedence when the STATUS feature is updated.
+STATUS_PRIORITY = ['feature_group', 'feature', 'property', 'district', 'prop_tag']
 
-def compare_features_against_data_sets_fn(input_list, compare_set, gdf, type_):
+
+def compare_features_against_data_sets_fn(input_list, compare_set, gdf, type_, correction_cache=None):
     """ Check that the input values match a loaded set. Also look for typos if ratio is greater than 80% swaps the input
     value with the correct value. If no similar match can be made insert FAULTY.
+    Each distinct input value is scored once against the whole compare set (levenshtein_ratio_vector_fn) and the
+    result is broadcast to every row. Values already resolved by a previous run are taken from the correction cache.
 
     :param type_: string object containing feature type to navigate workflow.
     :param gdf: geo-dataframe object containing data to be tested.
     :param input_list: list object containing the variables from the dataframe to be checked against the compare set.
     :param compare_set: set object containing all of the accepted variables.
+    :param correction_cache: dictionary object returned by load_correction_cache_fn or None to disable the cache.
     """
 
-    status_list = []
-    output_list = []
-    for input_feature_group_ in input_list:
-        n = 1
-        # print('input_feature_group_: ', input_feature_group_)
-        if type_ == 'property':
-            input_feature_group = input_feature_group_.strip()
-
+    # sort the compare set so that ties are always resolved in the same way.
+    compare_list = sorted(compare_set)
+
+    # extract the cached corrections for this compare set - discarded if the compare set has changed.
+    cached_dict = {}
+    if correction_cache is not None:
+        fingerprint = compare_set_fingerprint_fn(compare_list)
+        section = correction_cache.get(type_)
+        if section is None or section['fingerprint'] != fingerprint:
+            section = {'fingerprint': fingerprint, 'corrections': {}}
+            correction_cache[type_] = section
+        cached_dict = section['corrections']
+
+    correction_dict = {}
+    n_cached = 0
+    for input_feature_group_ in pd.unique(pd.Series(input_list, dtype=object)):
+        if isinstance(input_feature_group_, str) and input_feature_group_ in cached_dict:
+            correction_dict[input_feature_group_] = tuple(cached_dict[input_feature_group_])
+            n_cached += 1
         else:
-            # print('type does != property')
-            input_feature_group = input_feature_group_.strip().title()
+            correction = correct_value_fn(input_feature_group_, compare_set, compare_list, type_)
+            correction_dict[input_feature_group_] = correction
+            if correction_cache is not None and isinstance(input_feature_group_, str):
+                cached_dict[input_feature_group_] = list(correction)
 
-        no_match = "correct"
-        if input_feature_group in compare_set:
+    if n_cached > 0:
+        print(' - ', n_cached, ' ', type_, ' value(s) resolved from the correction cache.')
 
-            output_list.append(input_feature_group)
-            status_list.append('VERIFIED')
-        else:
+    output_list = [correction_dict[i][0] for i in input_list]
+    status_list = [correction_dict[i][1] for i in input_list]
 
-            final_ratio_list = []
-            for correct_feature_group in compare_set:
-
-                ratio = levenshtein_ratio_and_distance(input_feature_group, correct_feature_group, ratio_calc=True)
-                # set levenshtein ratio to a minimum of 80%.
-                ratio_list = []
-                if ratio >= 0.8:
-                    # print('line 85: ', n)
-                    while n == 1:
-                        print(" - Did you mean.... '", correct_feature_group, "'?")
-                        print(" -- I hope it's correct, cos that what I changed it to.")
-                        print('-' * 50)
-                        n += 1
-                    ratio_list.append(correct_feature_group)
+    return output_list, gdf, status_list
 
-                else:
-                    ratio_list.append('Faulty')
-                    # print('line 100: ', n)
-                    while n == 1:
-                        print('You entered: ', input_feature_group)
-                        print(" - Seriously?? It's not even close...")
-                        print(" -- I have changed the value to ERROR")
-                        print('-' * 50)
-                        n += 1
-
-                final_ratio_list.extend(ratio_list)
-            # remove faulty form list.
-            final_ratio_list = [i for i in final_ratio_list if i != "Faulty"]
-
-            if len(final_ratio_list) == 0:
-                output_list.append('FAULTY')
-                status_list.append("ERROR")
-            else:
 
-                output_list.extend(final_ratio_list)
-                status_list.append("AUTO_CORRECT")
+def compare_set_fingerprint_fn(compare_list):
+    """ Create a fingerprint of a compare set so that cached corrections are invalidated when the set changes.
 
-    return output_list, gdf, status_list
+    :param compare_list: sorted list object containing all of the accepted variables.
+    :return fingerprint: string object containing the sha1 hex digest of the compare set.
+    """
+    return hashlib.sha1('\n'.join(compare_list).encode('utf-8')).hexdigest()
+
+
+def load_correction_cache_fn(cache_path):
+    """ Load the persistent correction cache (json) - an empty cache is returned if the file does not exist.
+
+    :param cache_path: string object containing the path to the correction cache.
+    :return correction_cache: dictionary object containing one section per compare type (property, feature_group,
+    feature) with the compare set fingerprint and the raw value -> [corrected value, status] corrections.
+    """
+    correction_cache = {}
+    if cache_path is not None and os.path.isfile(cache_path):
+        try:
+            with open(cache_path) as f:
+                correction_cache = json.load(f)
+        except (OSError, ValueError):
+            print('Unable to read the correction cache - it will be rebuilt: ', cache_path)
+            correction_cache = {}
+
+    return correction_cache
+
+
+def write_correction_cache_fn(cache_path, correction_cache):
+    """ Write the persistent correction cache (json).
+
+    :param cache_path: string object containing the path to the correction cache.
+    :param correction_cache: dictionary object returned by load_correction_cache_fn.
+    """
+    try:
+        with open(cache_path, 'w') as f:
+            json.dump(correction_cache, f, indent=1, sort_keys=True)
+    except OSError:
+        print('Unable to write the correction cache: ', cache_path)
+
+
+def correct_value_fn(input_feature_group_, compare_set, compare_list, type_, min_ratio=0.8):
+    """ Verify a single input value against the compare set, auto correct it to the closest accepted variable when the
+    levenshtein ratio is at least min_ratio, otherwise return FAULTY.
+
+    :param input_feature_group_: object containing the raw input value.
+    :param compare_set: set object containing all of the accepted variables.
+    :param compare_list: sorted list object containing all of the accepted variables.
+    :param type_: string object containing feature type to navigate workflow.
+    :param min_ratio: float object containing the minimum levenshtein ratio accepted as a typo.
+    :return output: string object containing the verified, corrected or FAULTY value.
+    :return status: string object containing VERIFIED, AUTO_CORRECT or ERROR.
+    """
+    if not isinstance(input_feature_group_, str):
+        input_feature_group_ = ''
+
+    if type_ == 'property':
+        input_feature_group = input_feature_group_.strip()
+
+    else:
+        input_feature_group = input_feature_group_.strip().title()
+
+    if input_feature_group in compare_set:
+        return input_feature_group, 'VERIFIED'
+
+    ratio_array = levenshtein_ratio_vector_fn(input_feature_group, compare_list, min_ratio)
+    best = int(np.argmax(ratio_array)) if len(ratio_array) > 0 else 0
+
+    if len(ratio_array) > 0 and ratio_array[best] >= min_ratio:
+        print("You entered: ", input_feature_group)
+        print(" - Did you mean.... '", compare_list[best], "'?")
+        print(" -- I hope it's correct, cos that what I changed it to.")
+        print('-' * 50)
+        return compare_list[best], "AUTO_CORRECT"
+
+    print('You entered: ', input_feature_group)
+    print(" - Seriously?? It's not even close...")
+    print(" -- I have changed the value to ERROR")
+    print('-' * 50)
+
+    return 'FAULTY', "ERROR"
+
+
+def levenshtein_ratio_vector_fn(s, compare_list, min_ratio=0.8):
+    """ Calculate the levenshtein distance ratio (substitution cost 2, as levenshtein_ratio_and_distance) between the
+    string s and every string in compare_list at once. The dynamic programming matrix is filled one row (character of
+    s) at a time with NumPy operations across the whole compare list, and stops early once no string can still reach
+    min_ratio.
+
+    :param s: string object containing the value to be checked.
+    :param compare_list: list object containing the accepted variables.
+    :param min_ratio: float object containing the minimum ratio of interest.
+    :return ratio_array: numpy array object containing the ratio for each string in compare_list (0 when the string
+    can not reach min_ratio).
+    """
+    n = len(compare_list)
+    ratio_array = np.zeros(n)
+    if n == 0:
+        return ratio_array
+
+    lengths = np.array([len(t) for t in compare_list])
+    max_len = int(lengths.max())
+    total = len(s) + lengths
+
+    # character codes of the compare list, padded with -1 (never equal to a character).
+    codes = np.full((n, max_len), -1, dtype=np.int64)
+    for k, t in enumerate(compare_list):
+        codes[k, :len(t)] = [ord(c) for c in t]
+
+    # maximum distance that can still give a ratio >= min_ratio, the length difference is a lower bound.
+    allowed = np.floor(total - min_ratio * total + 1e-9)
+    alive = np.abs(len(s) - lengths) <= allowed
+    if not alive.any():
+        return ratio_array
+
+    col_idx = np.arange(max_len + 1)
+    valid_cols = col_idx[None, :] <= lengths[:, None]
+    prev = np.tile(col_idx, (n, 1))
+
+    for i in range(1, len(s) + 1):
+        cost = np.where(codes == ord(s[i - 1]), 0, 2)
+        # deletions and substitutions come from the previous row.
+        diag_up = np.minimum(prev[:, 1:] + 1, prev[:, :-1] + cost)
+        # insertions run along the row: cur[j] = min_k(a[k] + j - k), solved with a cumulative minimum.
+        a = np.empty_like(prev)
+        a[:, 0] = i
+        a[:, 1:] = diag_up - col_idx[None, 1:]
+        prev = np.minimum.accumulate(a, axis=1) + col_idx[None, :]
+
+        # the row minimum is a lower bound of the final distance.
+        row_min = np.where(valid_cols, prev, np.iinfo(np.int64).max).min(axis=1)
+        alive &= row_min <= allowed
+        if not alive.any():
+            return ratio_array
+
+    distance = prev[np.arange(n), lengths]
+    ratio_array = np.where(alive, (total - distance) / total, 0.)
+
+    return ratio_array
 
 
 def levenshtein_ratio_and_distance(s, t, ratio_calc=False):
@@ -203,85 +329,75 @@ def identify_set_fn(feature_type):
 
 
 def pastoral_estate_check_fn(gdf, variable_, dict_):
-    """
+    """ Update the variable_ feature from the property name (PROPERTY) with a single vectorized map over the whole
+    geo-dataframe (correct whatever the row order). A property that is not in dict_ raises a KeyError.
 
     :param gdf: geo-dataframe object containing the test data.
     :param variable_: string object containing the feature heading of the gdf (i.e. PROPERTY or PROP_TAG).
     :param dict_: dictionary object relevant to the input variable_
     :return gdf: output geo-dataframe object containing the test data with an updated variable_ feature.
-    :return final_verified_tag_list: list object with status variables (i.e. VERIFIED, AUTO-CORRECTED or FAULTY)
+    :return final_verified_tag_list: numpy array object with status variables (i.e. VERIFIED or AUTO-CORRECTED)
     """
-    print("="*50)
-    print("=" * 50)
     print("=" * 50)
-    final_verified_tag_list = []
-    final_prop_code_list = []
-
-    for prop_ in gdf.PROPERTY.unique():
-        print('prop: ', prop_)
-        # gdf filtered by:  prop_
-        property_filter = gdf[gdf['PROPERTY'] == prop_]
-        prop_code = dict_[prop_]
-        prop_tag_list = property_filter[variable_].tolist()
-
-        verified_tag_list = []
-        prop_code_list = []
-        for prop_tag in prop_tag_list:
-            #print("prop_tag: ", prop_tag)
-            #print("prop code: ", prop_code)
-            if prop_tag == prop_code:
-                verified_tag_list.append('VERIFIED')
-                prop_code_list.append(prop_code)
-            else:
-                verified_tag_list.append('AUTO-CORRECTED')
-
-                print('Issue identified: ', prop_tag)
-                print(' - I have changed it to ', prop_code, ".... You're welcome.")
-                print('-' * 50)
-                prop_code_list.append(prop_code)
 
-        final_verified_tag_list.extend(verified_tag_list)
-        final_prop_code_list.extend(prop_code_list)
+    current = np.asarray(gdf[variable_].values, dtype=object)
+    property_array = np.asarray(gdf['PROPERTY'].values, dtype=object)
+    expected = pd.Series(property_array).map(dict_).values.astype(object)
 
-    # update feature variable_
-    gdf[variable_] = final_prop_code_list
+    unknown = ~pd.Series(property_array).isin(list(dict_)).values
+    if unknown.any():
+        raise KeyError(property_array[unknown][0])
 
-    return gdf, final_verified_tag_list
+    corrected = current != expected
+    final_verified_tag_list = np.where(corrected, 'AUTO-CORRECTED', 'VERIFIED').astype(object)
 
+    if corrected.any():
+        issue_df = pd.DataFrame({'PROPERTY': property_array[corrected], 'old': current[corrected],
+                                 'new': expected[corrected]}).drop_duplicates()
+        for prop_, prop_tag, prop_code in issue_df.itertuples(index=False):
+            print('prop: ', prop_)
+            print('Issue identified: ', prop_tag)
+            print(' - I have changed it to ', prop_code, ".... You're welcome.")
+            print('-' * 50)
 
-def create_property_name_set_fn(pastoral_estate):
-    """ Create a set of property names from the Pastoral Estate shapefile path.
-
-    :param pastoral_estate: string object containing the path to the Pastoral Estate shapefile.
-    :return pastoral_estate_gdf: geo-dataframe object containing the Pastoral Estate.
-    :return property_name_set: set object containing all of the property names within the Pastoral Estate.
-    """
-    pastoral_estate_gdf = gpd.read_file(pastoral_estate)
-    property_name_list = pastoral_estate_gdf.PROPERTY.tolist()
-    property_name_set = set(property_name_list)
+    # update feature variable_
+    compact_dtypes.set_column_fn(gdf, variable_, expected)
 
-    return pastoral_estate_gdf, property_name_set
+    return gdf, final_verified_tag_list
 
 
-def check_property_details_fn(pastoral_estate_gdf, gdf):
-    """ Create two dictionaries (district and property code) based on property name.
+def check_property_details_fn(pastoral_estate_index, gdf):
+    """ Update the DISTRICT and PROP_TAG features from the Pastoral Estate index dictionaries based on property name.
 
-    :param pastoral_estate_gdf: geo-dataframe containing the Pastoral Estate shapefile (command argument).
+    :param pastoral_estate_index: dictionary object containing the Pastoral Estate index
+    (pastoral_estate_index.load_pastoral_estate_index_fn).
     :param gdf: input geo-dataframe object containing the feature specific test data.
     :return output_gdf: output geo-dataframe object containing the feature specific test data with updated DISTRICT and
     PROP_TAG features.
     :return property_name_set: set object containing all of the property names within the Pastoral Estate.
-    :return district_verified_list: list object containing status variables based on any corrections made or errors
-    identified within the DISTRICT column
-    :return prop_tag_verified_list: list object containing status variables based on any corrections made or errors
-    identified within the PROP_TAG column
+    :return district_verified_list: numpy array object containing status variables based on any corrections made or
+    errors identified within the DISTRICT column
+    :return prop_tag_verified_list: numpy array object containing status variables based on any corrections made or
+    errors identified within the PROP_TAG column
     """
-    prop_dist_dict = pastoral_estate_gdf.set_index('PROPERTY').to_dict()['DISTRICT']
-    #print('prop_dist_dict: ', prop_dist_dict)
-    prop_prop_code_dict = pastoral_estate_gdf.set_index('PROPERTY').to_dict()['PROP_TAG']
-    #print('prop_prop_code_dict: ',prop_prop_code_dict)
-    property_name_list = pastoral_estate_gdf.PROPERTY.tolist()
-    property_name_set = set(property_name_list)
+    prop_dist_dict = pastoral_estate_index['prop_dist_dict']
+    prop_prop_code_dict = pastoral_estate_index['prop_tag_dict']
+    property_name_set = pastoral_estate_index['property_name_set']
+
+    # properties that could not be matched to the Pastoral Estate (FAULTY) can not be exported to a property
+    # directory - shutdown before any of the feature type data is written.
+    unknown_gdf = gdf[~gdf['PROPERTY'].isin(list(prop_dist_dict))]
+    if len(unknown_gdf.index) != 0:
+        print("ERROR_" * 50)
+        print("ERROR - ", len(unknown_gdf.index), " observations have a property name that is not located within the "
+              "Pastoral Estate: ")
+        print(pd.Series(np.asarray(unknown_gdf['PROPERTY'].values, dtype=object)).value_counts())
+        print("-" * 30)
+        print(f"Solution:")
+        print("1. Find shapefile and correct the PROPERTY name.")
+        print("2. Re run pipeline")
+        print("Pipeline shutdown.")
+        sys.exit()
 
     gdf2, district_verified_list = pastoral_estate_check_fn(
         gdf, 'DISTRICT', prop_dist_dict)
@@ -292,52 +408,48 @@ def check_property_details_fn(pastoral_estate_gdf, gdf):
     return output_gdf, property_name_set, district_verified_list, prop_tag_verified_list
 
 
-def clean_source_fn(gdf):
-    """
+def combine_status_fn(status_dict):
+    """ Combine the observation specific status lists into a single STATUS array - for each observation the first
+    status that is not VERIFIED, in STATUS_PRIORITY order, is retained (otherwise VERIFIED).
 
-    :param gdf: geo-dataframe object
-    :return gdf: processed geo-dataframe
+    :param status_dict: dictionary object containing the status type (STATUS_PRIORITY) and status list or array.
+    :return result_array: numpy array object containing the combined status of each observation.
     """
-    source_list = gdf['SOURCE'].tolist()
-    clean_source_list = []
-    for i in source_list:
-        if i == "NTG Rangelands Monitoring Branch":
-            x = "NTG Rangeland Monitoring Branch"
-            clean_source_list.append(x)
-        else:
-            clean_source_list.append(i)
+    result_array = np.asarray(status_dict[STATUS_PRIORITY[-1]], dtype=object)
+    for status_type in reversed(STATUS_PRIORITY[:-1]):
+        status_array = np.asarray(status_dict[status_type], dtype=object)
+        result_array = np.where(status_array != "VERIFIED", status_array, result_array)
 
-    gdf['SOURCE'] = clean_source_list
-
-    return gdf
+    return result_array
 
 
-def main_routine(gdf, feature_type, pastoral_estate):
+def main_routine(gdf, feature_type, pastoral_estate_index, correction_cache_dir=None):
     """ Check the features: PROPERTY, PROP_TAG, FEATGROUP AND FEATURE. Check for errors using existing data sets and
     rectify issues based on a variables levenshtein_ratio to known data. Add STATUS feature to geo-dataframe,
     by replacing the observation specific variable VERIFIED list by list.
 
     """
 
-    pastoral_estate_gdf, property_name_set = create_property_name_set_fn(pastoral_estate)
+    property_name_set = pastoral_estate_index['property_name_set']
+
+    # load the feature type specific correction cache (one file per feature type so parallel workflows never share it).
+    if correction_cache_dir is not None:
+        cache_path = os.path.join(correction_cache_dir, 'correction_cache_{0}.json'.format(feature_type))
+        correction_cache = load_correction_cache_fn(cache_path)
+    else:
+        cache_path = None
+        correction_cache = None
     print('-' * 50)
     print('Let me check your feature attributes for obvious errors..........')
-    # process the feature
-    feature_list = []
-
-    feature_list_ = gdf.PROPERTY.tolist()
-    for i in feature_list_:
-        n = i.upper()
-        feature_list.append(n)
-
-    gdf['PROPERTY'] = feature_list
+    # process the feature - PROPERTY has been trimmed and upper cased by the normalisation stage (step1_2).
+    feature_list = gdf.PROPERTY.tolist()
     # Call the compare_features_against_data_sets function to check variables in column and replace when required
     # where possible.
     output_list, gdf, p_status_list = compare_features_against_data_sets_fn(
-        feature_list, property_name_set, gdf, 'property')
+        feature_list, property_name_set, gdf, 'property', correction_cache)
 
     # Update feature with output list
-    gdf['PROPERTY'] = output_list
+    compact_dtypes.set_column_fn(gdf, 'PROPERTY', output_list)
 
     # call the identity_set_fn to determine the feature group and feature sets relevant to the feature type.
     feature_group_set, feature_set = identify_set_fn(feature_type)
@@ -349,43 +461,40 @@ def main_routine(gdf, feature_type, pastoral_estate):
     # Call the compare_features_against_data_sets function to check variables in column and replace when required
     # where possible.
     output_list, gdf, fg_status_list = compare_features_against_data_sets_fn(
-        feature_list, feature_group_set, gdf, 'feature_group')
+        feature_list, feature_group_set, gdf, 'feature_group', correction_cache)
 
     # Update feature with output list
-    gdf['FEATGROUP'] = output_list
+    compact_dtypes.set_column_fn(gdf, 'FEATGROUP', output_list)
 
     # process the feature
     feature_list = gdf.FEATURE.tolist()
     # Call the compare_features_against_data_sets function to check variables in column and replace when required
     # where possible.
     output_list, gdf, f_status_list = compare_features_against_data_sets_fn(
-        feature_list, feature_set, gdf, 'feature')
+        feature_list, feature_set, gdf, 'feature', correction_cache)
+
+    if cache_path is not None:
+        write_correction_cache_fn(cache_path, correction_cache)
 
     # Update feature with output list
-    gdf['FEATURE'] = output_list
+    compact_dtypes.set_column_fn(gdf, 'FEATURE', output_list)
 
 
     # Call the check_property_details function to create two dictionaries based on property name.
     gdf, property_name_set, district_verified_list, prop_tag_verified_list = check_property_details_fn(
-        pastoral_estate_gdf, gdf)
-
-    gdf = clean_source_fn(gdf)
+        pastoral_estate_index, gdf)
 
-    # overwrite status list with comments for property, district, prop_tag, feature and feature group.
-    result_list1 = [y if x == "VERIFIED" else x for x, y in zip(fg_status_list, f_status_list)]
-    # print('len results 1: ', len(result_list1))
-    result_list2 = [y if x == "VERIFIED" else x for x, y in zip(result_list1, p_status_list)]
-    # print('len results 2: ', len(result_list2))
-    result_list3 = [y if x == "VERIFIED" else x for x, y in zip(result_list2, district_verified_list)]
-    # print('len results 3: ', len(result_list3))
-    result_list = [y if x == "VERIFIED" else x for x, y in zip(result_list3, prop_tag_verified_list)]
-    # print('len results: ', len(result_list))
+    # overwrite status list with comments for property, district, prop_tag, feature and feature group - the first
+    # status that is not VERIFIED (in STATUS_PRIORITY order) is retained for each observation.
+    status_dict = {'feature_group': fg_status_list, 'feature': f_status_list, 'property': p_status_list,
+                   'district': district_verified_list, 'prop_tag': prop_tag_verified_list}
+    result_list = combine_status_fn(status_dict)
 
-    gdf["STATUS"] = result_list
+    compact_dtypes.set_column_fn(gdf, 'STATUS', result_list)
     print(' Status column has been updated to reflect any changes or errors identified.')
     status_list = gdf.STATUS.unique().tolist()
     print('Status field contains: ')
-    print(gdf.STATUS.value_counts())
+    print(gdf.STATUS.value_counts()[lambda s: s > 0])
     print('-'*30)
 
     faulty_gdf = gdf[gdf["STATUS"] ==  "ERROR"]
@@ -400,7 +509,7 @@ def main_routine(gdf, feature_type, pastoral_estate):
         print("ERROR_" * 50)
         print("=" * 50)
         print(f"100 % of observations has errors within the current {feature_type} shapefile......")
-        print(faulty_gdf.PROPERTY.value_counts())
+        print(faulty_gdf.PROPERTY.value_counts()[lambda s: s > 0])
 
         print(f"The script may behave erratically; as such , the script has been terminated.")
         print("-"*30)
@@ -28,59 +28,62 @@ from __future__ import print_function, division
 
 from datetime import datetime
 import warnings
+import numpy as np
+import compact_dtypes
 warnings.filterwarnings("ignore")
 
 
 def calculate_area_km2_fn(gdf):
-    """ Calculate the area in Australian Albers.
+    """ Calculate the area in Australian Albers. Only a temporary geometry array is projected - the geometry column
+    of the geo-dataframe is never transformed and the frame is not copied.
 
     :param gdf: polygon geo-dataframe object in GDA94 geographics.
     :return output_gdf: polygon geo-dataframe object in GDA94 geographics with Australian Albers area calculated and
     overwritten.
 
     """
-    gdf2 = gdf.copy()
-    gdf3 = gdf2.to_crs(epsg=3577)
-    gdf3["AREA_KM2"] = round((gdf3["geometry"].area / 10 ** 6), 1)
-    gdf4 = gdf3.to_crs(epsg=4283)
+    # data that arrives in another coordinate reference system is still returned in GDA94 geographics.
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4283:
+        gdf = gdf.to_crs(epsg=4283)
 
-    return gdf4
+    albers_area = gdf.geometry.to_crs(epsg=3577).area
+    gdf["AREA_KM2"] = (albers_area / 10 ** 6).round(1).values
 
+    return gdf
 
-def calculate_length_km2_fn(gdf):
-    """ Calculate the length in Australian Albers.
+
+def calculate_length_m_fn(gdf):
+    """ Calculate the length in Australian Albers for every line in one pass and write it to the LENGTH_M feature.
+    Lines with a null, empty or invalid geometry are removed and returned in a fault geo-dataframe (STATUS
+    'Failed Length') so that they can be exported with the faulty data.
 
     :param gdf: line geo-dataframe object in GDA94 geographics.
     :return output_gdf: line geo-dataframe object in GDA94 geographics with Australian Albers length calculated and
     overwritten.
+    :return fault_gdf: line geo-dataframe object containing the lines that could not be measured or None.
     """
+    # data that arrives in another coordinate reference system is still returned in GDA94 geographics.
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4283:
+        gdf = gdf.to_crs(epsg=4283)
+
+    geometry = gdf.geometry
+    fault = (np.array(geometry.isna(), dtype=bool) | np.array(geometry.is_empty, dtype=bool)
+             | ~np.array(geometry.is_valid, dtype=bool))
+
+    if fault.any():
+        fault_gdf = gdf[fault].copy()
+        compact_dtypes.set_column_fn(fault_gdf, "STATUS", np.full(len(fault_gdf.index), "Failed Length", dtype=object))
+        print("Faulty line geometry in the following properties: ")
+        print(fault_gdf.groupby("PROPERTY", observed=True).size().to_string())
+        output_gdf = gdf[~fault].copy()
+    else:
+        fault_gdf = None
+        output_gdf = gdf
 
-    gdf2 = gdf.copy()
-
-    print("gdf2.columns: ", gdf2.columns)
-
-    gdf3 = gdf2.to_crs(epsg=3577)
-
-    length_fault_list = []
-    for g in gdf3.geometry:
-        print(g)
-        try:
-            #print("length: ", round(g.length))
-            print("-" * 20)
-        except:
-            print("error" * 50)
-            var_ = g.PROPERTY
-            length_fault_list.append(var_)
-
-    if len(length_fault_list) > 0:
-        length_fault_set = set(length_fault_list)
-        print("Faulty length fields in the following properties: ", length_fault_set)
-        import sys
-        sys.exit()
-
-    output_gdf = gdf3.to_crs(epsg=4283)
+    albers_length = output_gdf.geometry.to_crs(epsg=3577).length
+    output_gdf["LENGTH_M"] = albers_length.round(0).astype('int64').values
 
-    return output_gdf
+    return output_gdf, fault_gdf
 
 
 def add_currency_date(gdf):
@@ -101,8 +104,10 @@ def add_currency_date(gdf):
 
 
 def main_routine(gdf, feature_type, transition_dir, year):
-    """ Calculate the length of lines and the area of polygons and add the currency date and time.
+    """ Calculate the length of lines and the area of polygons and add the currency date and time. Lines that could
+    not be measured are returned in fault_gdf (otherwise None).
     """
+    fault_gdf = None
 
     # print("gdf: ", gdf)
     # print(gdf.crs)
@@ -118,15 +123,9 @@ def main_routine(gdf, feature_type, transition_dir, year):
         print(' - paddocks area calculated.')
 
     elif feature_type == "lines":
-
-        print(gdf.FEATURE.unique())
         # drop Fenceline Open and Fenceline Neighbour
-        gdf_ = gdf[gdf["FEATURE"] != "Fenceline Open"]
-        print("gdf_: ", gdf_.shape)
-        gdf__ = gdf_[gdf_["FEATURE"] != "Fenceline Neighbour"]
-        print("gdf__: ", gdf__.shape)
-        gdf__.to_file(r"P:\Pipelines\Output\rmb_infrastructure_transition\error.shp", driver="ESRI Shapefile")
-        gdf = calculate_length_km2_fn(gdf__)
+        gdf = gdf[~gdf["FEATURE"].isin(["Fenceline Open", "Fenceline Neighbour"])]
+        gdf, fault_gdf = calculate_length_m_fn(gdf)
         print('Calculate area and length:')
         print(' - lines length calculated.')
 
@@ -137,7 +136,7 @@ def main_routine(gdf, feature_type, transition_dir, year):
     gdf, format_date = add_currency_date(gdf)
 
 
-    return gdf, transition_dir, year, feature_type
+    return gdf, transition_dir, year, feature_type, fault_gdf
 
 
 if __name__ == '__main__':
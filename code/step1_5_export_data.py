@@ -29,10 +29,11 @@ import os
 import warnings
 from glob import glob
 import pandas as pd
-import geopandas as gpd
-from datetime import datetime
 import fiona
-import shutil
+import duplicate_index
+import previous_transfer_store
+import property_export
+import stage_checkpoint
 
 warnings.filterwarnings("ignore")
 
@@ -54,7 +55,8 @@ def convert_to_df_fn(previous_gdf, gdf):
     return test_df, previous_df
 
 
-def property_export_shapefile_fn(prop_curr_test, pastoral_districts_path, dir_list_item, year, date_str):
+def property_export_shapefile_fn(prop_curr_test, pastoral_districts_path, dir_list_item, year, date_str, writer=None,
+                                 checkpoint_dir=None, output_part=None):
     """ Export a copy of the property specific data that has been uploaded to the for_migration directory and previous
     upload directories.
 
@@ -62,136 +64,132 @@ def property_export_shapefile_fn(prop_curr_test, pastoral_districts_path, dir_li
     :param pastoral_districts_path: string object containing the path to the pastoral districts directory.
     :param dir_list_item: string object containing the Shapely feature type (i.e. points, lines)
     :param year: integer object containing the year YYYY.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
+    :param output_part: string object containing the previous transfer layer the data was filtered against.
     """
+    # call the export_partitions_fn function to write each property partition concurrently.
+    property_export.export_partitions_fn(
+        prop_curr_test, pastoral_districts_path, dir_list_item, year,
+        "{0}_transition_{1}.shp".format(dir_list_item, date_str),
+        "{0}_transition_{1}.csv".format(dir_list_item.lower(), date_str), upload='Transition', writer=writer,
+        checkpoint_dir=checkpoint_dir, output_part=output_part)
 
-    for prop_ in prop_curr_test.PROPERTY.unique():
 
-        print(" -- Cleaned data has been returned to ", prop_, " Server Upload directory.")
-        prop_filter = prop_curr_test[prop_curr_test['PROPERTY'] == prop_]
-        dist_ = prop_curr_test.loc[prop_curr_test['PROPERTY'] == prop_, 'DISTRICT'].iloc[0]
-        prop_code = prop_curr_test.loc[prop_curr_test['PROPERTY'] == prop_, 'PROP_TAG'].iloc[0]
-        #currency = prop_curr_test.loc[prop_curr_test['PROPERTY'] == prop_, 'DATE_CURR'].iloc[0]
-        
-        # print("currency: ", currency)
-        # print("currency type: ", type(currency))
-        #
-        # import sys
-        # sys.exit()
-        print("Property: ", prop_)
-        print("prop filter: ", prop_filter.PROPERTY.unique())
-        print("district: ", dist_)
-        print("prop_code: ", prop_code)
+def for_migration_write_fn(test_data_gdf, output, pt_schema):
+    """ Append the new observations to the FOR MIGRATION shapefile, creating it with the previous transfer schema if
+    it does not exist.
 
-        property_name = "{0}_{1}".format(prop_code.lower(), prop_.replace(' ', '_').lower())
-        dist = dist_.replace(' ', '_').lower()
-        print("dist: ", dist)
-
-
-        if dist == 'northern_alice_springs':
-            district = 'northern_alice'
-        elif dist == 'southern_alice_springs':
-            district = 'southern_alice'
-        elif dist == 'victoria_river':
-            district = 'vrd'
-        else:
-            district = dist
-
-
-        #datetime_object = datetime.strptime(currency, "%Y-%m-%d %H:%M:%S")
-        #datetime_object = datetime.strptime(currency, "%Y-%m-%d %H:%M:%S")
-
-        #date_str = datetime_object.strftime("%Y%m%d_%H%M%S")
-
-        output_path = os.path.join(pastoral_districts_path, district, property_name, 'infrastructure', 'server_upload',
-                                   str(year), dir_list_item)
-
-        print("output_path: ", output_path)
-
-        check_path = os.path.exists(output_path)
-
-        if not check_path:
-            os.mkdir(output_path)
-
-        prop_filter = prop_filter.replace(['Not Recorded'], "")
-        prop_filter['UPLOAD'] = 'Transition'
-        output = ("{0}\\{1}_transition_{2}.shp".format(output_path, dir_list_item, date_str))
-        print(' -- ', output)
-
-        # if 'TRAN_DATE' in prop_filter.columns:
-        #     prop_filter.drop(columns=['TRAN_DATE'], inplace=True)
+    :param test_data_gdf: geo-dataframe object containing all new feature specific data.
+    :param output: string object containing the path to the FOR MIGRATION shapefile.
+    :param pt_schema: dictionary object containing the previous transfer shapefile schema.
+    """
+    check_file = os.path.exists(output)
 
-        prop_filter.to_file(output, driver="ESRI Shapefile")
+    print("migration check file: ", check_file)
 
-        prop_filter.to_csv("{0}\\{1}_transition_{2}.csv".format(output_path, dir_list_item.lower(), date_str))
+    if check_file:
+        with fiona.open(output, 'a') as dst:
+            dst.writerecords(previous_transfer_store.feature_records_fn(
+                test_data_gdf, list(dst.schema['properties'])))
+        print(' -- FOR MIGRATION data has been appended.....')
+    else:
+        crs_wkt = test_data_gdf.crs.to_wkt() if test_data_gdf.crs is not None else ''
+        with fiona.open(output, 'w', driver="ESRI Shapefile", schema=pt_schema, crs_wkt=crs_wkt) as dst:
+            dst.writerecords(previous_transfer_store.feature_records_fn(
+                test_data_gdf, list(pt_schema['properties'])))
+        print(' -- FOR MIGRATION data has exported.....')
 
 
-def for_migration_export_shapefile_fn(test_data_gdf, for_migration_dir_path, feature_type, pt_schema):
-    """ Export the finalised data to the FOR MIGRATION directory. Function will append data or save out depending on
-    whether there is existing data in the FOR MIGRATION sub-directory.
+def for_migration_export_shapefile_fn(test_data_gdf, for_migration_dir_path, feature_type, pt_schema, writer=None,
+                                      checkpoint_dir=None, output_part=None):
+    """ Export the finalised data to the FOR MIGRATION directory. New observations are appended in place when there is
+    existing data in the FOR MIGRATION sub-directory, otherwise the shapefile is created with the previous transfer
+    schema. The existing data is never read or rewritten and no sort is applied (the migration consumer sorts).
 
     :param test_data_gdf: geo-dataframe object containing all new feature specific data for upload into the
     FOR MIGRATION directory.
     :param for_migration_dir_path: string object containing the path to the FOR MIGRATION directory.
     :param feature_type: string object containing the shapely object type (i.e. points, lines etc.)
+    :param pt_schema: dictionary object containing the previous transfer shapefile schema.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
+    :param output_part: string object containing the previous transfer layer the data was filtered against.
     """
 
     output = "{0}\\Pastoral_Infra_{1}.shp".format(for_migration_dir_path, feature_type.lower())
 
     print("migration output: ", output)
-    check_file = os.path.exists(output)
-
-    print("migration check file: ", check_file)
     print(" - For Migration dataset updated.")
 
-    # print(test_data_gdf.DATE_CURR)
-    # import sys
-    # sys.exit()
+    stage_checkpoint.submit_output_fn(
+        writer, checkpoint_dir, stage_checkpoint.output_id_fn('for_migration', output, output_part),
+        "FOR MIGRATION: {0}".format(output), for_migration_write_fn, test_data_gdf, output, pt_schema, key=output)
 
-    if check_file:
-        gdf = gpd.read_file(output, driver="ESRI shapefile")
-        gdf2 = gdf.append(test_data_gdf)
-        filtered_gdf_sort = gdf2.sort_values(["PROPERTY", "DATE_CURR"])
-        filtered_gdf_sort.to_file(output, driver="ESRI Shapefile")
-        print(' -- FOR MIGRATION data has been appended.....')
-    else:
 
-        test_gdf_sort = test_data_gdf.sort_values(["PROPERTY", "DATE_CURR"])
-        test_gdf_sort.to_file(output, driver="ESRI Shapefile")
-        print(' -- FOR MIGRATION data has exported.....')
+def transition_write_fn(new_gdf, store_path, layer, file_path, pt_schema, snapshot):
+    """ Append the new observations to the previous transfer GeoPackage and export the sorted shapefile snapshot when
+    requested. The shapefile state is recorded so that later edits to the shapefile are picked up
+    (previous_transfer_store.open_store_fn).
+
+    :param new_gdf: geo-dataframe object containing all new feature specific data.
+    :param store_path: string object containing the path to the GeoPackage.
+    :param layer: string object containing the GeoPackage layer name.
+    :param file_path: string object containing the path to the previous transfer shapefile.
+    :param pt_schema: dictionary object containing the previous transfer shapefile schema.
+    :param snapshot: boolean object, True to re-export the previous transfer shapefile sorted by PROPERTY and DATE_CURR.
+    """
+    previous_transfer_store.append_fn(store_path, layer, new_gdf)
+    print(" - Previous Transfer dataset updated.")
 
+    if snapshot:
+        previous_transfer_store.export_snapshot_fn(store_path, layer, file_path, pt_schema)
 
-def export_transition_fn(new_gdf, file_path, feature_type):
-    """ Export the finalised data to the PREVIOUS TRANSFER directory. All test data nad previous transfer data has been
-    proceeded through the scripts. As such, appending of data is required.
+    previous_transfer_store.record_source_fn(store_path, layer, file_path, snapshot)
 
-    :param gdf: geo-dataframe object containing all new feature specific data for upload into the
+
+def export_transition_fn(new_gdf, file_path, feature_type, snapshot=False, writer=None, checkpoint_dir=None):
+    """ Export the finalised data to the PREVIOUS TRANSFER directory. The previous transfer data is held in a
+    GeoPackage (previous_transfer_store) beside the previous_transfer_*_gda94.shp shapefile and only the new
+    observations are appended. A sorted shapefile snapshot is exported unless it has been switched off.
+
+    :param new_gdf: geo-dataframe object containing all new feature specific data for upload into the
     PREVIOUS TRANSFER directory.
-    :param previous_dir_path: string object containing the path to the FOR MIGRATION directory.
+    :param file_path: string object containing the path to the previous transfer shapefile.
     :param feature_type: string object containing the shapely object type (i.e. points, lines etc.)
+    :param snapshot: boolean object, True to re-export the previous transfer shapefile sorted by PROPERTY and DATE_CURR.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
+    :return pt_schema: dictionary object containing the previous transfer shapefile schema.
     """
     print("-"*50)
     print("- Append to previous transfer")
-    # add a trans_date field (date_time object) from the date_curr field
-    # print(new_gdf.dtypes)
 
-    pt_gdf = fiona.open(file_path)
-    pt_schema = pt_gdf.schema
+    # the schema is read from the shapefile header - no records are read.
+    pt_schema = previous_transfer_store.shapefile_schema_fn(file_path)
 
-    # open as geo-dataframe called transition_gdf
-    prev_trans_gdf = gpd.read_file(file_path, geometry="geometry")
-    print("Previous Transfer Shape: ", prev_trans_gdf.shape)
+    store_path, layer = previous_transfer_store.open_store_fn(file_path)
     print("New Data Shape: ", new_gdf.shape)
-    gdf = prev_trans_gdf.append(new_gdf)
-    print("Appended Previous Transfer Shape", gdf.shape)
-    print(" - Previous Transfer dataset updated.")
+    stage_checkpoint.submit_output_fn(
+        writer, checkpoint_dir, stage_checkpoint.output_id_fn('previous_transfer', store_path),
+        "PREVIOUS TRANSFER: {0}".format(store_path), transition_write_fn, new_gdf, store_path, layer, file_path,
+        pt_schema, snapshot, key=store_path)
 
-    output_gdf_sort = gdf.sort_values(["PROPERTY", "DATE_CURR"], ascending=[True, True])
-    output_gdf_sort.to_file(file_path, driver="ESRI Shapefile", schema = pt_schema)
+    return pt_schema
 
 
-def main_routine(new_gdf, feature_type, transition_dir, year, pastoral_districts_path, date_str, datetime_object):
+def main_routine(new_gdf, feature_type, transition_dir, year, pastoral_districts_path, date_str, datetime_object,
+                 snapshot=False, writer=None, checkpoint_dir=None):
     """ 1. Search for feature type specific data already in the transfer directory.
 
+    The observations to export against each previous transfer layer (after already transferred observations are
+    removed) are checkpointed before any output is issued. A resumed run exports the checkpointed observations and
+    re-issues only the outputs (previous transfer, hash index, for migration, property partitions) that did not
+    complete - the hash index is never used to decide what was written.
+
+    :param snapshot: boolean object, True to export a sorted previous transfer shapefile snapshot.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
     """
 
     print('Searching for ', feature_type, ' data already in the transition directory....')
@@ -205,11 +203,36 @@ def main_routine(new_gdf, feature_type, transition_dir, year, pastoral_districts
             print(' - Previous transfer shapefile located: ', file_path)
             # print(file_path)
 
-            pt_schema = export_transition_fn(new_gdf, file_path, feature_type)
+            # call the open_store_fn function to locate (or seed) the previous transfer GeoPackage.
+            store_path, layer = previous_transfer_store.open_store_fn(file_path)
+
+            plan_name = "{0}_{1}".format(feature_type, layer)
+            plan = stage_checkpoint.load_checkpoint_fn(checkpoint_dir, 'step1_5', plan_name)
+            hash_index = duplicate_index.load_hash_index_fn(store_path)
+            if plan is None:
+                # call the duplicate_index functions to remove observations that have already been transferred.
+                new_gdf, hash_array = duplicate_index.drop_transferred_fn(new_gdf, hash_index)
+                stage_checkpoint.write_checkpoint_fn(
+                    checkpoint_dir, 'step1_5', {'gdf': new_gdf, 'hash_array': hash_array}, plan_name)
+            else:
+                new_gdf, hash_array = plan['gdf'], plan['hash_array']
+
+            if len(new_gdf.index) == 0:
+                print(' - All ', feature_type, ' observations have already been transferred.')
+                continue
+
+            pt_schema = export_transition_fn(new_gdf, file_path, feature_type, snapshot, writer, checkpoint_dir)
+            # the hash index is only updated once the GeoPackage append (same key) has succeeded.
+            stage_checkpoint.submit_output_fn(
+                writer, checkpoint_dir, stage_checkpoint.output_id_fn('hash_index', store_path),
+                "HASH INDEX: {0}".format(store_path), duplicate_index.update_hash_index_fn, store_path, hash_index,
+                hash_array, key=store_path)
             #new_gdf.to_file(r'P:\Pastoral_Infrastructure\transition\test.shp')
-            property_export_shapefile_fn(new_gdf, pastoral_districts_path, feature_type, year, date_str)
+            property_export_shapefile_fn(new_gdf, pastoral_districts_path, feature_type, year, date_str, writer,
+                                         checkpoint_dir, layer)
 
-            for_migration_export_shapefile_fn(new_gdf, for_migration_dir_path, feature_type, pt_schema)
+            for_migration_export_shapefile_fn(new_gdf, for_migration_dir_path, feature_type, pt_schema, writer,
+                                              checkpoint_dir, layer)
     else:
         print("ERROR - No previous data exists - can not read in schema")
         import sys
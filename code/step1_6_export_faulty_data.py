@@ -26,68 +26,49 @@ SOFTWARE.
 # import modules
 from __future__ import print_function, division
 import os
-from datetime import datetime
 import warnings
 from glob import glob
 import geopandas as gpd
+import property_export
 warnings.filterwarnings("ignore")
 
 
-def property_export_shapefile_fn(prop_curr_test, pastoral_districts_path, dir_list_item, year, date_str):
+def property_export_shapefile_fn(prop_curr_test, pastoral_districts_path, dir_list_item, year, date_str, writer=None,
+                                 checkpoint_dir=None, output_part=None):
     """ Export a copy of the property specific FAULTY data that has NOT been uploaded to the for_migration directory OR
-    the previous upload directories.
+    the previous upload directories. Faulty returns are written without an UPLOAD feature, under their own name, so
+    that they never replace the property's transition return. Discovery and the pre-screen skip faulty returns
+    (shapefile_ingest.faulty_return_fn) - a corrected return is processed once it has been renamed.
 
     :param prop_curr_test: geo-dataframe containing new property specific new data.
     :param pastoral_districts_path: string object containing the path to the pastoral districts directory.
     :param dir_list_item: string object containing the Shapely feature type (i.e. points, lines)
     :param year: integer object containing the year YYYY.
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
+    :param output_part: string object identifying the source of the faulty data (stage_checkpoint.output_id_fn).
     """
-    for prop_ in prop_curr_test.PROPERTY.unique():
-
-        print(" -- Cleaned data has been returned to ", prop_, " Server Upload directory.")
-        prop_filter = prop_curr_test[prop_curr_test['PROPERTY'] == prop_]
-        dist_ = prop_curr_test.loc[prop_curr_test['PROPERTY'] == prop_, 'DISTRICT'].iloc[0]
-        prop_code = prop_curr_test.loc[prop_curr_test['PROPERTY'] == prop_, 'PROP_TAG'].iloc[0]
-        #currency = prop_curr_test.loc[prop_curr_test['PROPERTY'] == prop_, 'DATE_CURR'].iloc[0]
-        print("CURRENCY DATE - faulty: ", currency)
-
-        property_name = "{0}_{1}".format(prop_code.lower(), prop_.replace(' ', '_').lower())
-        dist = dist_.replace(' ', '_')
-
-        if dist == 'northern_alice_springs':
-            district = 'northern_alice'
-        elif dist == 'southern_alice_springs':
-            district = 'southern_alice'
-        elif dist == 'victoria_river':
-            district = 'vrd'
-        else:
-            district = dist
-
-        #datetime_object = datetime.strptime(currency, "%Y-%m-%d") # %H:%M:%S")
-        #date_str = datetime_object.strftime("%Y%m%d") #_%00%00%00")
-
-        output_path = os.path.join(pastoral_districts_path, district, property_name, 'infrastructure', 'server_upload',
-                                   str(year), dir_list_item)
-
-        check_path = os.path.exists(output_path)
-
-        if not check_path:
-            os.mkdir(output_path)
-
-        prop_filter = prop_filter.replace(['Not Recorded'], "")
-        prop_filter['UPLOAD'] = 'Transition'
-        output = ("{0}\\{1}_transition_{2}.shp".format(output_path, dir_list_item, date_str))
-
-        prop_filter.to_file(output, driver="ESRI Shapefile")
-
-        prop_filter.to_csv("{0}\\{1}_Faulty_{2}.csv".format(output_path, dir_list_item, date_str))
+    # call the export_partitions_fn function to write each property partition concurrently.
+    output_list = property_export.export_partitions_fn(
+        prop_curr_test, pastoral_districts_path, dir_list_item, year,
+        "{0}_faulty_{1}.shp".format(dir_list_item, date_str),
+        "{0}_Faulty_{1}.csv".format(dir_list_item, date_str), writer=writer, checkpoint_dir=checkpoint_dir,
+        output_part=output_part)
+
+    for output in output_list:
         print(' -- A copy of FAULTY data has been exported to the property directory '
               '  --- ', output)
 
 
-def main_routine(year, pastoral_districts_path, primary_export_dir, directory_list, faulty_gdf_list, date_str, datetime_object):
+def main_routine(year, pastoral_districts_path, primary_export_dir, directory_list, faulty_gdf_list, date_str, datetime_object,
+                 writer=None, checkpoint_dir=None):
     """ This script controls the distribution of cleaned geo-dataframes in the transition, property and migration lists.
     Workflow is manages by the value relative to the property name in the status dictionary.
+
+    :param faulty_gdf_list: list object containing (feature_type, geo-dataframe) tuples of observations that failed a
+    workflow stage (i.e. step1_4 line length).
+    :param writer: dictionary object returned by output_writer.start_writer_fn or None (synchronous writes).
+    :param checkpoint_dir: string object containing the path to the run checkpoint directory or None (no checkpoints).
     """
 
     print('=' * 50)
@@ -102,19 +83,15 @@ def main_routine(year, pastoral_districts_path, primary_export_dir, directory_li
         for file in glob(os.path.join(n, "*{0}.shp".format(feature_type))):
             gdf = gpd.read_file(file)
 
-            property_export_shapefile_fn(gdf, pastoral_districts_path, feature_type, year, date_str)
-
-    if len(faulty_gdf_list) >0 :
-        for faulty in faulty_gdf_list:
-            print(faulty)
+            property_export_shapefile_fn(gdf, pastoral_districts_path, feature_type, year, date_str, writer,
+                                         checkpoint_dir, os.path.basename(file))
 
-            n = os.path.join(primary_export_dir, 'faulty') #, feature_type)
-            print(n)
+    # observations that failed a workflow stage (i.e. line length) are returned to each property directory.
+    for feature_type, faulty_gdf in faulty_gdf_list:
+        print(" - ", len(faulty_gdf.index), " faulty ", feature_type, " observations identified during processing.")
 
-            property_export_shapefile_fn(gdf, pastoral_districts_path, feature_type, year, date_str)
-            ##TODO delete
-            import sys
-            sys.exit()
+        property_export_shapefile_fn(faulty_gdf, pastoral_districts_path, feature_type, year, date_str, writer,
+                                     checkpoint_dir, 'workflow')
 
 
 
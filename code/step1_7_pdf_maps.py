@@ -28,77 +28,34 @@ from __future__ import print_function, division
 import os
 import shutil
 import warnings
-from glob import glob
 from datetime import datetime
+import server_upload_discovery
 warnings.filterwarnings("ignore")
 
 
-def property_path_fn(path):
-    """ Create a path to all property sub-directories and return them as a list.
-
-    :param path: string object containing the path to the Pastoral Districts directory.
-    :return prop_list: list object containing the path to all property sub-directories.
-    """
-
-    # create a list of pastoral districts.
-    dir_list = next(os.walk(path))[1]
-
-    prop_list = []
-    prop_name_list =[]
-
-    # loop through districts to get property name
-    for district in dir_list:
-        dist_path = os.path.join(path, district)
-
-        property_dir = next(os.walk(dist_path))[1]
-
-        # loop through the property names list
-        for prop_name in property_dir:
-            # join the path, district and property name to create a path to each property directory.
-            prop_path = os.path.join(path, district, prop_name)
-            # append all property paths to a list
-            prop_list.append(prop_path)
-            prop_name_list.append(prop_name)
-
-    return prop_list, prop_name_list
-
-
-def pdf_maps_upload_path_fn(prop_list, year):
-    """ Create a path to to the Server Upload sub-directory for each property and return them as a list.
-
-    :param prop_list: list object containing the path to all property sub-directories.
-    :return upload_list: list object containing the path to each properties Server_Upload sub-directory.
-    """
-    upload_list = []
-    for prop_path in prop_list:
-        upload_path = os.path.join(prop_path, 'Infrastructure', 'Server_Upload', str(year), 'pdf_maps')
-        upload_list.append(upload_path)
-
-    return upload_list
-
-
-def main_routine(year, pastoral_districts_path, transition_dir):
+def main_routine(year, pastoral_districts_path, transition_dir, manifest=None):
     """ Collect all finalised pdf maps from the Pastoral Districts property sub-directories and save them in the for
     migration directory.
 
     """
 
-    # call the directory_path_fn function to create a path to all property sub-directories and return them as a list.
-    prop_list, prop_name_list = property_path_fn(pastoral_districts_path)
+    if manifest is None:
+        # call the build_manifest_fn function to walk the Pastoral Districts directory once and list every candidate
+        # shapefile and pdf map within the property Server_Upload sub-directories.
+        manifest = server_upload_discovery.build_manifest_fn(pastoral_districts_path, year, [])
 
-    # call the upload_download_path_fn function to create a path to to the Server Upload and Download sub-directories
-    # for each property and return them as a list.
-    upload_list = pdf_maps_upload_path_fn(prop_list, year)
+    # call the manifest_pdf_maps_fn function to group the located pdf maps by pdf_maps sub-directory.
+    pdf_dict = server_upload_discovery.manifest_pdf_maps_fn(manifest)
 
     output_location = os.path.join(transition_dir, 'for_migration', 'pdf_maps')
 
     if not os.path.exists(output_location):
         os.mkdir(output_location)
 
-    for upload_map in upload_list:
+    for upload_map, pdf_list in sorted(pdf_dict.items()):
 
-        if glob("{}\\*.pdf".format(upload_map)):
-            for pdf_map in glob("{}\\*.pdf".format(upload_map)):
+        if pdf_list:
+            for pdf_map in pdf_list:
                 print(" - Located: ", pdf_map)
 
                 file_list = pdf_map.split('\\')
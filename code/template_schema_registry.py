@@ -0,0 +1,144 @@
+# !/usr/bin/env python
+
+"""
+RMB INFRASTRUCTURE TRANSITION PIPELINE
+======================================
+template_schema_registry.py
+--------------------------------------
+
+Copyright 2021 Robert McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the
+Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# import modules
+from __future__ import print_function, division
+import os
+import json
+import struct
+import warnings
+import shapefile_ingest
+
+warnings.filterwarnings("ignore")
+
+TEMPLATE_FILE_LIST = ['Pastoral_Infra_Points_Template.shp', 'Pastoral_Infra_Lines_Template.shp',
+                      'Pastoral_Infra_Polygons_Template.shp', 'Pastoral_Infra_Paddocks_Template.shp']
+
+REGISTRY_FILE = 'template_schema_registry.json'
+
+SHAPE_TYPE_DICT = {1: 'Point', 3: 'LineString', 5: 'Polygon', 8: 'MultiPoint'}
+
+# registry loaded once per run, keyed by assets directory.
+_REGISTRY_CACHE = {}
+
+
+def dbf_field_type_fn(field_type, width, decimals):
+    """ Convert a .dbf field descriptor to a fiona schema type string (i.e. str:50, int:11, float:19.11, date).
+
+    :param field_type: string object containing the .dbf field type character.
+    :param width: integer object containing the field width.
+    :param decimals: integer object containing the number of decimal places.
+    :return dtype: string object containing the fiona schema type.
+    """
+    if field_type == 'C':
+        dtype = 'str:{0}'.format(width)
+    elif field_type == 'D':
+        dtype = 'date'
+    elif field_type in ['N', 'F'] and decimals == 0:
+        dtype = 'int:{0}'.format(width)
+    elif field_type in ['N', 'F']:
+        dtype = 'float:{0}.{1}'.format(width, decimals)
+    elif field_type == 'L':
+        dtype = 'bool'
+    else:
+        dtype = 'str:{0}'.format(width)
+
+    return dtype
+
+
+def build_template_registry_fn(asset_dir):
+    """ Build the template schema registry from the .dbf and .shp headers of the four Pastoral_Infra template
+    shapefiles.
+
+    :param asset_dir: string object containing the path to the assets directory.
+    :return registry: dictionary object containing the template file name (key) and the column order, dtypes,
+    widths and geometry type (value).
+    """
+    registry = {}
+    for file_end in TEMPLATE_FILE_LIST:
+        template = os.path.join(asset_dir, 'shapefile', file_end)
+        field_list = shapefile_ingest.read_dbf_fields_fn(template)
+        if field_list is None:
+            print("ERROR - template shapefile could not be read: ", template)
+            import sys
+            sys.exit()
+
+        with open(template, 'rb') as f:
+            shape_type = struct.unpack('<i', f.read(100)[32:36])[0]
+
+        registry[file_end] = {
+            'columns': [name for name, _, _, _ in field_list] + ['geometry'],
+            'dtypes': {name: dbf_field_type_fn(field_type, width, decimals)
+                       for name, field_type, width, decimals in field_list},
+            'widths': {name: width for name, _, width, _ in field_list},
+            'geometry': SHAPE_TYPE_DICT.get(shape_type, 'Unknown')}
+
+    return registry
+
+
+def write_template_registry_fn(registry, asset_dir):
+    """ Serialize the template schema registry to assets/schema/template_schema_registry.json.
+
+    :param registry: dictionary object returned by build_template_registry_fn.
+    :param asset_dir: string object containing the path to the assets directory.
+    """
+    schema_dir = os.path.join(asset_dir, 'schema')
+    if not os.path.exists(schema_dir):
+        os.mkdir(schema_dir)
+
+    with open(os.path.join(schema_dir, REGISTRY_FILE), 'w') as f:
+        json.dump(registry, f, indent=2, sort_keys=True)
+
+
+def load_template_registry_fn(asset_dir):
+    """ Load the template schema registry once per run - from the serialized registry if it exists, otherwise from the
+    template shapefile headers (the registry is then written out for the next run).
+
+    :param asset_dir: string object containing the path to the assets directory.
+    :return registry: dictionary object containing the template file name (key) and a dictionary (value) with the
+    column order as a tuple ('columns'), the column set ('column_set'), dtypes, widths and geometry type.
+    """
+    registry = _REGISTRY_CACHE.get(asset_dir)
+    if registry is not None:
+        return registry
+
+    registry_path = os.path.join(asset_dir, 'schema', REGISTRY_FILE)
+    if os.path.isfile(registry_path):
+        with open(registry_path) as f:
+            registry = json.load(f)
+    else:
+        registry = build_template_registry_fn(asset_dir)
+        try:
+            write_template_registry_fn(registry, asset_dir)
+        except OSError:
+            print("Unable to write the template schema registry to: ", registry_path)
+
+    for template in registry.values():
+        template['columns'] = tuple(template['columns'])
+        template['column_set'] = frozenset(template['columns'])
+
+    _REGISTRY_CACHE[asset_dir] = registry
+
+    return registry
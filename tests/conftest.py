@@ -0,0 +1,5 @@
+# the pipeline modules are flat scripts within code/ and import each other by name.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code'))
@@ -0,0 +1,57 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import Point
+
+import compact_dtypes
+import feature_accumulator
+import normalise_attributes
+
+
+def file_gdf_fn(property_list, status_list):
+    return gpd.GeoDataFrame({'PROPERTY': property_list, 'STATUS': status_list, 'DELETE': [0] * len(property_list)},
+                            geometry=[Point(i, i) for i in range(len(property_list))], crs='EPSG:4283')
+
+
+def accumulate_fn(gdf_list):
+    accumulator = feature_accumulator.new_accumulator_fn('points')
+    for gdf in gdf_list:
+        assert feature_accumulator.append_gdf_fn(accumulator, gdf)
+    return feature_accumulator.build_gdf_fn(accumulator)
+
+
+def test_category_features_are_categorical_from_ingestion():
+    gdf_list = [file_gdf_fn(['ALPHA', None], ['Transition_attempt', 'Transition_attempt']),
+                file_gdf_fn(['BRAVO', 'ALPHA'], ['Transition_attempt', None])]
+
+    gdf = accumulate_fn(gdf_list)
+    expected = pd.concat(gdf_list, ignore_index=True)
+
+    assert compact_dtypes.is_categorical_fn(gdf['PROPERTY'])
+    assert compact_dtypes.is_categorical_fn(gdf['STATUS'])
+    assert not compact_dtypes.is_categorical_fn(gdf['DELETE'])
+    assert gdf['PROPERTY'].astype(object).fillna('null').tolist() == expected['PROPERTY'].fillna('null').tolist()
+    assert sorted(gdf['PROPERTY'].cat.categories) == ['ALPHA', 'BRAVO']
+    assert gdf['STATUS'].isna().tolist() == [False, False, False, True]
+
+
+def test_normalisation_keeps_categorical_features_categorical():
+    gdf = accumulate_fn([file_gdf_fn([' alpha ', 'ALPHA', None], ['VERIFIED'] * 3)])
+
+    gdf = normalise_attributes.normalise_attributes_fn(gdf)
+
+    assert compact_dtypes.is_categorical_fn(gdf['PROPERTY'])
+    assert gdf['PROPERTY'].tolist() == ['ALPHA', 'ALPHA', '']
+    assert sorted(gdf['PROPERTY'].cat.categories) == ['', 'ALPHA']
+
+
+def test_pipeline_status_values_are_in_the_vocabulary():
+    estate_index = {'property_name_set': {'ALPHA'}, 'prop_dist_dict': {'ALPHA': 'Barkly'},
+                    'prop_tag_dict': {'ALPHA': 'PAL'}}
+    gdf = accumulate_fn([file_gdf_fn(['ALPHA', 'ALPHA'], ['Transition_attempt'] * 2)])
+    gdf = compact_dtypes.categorise_fn(gdf, compact_dtypes.vocabulary_fn('lines', estate_index))
+    categories = list(gdf['STATUS'].cat.categories)
+
+    for status in ['Failed Length', 'Failed Geom Valid', 'Geom Repaired', 'Outside Property', 'AUTO-CORRECTED']:
+        compact_dtypes.set_column_fn(gdf, 'STATUS', np.full(len(gdf.index), status, dtype=object))
+        assert list(gdf['STATUS'].cat.categories) == categories
@@ -0,0 +1,63 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point
+
+import duplicate_index
+
+
+def points_gdf_fn(property_list, x_list, **columns):
+    return gpd.GeoDataFrame(dict({'PROPERTY': property_list, 'FEATURE': ['Bore'] * len(property_list)}, **columns),
+                            geometry=[Point(x, 0) for x in x_list], crs='EPSG:4283')
+
+
+def test_row_hash_ignores_derived_features_and_delete_format():
+    gdf = points_gdf_fn(['ALPHA', 'ALPHA'], [1, 1], DELETE=[0, 0], DATE_CURR=['2020', '2021'], AREA_KM2=[1., 2.])
+    resubmitted = points_gdf_fn([' ALPHA', 'ALPHA'], [1, 1], DELETE=['0', 0.])
+
+    hash_array = duplicate_index.row_hash_fn(gdf)
+    assert hash_array[0] == hash_array[1]
+    np.testing.assert_array_equal(duplicate_index.row_hash_fn(resubmitted), hash_array)
+    assert duplicate_index.row_hash_fn(points_gdf_fn(['ALPHA'], [2]))[0] != hash_array[0]
+
+
+def test_drop_transferred_removes_only_transferred_observations(tmp_path):
+    path = str(tmp_path / 'previous_transfer_points_gda94.gpkg')
+    points_gdf_fn(['ALPHA', 'BRAVO'], [1, 2]).to_file(path, driver='GPKG')
+    hash_index = duplicate_index.load_hash_index_fn(path)
+
+    gdf, hash_array = duplicate_index.drop_transferred_fn(points_gdf_fn(['ALPHA', 'BRAVO', 'ALPHA'], [1, 3, 4]),
+                                                          hash_index)
+
+    assert gdf['PROPERTY'].tolist() == ['BRAVO', 'ALPHA']
+    assert len(hash_array) == 2
+
+
+def test_each_previous_transfer_dataset_has_its_own_hash_index(tmp_path):
+    path_a = str(tmp_path / 'previous_transfer_points_gda94.gpkg')
+    path_b = str(tmp_path / 'previous_transfer_points2_gda94.gpkg')
+    points_gdf_fn(['ALPHA'], [1]).to_file(path_a, driver='GPKG')
+    points_gdf_fn(['BRAVO'], [2]).to_file(path_b, driver='GPKG')
+
+    index_a = duplicate_index.load_hash_index_fn(path_a)
+    index_b = duplicate_index.load_hash_index_fn(path_b)
+    duplicate_index.update_hash_index_fn(path_b, index_b, duplicate_index.row_hash_fn(points_gdf_fn(['CHARLIE'], [3])))
+
+    assert duplicate_index.hash_index_path_fn(path_a) != duplicate_index.hash_index_path_fn(path_b)
+    assert os.path.isfile(duplicate_index.hash_index_path_fn(path_a))
+    reloaded_a = duplicate_index.load_hash_index_fn(path_a)
+    np.testing.assert_array_equal(reloaded_a['hash_array'], index_a['hash_array'])
+    assert len(duplicate_index.load_hash_index_fn(path_b)['hash_array']) == 2
+
+
+def test_hash_index_is_rebuilt_when_the_dataset_is_edited(tmp_path):
+    path = str(tmp_path / 'previous_transfer_points_gda94.gpkg')
+    points_gdf_fn(['ALPHA'], [1]).to_file(path, driver='GPKG')
+    duplicate_index.load_hash_index_fn(path)
+
+    points_gdf_fn(['ALPHA', 'BRAVO'], [1, 2]).to_file(path, driver='GPKG')
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert len(duplicate_index.load_hash_index_fn(path)['hash_array']) == 2
@@ -0,0 +1,34 @@
+import os
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+import server_upload_discovery
+import shapefile_ingest
+
+
+def write_points_fn(file_path, **columns):
+    gpd.GeoDataFrame(dict({'PROPERTY': ['ALPHA'], 'DELETE': [0]}, **columns), geometry=[Point(0, 0)],
+                     crs='EPSG:4283').to_file(file_path)
+
+
+def test_faulty_returns_are_not_discovered(tmp_path):
+    points_dir = tmp_path / 'barkly' / 'pal_alpha' / 'infrastructure' / 'server_upload' / '2021' / 'points'
+    os.makedirs(str(points_dir))
+    write_points_fn(str(points_dir / 'bores.shp'))
+    write_points_fn(str(points_dir / 'points_faulty_20210701_093000.shp'))
+
+    manifest = server_upload_discovery.build_manifest_fn(str(tmp_path), '2021', ['points'], workers=2)
+
+    assert [os.path.basename(record['path']) for record in manifest['files']] == ['bores.shp']
+
+
+def test_faulty_returns_are_screened_as_transitioned(tmp_path):
+    faulty_path = str(tmp_path / 'points_faulty_20210701_093000.shp')
+    new_path = str(tmp_path / 'points_faulty_fixed.shp')
+    write_points_fn(faulty_path)
+    write_points_fn(new_path)
+
+    assert shapefile_ingest.prescreen_shapefile_fn(faulty_path)[0] == 'transitioned'
+    # a corrected return that has been renamed is processed again.
+    assert shapefile_ingest.prescreen_shapefile_fn(new_path)[0] == 'new'
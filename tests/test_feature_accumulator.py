@@ -0,0 +1,58 @@
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import Point
+
+import feature_accumulator
+
+
+def file_gdf_fn(property_list, delete_list, crs='EPSG:4283', offset=0):
+    return gpd.GeoDataFrame({'PROPERTY': property_list, 'LABEL': ["l{0}".format(i) for i in delete_list],
+                             'DELETE': delete_list},
+                            geometry=[Point(offset + i, i) for i in range(len(property_list))], crs=crs)
+
+
+def test_accumulated_frame_matches_concat():
+    gdf_list = [file_gdf_fn(['ALPHA', 'BRAVO'], [0, 2]), file_gdf_fn(['BRAVO'], [1], offset=10),
+                file_gdf_fn(['CHARLIE', 'ALPHA', 'ALPHA'], [0, 0, 2], offset=20)]
+    accumulator = feature_accumulator.new_accumulator_fn('points')
+    for gdf in gdf_list:
+        assert feature_accumulator.append_gdf_fn(accumulator, gdf)
+
+    gdf = feature_accumulator.build_gdf_fn(accumulator)
+    expected = pd.concat(gdf_list, ignore_index=True)
+
+    assert accumulator['n_files'] == 3
+    assert accumulator['n_rows'] == 6
+    assert list(gdf.columns) == list(expected.columns)
+    assert gdf.index.tolist() == list(range(6))
+    assert gdf['PROPERTY'].astype(object).tolist() == expected['PROPERTY'].tolist()
+    assert gdf['LABEL'].tolist() == expected['LABEL'].tolist()
+    assert gdf['DELETE'].tolist() == expected['DELETE'].tolist()
+    assert gdf.geometry.geom_equals(expected.geometry).all()
+    assert gdf.crs == expected.crs
+    # the chunks are released once the frame has been built.
+    assert accumulator['chunk_dict'] == {}
+
+
+def test_files_with_other_columns_are_not_appended():
+    accumulator = feature_accumulator.new_accumulator_fn('points')
+    assert feature_accumulator.append_gdf_fn(accumulator, file_gdf_fn(['ALPHA'], [0]))
+
+    assert not feature_accumulator.append_gdf_fn(accumulator, file_gdf_fn(['BRAVO'], [0]).drop(columns=['LABEL']))
+    assert accumulator['n_files'] == 1
+    assert len(feature_accumulator.build_gdf_fn(accumulator).index) == 1
+
+
+def test_files_in_another_crs_are_reprojected():
+    accumulator = feature_accumulator.new_accumulator_fn('points')
+    feature_accumulator.append_gdf_fn(accumulator, file_gdf_fn(['ALPHA'], [0]))
+    feature_accumulator.append_gdf_fn(accumulator, file_gdf_fn(['BRAVO'], [0], offset=130).to_crs(epsg=3577))
+
+    gdf = feature_accumulator.build_gdf_fn(accumulator)
+
+    assert gdf.crs.to_epsg() == 4283
+    assert abs(gdf.geometry.iloc[1].x - 130) < 1e-6
+
+
+def test_empty_accumulator_builds_nothing():
+    assert feature_accumulator.build_gdf_fn(feature_accumulator.new_accumulator_fn('lines')) is None
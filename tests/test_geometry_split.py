@@ -0,0 +1,48 @@
+import geopandas as gpd
+from shapely.geometry import GeometryCollection, LineString, MultiPoint, MultiPolygon, Point, Polygon
+
+from step1_2_search_folders import geom_type_check_fn
+
+SQUARE = Polygon([(0, 0), (1, 0), (1, 1), (0, 1)])
+
+
+def geometry_gdf_fn(geometry_list):
+    return gpd.GeoDataFrame({'FEATURE': ["f{0}".format(i) for i in range(len(geometry_list))]},
+                            geometry=geometry_list, crs='EPSG:4283')
+
+
+def test_single_and_multi_part_geometries_of_the_filed_type_are_not_split():
+    gdf = geometry_gdf_fn([Point(0, 0), MultiPoint([(0, 0), (1, 1)]), None])
+
+    geom_dict = geom_type_check_fn(gdf, 'points', 'points.shp')
+
+    assert list(geom_dict) == ['points']
+    assert geom_dict['points'] is gdf
+
+
+def test_paddocks_are_checked_as_polygons():
+    gdf = geometry_gdf_fn([SQUARE, MultiPolygon([SQUARE])])
+
+    assert list(geom_type_check_fn(gdf, 'paddocks', 'paddocks.shp')) == ['polygons']
+
+
+def test_every_row_is_checked_and_mixed_files_are_split():
+    # the first feature is a point - sampling the first row would miss the line and polygon.
+    gdf = geometry_gdf_fn([Point(0, 0), LineString([(0, 0), (1, 1)]), Point(1, 1), SQUARE, None])
+
+    geom_dict = geom_type_check_fn(gdf, 'points', 'points.shp')
+
+    assert sorted(geom_dict) == ['lines', 'points', 'polygons']
+    # null geometries stay with the filed type.
+    assert geom_dict['points']['FEATURE'].tolist() == ['f0', 'f2', 'f4']
+    assert geom_dict['lines']['FEATURE'].tolist() == ['f1']
+    assert geom_dict['polygons']['FEATURE'].tolist() == ['f3']
+
+
+def test_unsupported_geometry_types_are_kept_under_their_own_name():
+    gdf = geometry_gdf_fn([Point(0, 0), GeometryCollection([Point(0, 0), LineString([(0, 0), (1, 1)])])])
+
+    geom_dict = geom_type_check_fn(gdf, 'points', 'points.shp')
+
+    assert sorted(geom_dict) == ['GeometryCollection', 'points']
+    assert geom_dict['GeometryCollection']['FEATURE'].tolist() == ['f1']
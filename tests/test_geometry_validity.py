@@ -0,0 +1,54 @@
+import geopandas as gpd
+from shapely.geometry import Polygon
+
+import geometry_validity
+
+SQUARE = Polygon([(0, 0), (1, 0), (1, 1), (0, 1)])
+BOWTIE = Polygon([(0, 0), (1, 1), (1, 0), (0, 1)])
+
+
+def polygon_gdf_fn(geometry_list, status_list):
+    return gpd.GeoDataFrame({'PROPERTY': ['ALPHA'] * len(geometry_list), 'STATUS': status_list},
+                            geometry=geometry_list, crs='EPSG:4283')
+
+
+def test_valid_geometries_are_unchanged():
+    gdf = polygon_gdf_fn([SQUARE, SQUARE], ['VERIFIED', 'ERROR'])
+
+    output_gdf, fault_gdf = geometry_validity.main_routine(gdf, 'polygons')
+
+    assert fault_gdf is None
+    assert output_gdf['STATUS'].tolist() == ['VERIFIED', 'ERROR']
+    assert output_gdf.geometry.equals(gdf.geometry)
+
+
+def test_invalid_geometries_are_repaired_and_tagged():
+    gdf = polygon_gdf_fn([SQUARE, BOWTIE, BOWTIE], ['VERIFIED', 'VERIFIED', 'ERROR'])
+
+    output_gdf, fault_gdf = geometry_validity.main_routine(gdf, 'paddocks')
+
+    assert fault_gdf is None
+    assert output_gdf.geometry.is_valid.all()
+    assert output_gdf.geom_type.isin(['Polygon', 'MultiPolygon']).all()
+    # ERROR is never overwritten.
+    assert output_gdf['STATUS'].tolist() == ['VERIFIED', 'Geom Repaired', 'ERROR']
+    assert output_gdf.geometry.iloc[0].equals(SQUARE)
+
+
+def test_null_and_empty_geometries_are_returned_as_faults():
+    gdf = polygon_gdf_fn([SQUARE, None, Polygon()], ['VERIFIED'] * 3)
+
+    output_gdf, fault_gdf = geometry_validity.main_routine(gdf, 'polygons')
+
+    assert len(output_gdf.index) == 1
+    assert fault_gdf.index.tolist() == [1, 2]
+    assert fault_gdf['STATUS'].tolist() == ['Failed Geom Valid', 'Failed Geom Valid']
+
+
+def test_vertex_limits(monkeypatch):
+    geometry = polygon_gdf_fn([SQUARE], ['VERIFIED']).geometry
+    assert not geometry_validity.validity_check_fn(geometry, 'polygons').any(axis=1).iloc[0]
+
+    # a closed square has five vertices.
+    monkeypatch.setattr(geometry_validity, 'MAX_VERTICES', 4)
+    assert geometry_validity.validity_check_fn(geometry, 'polygons')['vertex'].iloc[0]
@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+import pytest
+
+from step1_3_concatenate_clean import levenshtein_ratio_and_distance, levenshtein_ratio_vector_fn
+
+COMPARE_LIST = sorted(['Bore', 'Dam', 'Fenceline Open', 'Fenceline Neighbour', 'Gate', 'Grid', 'Homestead',
+                       'Tank', 'Trough', 'Turkey Nest', 'Water Point', 'Yard', 'A'])
+
+
+def random_strings_fn(seed, count=200):
+    rng = random.Random(seed)
+    alphabet = 'abcdeABCDE '
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('s', ['Bore', 'bore', 'Fencline Open', 'Turkeynest', 'Trogh', 'x', 'Homested', 'Yards'])
+def test_vector_matches_baseline_ratio(s):
+    expected = np.array([levenshtein_ratio_and_distance(s, t, ratio_calc=True) for t in COMPARE_LIST])
+
+    np.testing.assert_allclose(levenshtein_ratio_vector_fn(s, COMPARE_LIST, min_ratio=0.), expected)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_vector_matches_baseline_ratio_random(seed):
+    compare_list = random_strings_fn(seed + 100, 50)
+    for s in random_strings_fn(seed, 40):
+        expected = np.array([levenshtein_ratio_and_distance(s, t, ratio_calc=True) for t in compare_list])
+
+        np.testing.assert_allclose(levenshtein_ratio_vector_fn(s, compare_list, min_ratio=0.), expected)
+
+
+@pytest.mark.parametrize('min_ratio', [0.5, 0.8, 0.9])
+def test_vector_pruning_keeps_every_ratio_above_min_ratio(min_ratio):
+    compare_list = random_strings_fn(7, 60) + COMPARE_LIST
+    for s in random_strings_fn(8, 40) + ['Fencline Open', 'Trogh']:
+        expected = np.array([levenshtein_ratio_and_distance(s, t, ratio_calc=True) for t in compare_list])
+        ratio_array = levenshtein_ratio_vector_fn(s, compare_list, min_ratio=min_ratio)
+
+        keep = expected >= min_ratio
+        np.testing.assert_allclose(ratio_array[keep], expected[keep])
+        assert (ratio_array[~keep] < min_ratio).all()
+
+
+def test_vector_empty_compare_list():
+    assert len(levenshtein_ratio_vector_fn('Bore', [])) == 0
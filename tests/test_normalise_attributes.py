@@ -0,0 +1,57 @@
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point
+
+import normalise_attributes
+import property_export
+
+
+def attribute_gdf_fn():
+    return gpd.GeoDataFrame({'PROPERTY': [' alpha ', 'Alpha', None],
+                             'SOURCE': ['NTG Rangelands Monitoring Branch', 'Other', 'Not Recorded'],
+                             'LABEL': ['Not recorded', 'Not Recorded', 'Bore 1'],
+                             'FEATURE': ['Not Recorded', 'Bore', 'Bore'],
+                             'DELETE': [0, 0, 2]},
+                            geometry=[Point(i, i) for i in range(3)])
+
+
+def test_concatenation_rules():
+    gdf = normalise_attributes.normalise_attributes_fn(attribute_gdf_fn())
+
+    assert gdf['PROPERTY'].tolist() == ['ALPHA', 'ALPHA', '']
+    assert gdf['SOURCE'].tolist() == ['NTG Rangeland Monitoring Branch', 'Other', 'Not Recorded']
+    assert gdf['LABEL'].tolist() == ['', '', 'Bore 1']
+    # the export only rule does not change the transferred data.
+    assert gdf['FEATURE'].tolist() == ['Not Recorded', 'Bore', 'Bore']
+    assert gdf['DELETE'].tolist() == [0, 0, 2]
+
+
+def test_export_rules_blank_not_recorded_in_every_text_column():
+    gdf = normalise_attributes.normalise_attributes_fn(attribute_gdf_fn(), export=True)
+
+    assert gdf['SOURCE'].tolist() == ['NTG Rangelands Monitoring Branch', 'Other', '']
+    assert gdf['FEATURE'].tolist() == ['', 'Bore', 'Bore']
+    assert gdf['LABEL'].tolist() == ['Not recorded', '', 'Bore 1']
+    assert gdf['PROPERTY'].tolist()[:2] == [' alpha ', 'Alpha']
+    assert gdf['DELETE'].tolist() == [0, 0, 2]
+
+
+def test_property_returns_use_the_export_rules(tmp_path, monkeypatch):
+    written = {}
+
+    def write_partition_fn(prop_filter, output_path, shp_name, csv_name):
+        written[prop_filter['PROPERTY'].iloc[0]] = prop_filter
+        return output_path
+
+    monkeypatch.setattr(property_export, 'write_partition_fn', write_partition_fn)
+    gdf = normalise_attributes.normalise_attributes_fn(attribute_gdf_fn())
+    gdf['DISTRICT'] = 'Barkly'
+    gdf['PROP_TAG'] = np.array(['PAL', 'PAL', 'PAL'], dtype=object)
+
+    property_export.export_partitions_fn(gdf, str(tmp_path), 'points', '2021', 'points.shp', 'points.csv',
+                                         upload='Transition', workers=1)
+
+    assert written['ALPHA']['FEATURE'].tolist() == ['', 'Bore']
+    assert written['ALPHA']['UPLOAD'].tolist() == ['Transition', 'Transition']
+    # the caller's geo-dataframe is not modified.
+    assert gdf['FEATURE'].tolist() == ['Not Recorded', 'Bore', 'Bore']
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+import output_writer
+
+
+@pytest.fixture
+def writer():
+    writer = output_writer.start_writer_fn(4, max_pending=3)
+    yield writer
+    output_writer.close_writer_fn(writer)
+
+
+def record_job_fn(log, lock, key, i, delay=0., fail=False):
+    time.sleep(delay)
+    with lock:
+        log.append((key, i))
+    if fail:
+        raise ValueError("job {0} {1} failed".format(key, i))
+    return i
+
+
+def test_jobs_with_the_same_key_run_in_submission_order(writer):
+    log = []
+    lock = threading.Lock()
+    for i in range(6):
+        # earlier jobs sleep longer - without key ordering they would complete last.
+        output_writer.submit_fn(writer, "a{0}".format(i), record_job_fn, log, lock, 'a', i, 0.03 * (6 - i), key='a')
+        output_writer.submit_fn(writer, "b{0}".format(i), record_job_fn, log, lock, 'b', i, 0.01 * (6 - i), key='b')
+
+    assert output_writer.flush_fn(writer) == []
+    assert [i for key, i in log if key == 'a'] == list(range(6))
+    assert [i for key, i in log if key == 'b'] == list(range(6))
+
+
+def test_failed_job_skips_later_jobs_with_the_same_key(writer):
+    log = []
+    lock = threading.Lock()
+    output_writer.submit_fn(writer, 'a0', record_job_fn, log, lock, 'a', 0, 0., True, key='a')
+    output_writer.submit_fn(writer, 'a1', record_job_fn, log, lock, 'a', 1, key='a')
+    output_writer.submit_fn(writer, 'b0', record_job_fn, log, lock, 'b', 0, key='b')
+
+    error_list = output_writer.flush_fn(writer)
+
+    assert [description for description, _ in error_list] == ['a0', 'a1']
+    assert 'ValueError' in error_list[0][1]
+    assert 'skipped' in error_list[1][1]
+    assert sorted(log) == [('a', 0), ('b', 0)]
+
+
+def test_submit_blocks_while_the_queue_is_full(writer):
+    release = threading.Event()
+    for i in range(3):
+        output_writer.submit_fn(writer, "wait{0}".format(i), release.wait)
+
+    submitted = threading.Event()
+    thread = threading.Thread(target=lambda: (output_writer.submit_fn(writer, 'extra', lambda: None),
+                                              submitted.set()))
+    thread.start()
+    assert not submitted.wait(0.2)
+
+    release.set()
+    thread.join(5)
+    assert submitted.is_set()
+    assert output_writer.flush_fn(writer) == []
+
+
+def test_no_writer_runs_the_job_immediately():
+    assert output_writer.start_writer_fn(0) is None
+    assert output_writer.submit_fn(None, 'job', lambda x: x * 2, 21) == 42
+    assert output_writer.flush_fn(None) == []
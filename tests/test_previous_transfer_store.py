@@ -0,0 +1,77 @@
+import os
+
+import fiona
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+import previous_transfer_store
+
+
+def points_gdf_fn(property_list, date_list):
+    return gpd.GeoDataFrame({'PROPERTY': property_list, 'DATE_CURR': date_list},
+                            geometry=[Point(i, i) for i in range(len(property_list))], crs='EPSG:4283')
+
+
+def read_layer_fn(path, layer=None):
+    with fiona.open(path, layer=layer) as src:
+        return [(record['properties']['PROPERTY'], record['properties']['DATE_CURR']) for record in src]
+
+
+def touch_fn(file_path):
+    stat = os.stat(file_path)
+    os.utime(file_path, (stat.st_atime, stat.st_mtime + 10))
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    file_path = str(tmp_path / 'previous_transfer_points_gda94.shp')
+    points_gdf_fn(['BRAVO', 'ALPHA'], ['2020-01-01', '2020-01-01']).to_file(file_path)
+    return file_path
+
+
+def test_store_is_seeded_from_the_shapefile(file_path):
+    store_path, layer = previous_transfer_store.open_store_fn(file_path)
+
+    assert read_layer_fn(store_path, layer) == read_layer_fn(file_path)
+    assert previous_transfer_store.read_source_fn(store_path, layer)[1]
+
+
+def test_append_and_snapshot_keep_the_shapefile_in_step(file_path):
+    store_path, layer = previous_transfer_store.open_store_fn(file_path)
+    schema = previous_transfer_store.shapefile_schema_fn(file_path)
+
+    previous_transfer_store.append_fn(store_path, layer, points_gdf_fn(['ALPHA'], ['2021-01-01']))
+    previous_transfer_store.export_snapshot_fn(store_path, layer, file_path, schema)
+    previous_transfer_store.record_source_fn(store_path, layer, file_path, True)
+
+    expected = [('ALPHA', '2020-01-01'), ('ALPHA', '2021-01-01'), ('BRAVO', '2020-01-01')]
+    assert read_layer_fn(file_path) == expected
+    # the snapshot is not mistaken for an outside edit.
+    assert previous_transfer_store.open_store_fn(file_path) == (store_path, layer)
+    assert sorted(read_layer_fn(store_path, layer)) == expected
+
+
+def test_edited_shapefile_is_seeded_again(file_path):
+    store_path, layer = previous_transfer_store.open_store_fn(file_path)
+
+    points_gdf_fn(['CHARLIE'], ['2019-01-01']).to_file(file_path)
+    touch_fn(file_path)
+    previous_transfer_store.open_store_fn(file_path)
+
+    assert read_layer_fn(store_path, layer) == [('CHARLIE', '2019-01-01')]
+
+
+def test_edited_shapefile_behind_the_store_shuts_the_pipeline_down(file_path):
+    store_path, layer = previous_transfer_store.open_store_fn(file_path)
+    previous_transfer_store.append_fn(store_path, layer, points_gdf_fn(['ALPHA'], ['2021-01-01']))
+    previous_transfer_store.record_source_fn(store_path, layer, file_path, False)
+
+    # no snapshot - the shapefile is behind the store but unchanged, so the store is kept.
+    previous_transfer_store.open_store_fn(file_path)
+    assert len(read_layer_fn(store_path, layer)) == 3
+
+    touch_fn(file_path)
+    with pytest.raises(SystemExit):
+        previous_transfer_store.open_store_fn(file_path)
+    assert len(read_layer_fn(store_path, layer)) == 3
@@ -0,0 +1,49 @@
+import geopandas as gpd
+from shapely.geometry import Point, box
+
+import property_containment
+
+
+def estate_index_fn(source):
+    estate_gdf = gpd.GeoDataFrame({'PROPERTY': ['ALPHA', 'BRAVO']}, geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)],
+                                  crs='EPSG:4283')
+    return {'source': source, 'source_mtime': 0., 'estate_gdf': estate_gdf, 'property_name_set': {'ALPHA', 'BRAVO'}}
+
+
+def feature_gdf_fn(property_list, point_list, status_list, crs='EPSG:4283'):
+    return gpd.GeoDataFrame({'PROPERTY': property_list, 'STATUS': status_list},
+                            geometry=[Point(x, y) for x, y in point_list], crs=crs)
+
+
+def test_features_outside_their_property_are_flagged():
+    gdf = feature_gdf_fn(['ALPHA', 'ALPHA', 'BRAVO', 'BRAVO', 'ALPHA'],
+                         [(0.5, 0.5), (1.5, 0.5), (1.5, 0.5), (5, 5), (1.5, 0.5)],
+                         ['VERIFIED', 'VERIFIED', 'AUTO-CORRECTED', 'VERIFIED', 'ERROR'])
+
+    gdf = property_containment.main_routine(gdf, estate_index_fn('flagged'))
+
+    # ERROR is never overwritten.
+    assert gdf['STATUS'].tolist() == ['VERIFIED', 'Outside Property', 'AUTO-CORRECTED', 'Outside Property', 'ERROR']
+
+
+def test_features_on_a_shared_boundary_are_inside_both_properties():
+    gdf = feature_gdf_fn(['ALPHA', 'BRAVO'], [(1, 0.5), (1, 0.5)], ['VERIFIED', 'VERIFIED'])
+
+    gdf = property_containment.main_routine(gdf, estate_index_fn('boundary'))
+
+    assert gdf['STATUS'].tolist() == ['VERIFIED', 'VERIFIED']
+
+
+def test_unknown_properties_are_not_flagged():
+    gdf = feature_gdf_fn(['CHARLIE'], [(0.5, 0.5)], ['ERROR'])
+
+    assert property_containment.main_routine(gdf, estate_index_fn('unknown'))['STATUS'].tolist() == ['ERROR']
+
+
+def test_features_in_another_crs_are_compared_in_the_estate_crs():
+    gdf = feature_gdf_fn(['ALPHA', 'ALPHA'], [(0.5, 0.5), (1.5, 0.5)], ['VERIFIED', 'VERIFIED']).to_crs(epsg=3577)
+
+    gdf = property_containment.main_routine(gdf, estate_index_fn('crs'))
+
+    assert gdf['STATUS'].tolist() == ['VERIFIED', 'Outside Property']
+    assert gdf.crs.to_epsg() == 3577
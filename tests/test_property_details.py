@@ -0,0 +1,40 @@
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+from step1_3_concatenate_clean import check_property_details_fn, pastoral_estate_check_fn
+
+ESTATE_INDEX = {'property_name_set': {'ALPHA', 'BRAVO'},
+                'prop_dist_dict': {'ALPHA': 'Barkly', 'BRAVO': 'Victoria River'},
+                'prop_tag_dict': {'ALPHA': 'PAL', 'BRAVO': 'PBR'}}
+
+
+def property_gdf_fn(property_list):
+    return gpd.GeoDataFrame({'PROPERTY': property_list, 'DISTRICT': ['Barkly'] * len(property_list),
+                             'PROP_TAG': ['PAL'] * len(property_list)},
+                            geometry=[Point(i, i) for i in range(len(property_list))])
+
+
+def test_property_details_are_corrected_from_the_estate_index():
+    gdf, _, district_array, prop_tag_array = check_property_details_fn(
+        ESTATE_INDEX, property_gdf_fn(['ALPHA', 'BRAVO', 'ALPHA']))
+
+    assert gdf['DISTRICT'].tolist() == ['Barkly', 'Victoria River', 'Barkly']
+    assert gdf['PROP_TAG'].tolist() == ['PAL', 'PBR', 'PAL']
+    assert district_array.tolist() == ['VERIFIED', 'AUTO-CORRECTED', 'VERIFIED']
+    assert prop_tag_array.tolist() == ['VERIFIED', 'AUTO-CORRECTED', 'VERIFIED']
+
+
+def test_unknown_property_shuts_the_pipeline_down_before_any_export():
+    gdf = property_gdf_fn(['ALPHA', 'FAULTY'])
+
+    with pytest.raises(SystemExit):
+        check_property_details_fn(ESTATE_INDEX, gdf)
+
+    # nothing was corrected before the shutdown.
+    assert gdf['PROP_TAG'].tolist() == ['PAL', 'PAL']
+
+
+def test_unknown_property_raises_key_error():
+    with pytest.raises(KeyError):
+        pastoral_estate_check_fn(property_gdf_fn(['FAULTY']), 'PROP_TAG', ESTATE_INDEX['prop_tag_dict'])
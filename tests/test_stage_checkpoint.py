@@ -0,0 +1,36 @@
+import os
+
+import stage_checkpoint
+
+
+def test_completed_outputs_are_not_issued_again(tmp_path):
+    checkpoint_dir = stage_checkpoint.checkpoint_dir_fn(str(tmp_path))
+    done_id = stage_checkpoint.output_id_fn('for_migration', str(tmp_path / 'done.shp'))
+    failed_id = stage_checkpoint.output_id_fn('server_upload', str(tmp_path / 'failed.shp'))
+    call_list = []
+
+    def fail_fn():
+        raise OSError('share unavailable')
+
+    assert stage_checkpoint.submit_output_fn(None, checkpoint_dir, done_id, 'done', call_list.append, 'done')
+    try:
+        stage_checkpoint.submit_output_fn(None, checkpoint_dir, failed_id, 'failed', fail_fn)
+    except OSError:
+        pass
+
+    # resume - only the output that did not complete is issued again.
+    assert not stage_checkpoint.submit_output_fn(None, checkpoint_dir, done_id, 'done', call_list.append, 'done')
+    assert stage_checkpoint.submit_output_fn(None, checkpoint_dir, failed_id, 'failed', call_list.append, 'retry')
+    assert call_list == ['done', 'retry']
+    assert stage_checkpoint.issued_output_path_set_fn(checkpoint_dir, 'for_migration') == {
+        os.path.normcase(os.path.normpath(str(tmp_path / 'done.shp')))}
+
+
+def test_unreadable_checkpoint_is_ignored(tmp_path):
+    checkpoint_dir = stage_checkpoint.checkpoint_dir_fn(str(tmp_path))
+    stage_checkpoint.write_checkpoint_fn(checkpoint_dir, 'step1_4', {'n': 1}, 'points')
+    assert stage_checkpoint.load_checkpoint_fn(checkpoint_dir, 'step1_4', 'points') == {'n': 1}
+
+    with open(stage_checkpoint.checkpoint_path_fn(checkpoint_dir, 'step1_4', 'points'), 'wb') as f:
+        f.write(b'not a pickle')
+    assert stage_checkpoint.load_checkpoint_fn(checkpoint_dir, 'step1_4', 'points') is None
@@ -0,0 +1,38 @@
+import itertools
+
+import numpy as np
+
+from step1_3_concatenate_clean import STATUS_PRIORITY, combine_status_fn
+
+STATUS_LIST = ['VERIFIED', 'AUTO_CORRECT', 'ERROR']
+
+
+def baseline_combine_status_fn(fg_status_list, f_status_list, p_status_list, district_verified_list,
+                               prop_tag_verified_list):
+    # the list comprehension chain from the baseline step1_3 main_routine.
+    result_list1 = [y if x == "VERIFIED" else x for x, y in zip(fg_status_list, f_status_list)]
+    result_list2 = [y if x == "VERIFIED" else x for x, y in zip(result_list1, p_status_list)]
+    result_list3 = [y if x == "VERIFIED" else x for x, y in zip(result_list2, district_verified_list)]
+    return [y if x == "VERIFIED" else x for x, y in zip(result_list3, prop_tag_verified_list)]
+
+
+def test_status_priority_order_matches_baseline():
+    assert STATUS_PRIORITY == ['feature_group', 'feature', 'property', 'district', 'prop_tag']
+
+
+def test_combine_status_matches_baseline_for_every_combination():
+    combination_list = list(itertools.product(STATUS_LIST, repeat=len(STATUS_PRIORITY)))
+    column_list = [list(column) for column in zip(*combination_list)]
+
+    result_array = combine_status_fn(dict(zip(STATUS_PRIORITY, column_list)))
+
+    assert isinstance(result_array, np.ndarray)
+    assert result_array.tolist() == baseline_combine_status_fn(*column_list)
+
+
+def test_combine_status_accepts_arrays():
+    status_dict = {status_type: np.array(['VERIFIED', 'VERIFIED']) for status_type in STATUS_PRIORITY}
+    status_dict['district'] = np.array(['VERIFIED', 'ERROR'])
+    status_dict['prop_tag'] = np.array(['AUTO_CORRECT', 'AUTO_CORRECT'])
+
+    assert combine_status_fn(status_dict).tolist() == ['AUTO_CORRECT', 'ERROR']